@@ -0,0 +1,151 @@
+"""
+Timing, memory and comparison helpers for the benchmark runner.
+
+Every stage runs in a fresh spawned process, so its peak RSS is not
+inflated by models or galleries another stage loaded, and module-level
+state of the services (model caches, face apps) starts cold.
+"""
+
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def rss_mb() -> float:
+    """
+    Peak resident set size of this process so far, in MiB.
+    """
+    # VmHWM starts over with the new address space of a spawned process;
+    # ru_maxrss keeps the peak of the forking parent across exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def measure(call: Callable[[], Optional[int]], iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    """
+    Time `call` repeatedly.
+
+    Args:
+        call: Runs one iteration and returns how many items it processed
+            (frames, faces, queries); None counts as one
+        iterations: Timed iterations
+        warmup: Untimed iterations run first
+
+    Returns:
+        Latency percentiles per call, items per second, RSS once the stage
+        was set up and peak RSS
+    """
+    setup_rss = rss_mb()
+    for _ in range(warmup):
+        call()
+
+    latencies = []
+    items = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        processed = call()
+        latencies.append((time.perf_counter() - call_started) * 1000.0)
+        items += 1 if processed is None else int(processed)
+    elapsed = time.perf_counter() - started
+
+    latencies = np.asarray(latencies)
+    return {
+        "iterations": iterations,
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(items / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "setup_rss_mb": round(setup_rss, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+    }
+
+
+def _stage_entry(target: Callable[..., Dict[str, Any]], spec: Dict[str, Any], results) -> None:
+    try:
+        results.put(target(spec))
+    except Exception as error:
+        results.put({"error": f"{type(error).__name__}: {error}", "traceback": traceback.format_exc()})
+
+
+def run_isolated(target: Callable[..., Dict[str, Any]], spec: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Run `target(spec)` in a spawned process and return its result dict.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_stage_entry, args=(target, spec, results))
+    process.start()
+    try:
+        result = results.get(timeout=timeout)
+    except Exception:
+        result = {"error": f"stage did not finish within {timeout:.0f}s"}
+    process.join(5)
+    if process.is_alive():
+        process.terminate()
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *args], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Stages that got slower (p50/p99 latency) or bigger (peak RSS) than the
+    baseline by more than `tolerance` (0.1 = 10%).
+    """
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        before = previous.get(result["name"])
+        if not before or "error" in result or "error" in before or "skipped" in result or "skipped" in before:
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_rss_mb"):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > tolerance:
+                regressions.append({
+                    "name": result["name"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 3),
+                })
+    return regressions
@@ -0,0 +1,218 @@
+"""
+Offline benchmarks for the face recognition hot paths.
+
+    python benchmarks/run.py                        # full matrix
+    python benchmarks/run.py --quick                # small smoke run
+    python benchmarks/run.py --stages worker.score_capture --sizes 50,5000
+    python benchmarks/run.py --baseline benchmarks/results/<earlier>.json
+
+Synthetic galleries, frames and a video are generated into a temporary
+directory and section models are served from a local HTTP server, so no
+network access or database is needed. Results (throughput, p50/p99
+latency, peak RSS per stage) are printed and written as JSON to
+benchmarks/results/ (or --output). With --baseline, stages whose p50/p99
+latency or peak RSS grew by more than --tolerance are listed and the exit
+code is 1.
+
+`--engine synthetic` (default) replaces the InsightFace models with a
+cheap colour-blob detector and lookup recognizer (see synthetic.py), so
+the pipeline around the models is measured on any machine. `--engine
+insightface` runs the real models from --insightface-root and skips the
+model stages when they are not installed there.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+# Model files are written with the worker's copies of the shared modules
+sys.path.insert(1, os.path.join(REPO_ROOT, "ml-worker"))
+
+from file_server import LocalFileServer  # noqa: E402
+from harness import compare, environment, run_isolated  # noqa: E402
+from stages import ENGINE_INSIGHTFACE, ENGINE_SYNTHETIC, FACES_PER_FRAME, STAGES, run_stage  # noqa: E402
+from synthetic import make_frame, write_json, write_section_model, write_video  # noqa: E402
+
+DEFAULT_SIZES = "50,500,5000"
+DEFAULT_RESOLUTIONS = "640x480,1280x720,1920x1080"
+VIDEO_STUDENTS = 60
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the face recognition hot paths")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stage names")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Gallery sizes (students)")
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="Frame sizes for detect_faces")
+    parser.add_argument("--faces", type=int, default=30, help="Faces per synthetic frame")
+    parser.add_argument("--video-seconds", type=float, default=20.0)
+    parser.add_argument("--video-resolution", default="1280x720")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--video-iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--engine", choices=(ENGINE_SYNTHETIC, ENGINE_INSIGHTFACE), default=ENGINE_SYNTHETIC)
+    parser.add_argument("--insightface-root", default=os.path.abspath("./insightface_models"))
+    parser.add_argument("--insightface-model", default="buffalo_s")
+    parser.add_argument("--stage-timeout", type=float, default=1800.0)
+    parser.add_argument("--output", help="JSON result path (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before a stage is flagged")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and few iterations")
+    args = parser.parse_args(argv)
+    if args.quick:
+        if args.sizes == DEFAULT_SIZES:
+            args.sizes = "50,500"
+        if args.resolutions == DEFAULT_RESOLUTIONS:
+            args.resolutions = "640x480"
+        args.iterations, args.video_iterations, args.warmup = 10, 1, 1
+        args.video_seconds = 4.0
+    return args
+
+
+def _resolution(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def plan(args, data_dir: str, server: LocalFileServer) -> List[Dict[str, Any]]:
+    """
+    Write the synthetic inputs and build one spec per stage and parameter
+    set.
+    """
+    selected = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(unknown)} (known: {', '.join(STAGES)})")
+
+    common = {
+        "repo": REPO_ROOT,
+        "engine": args.engine,
+        "insightface_root": os.path.abspath(args.insightface_root),
+        "insightface_model": args.insightface_model,
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+    }
+
+    galleries = {}
+
+    def gallery(students: int):
+        if students not in galleries:
+            model_url, identities = write_section_model(data_dir, server.base_url, students, students)
+            identities_path = os.path.join(data_dir, f"identities_{students}.npy")
+            np.save(identities_path, identities)
+            galleries[students] = {"model_url": model_url, "identities_path": identities_path, "students": students}
+        return galleries[students]
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    specs = []
+    for stage in selected:
+        if stage == "backend.detect_faces":
+            for resolution in args.resolutions.split(","):
+                width, height = _resolution(resolution)
+                frame_path = os.path.join(data_dir, f"frame_{width}x{height}.npy")
+                if not os.path.exists(frame_path):
+                    np.save(frame_path, make_frame(width, height, args.faces))
+                specs.append({
+                    **common, **gallery(args.faces), "stage": stage,
+                    "name": f"{stage}[{width}x{height},faces={args.faces}]",
+                    "frame_path": frame_path, "faces": args.faces,
+                })
+        elif stage == "backend.find_matching_face":
+            for students in sizes:
+                for batch in (1, args.faces):
+                    specs.append({
+                        **common, **gallery(students), "stage": stage, "batch": batch,
+                        "name": f"{stage}[students={students},batch={batch}]",
+                    })
+        elif stage in ("backend.load_model_from_url", "worker.load_model_from_url"):
+            for students in sizes:
+                for cache in ("cold", "warm"):
+                    specs.append({
+                        **common, **gallery(students), "stage": stage, "cache": cache,
+                        "name": f"{stage}[students={students},{cache}]",
+                    })
+        elif stage == "worker.score_capture":
+            for students in sizes:
+                specs.append({
+                    **common, **gallery(students), "stage": stage, "frames": 10,
+                    "name": f"{stage}[students={students},frames=10x{FACES_PER_FRAME}]",
+                })
+        elif stage == "worker.analyze_video_file":
+            width, height = _resolution(args.video_resolution)
+            video_path = os.path.join(data_dir, f"class_{width}x{height}.avi")
+            if not os.path.exists(video_path):
+                write_video(video_path, width, height, args.faces, args.video_seconds)
+            for sampling_mode, tracking in (("stride", False), ("stride", True), ("keyframe", True)):
+                specs.append({
+                    **common, **gallery(VIDEO_STUDENTS), "stage": stage,
+                    "iterations": args.video_iterations, "warmup": min(1, args.warmup),
+                    "video_path": video_path, "skip_frames": 30,
+                    "sampling_mode": sampling_mode, "tracking": tracking,
+                    "name": f"{stage}[{width}x{height},{args.video_seconds:g}s,{sampling_mode},tracking={'on' if tracking else 'off'}]",
+                })
+    return specs
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    if "skipped" in result:
+        print(f"  {result['name']:<72} skipped: {result['skipped']}")
+    elif "error" in result:
+        print(f"  {result['name']:<72} ERROR: {result['error']}")
+    else:
+        print(
+            f"  {result['name']:<72} {result['throughput_per_s']:>10.1f}/s"
+            f"  p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms"
+            f"  rss {result['peak_rss_mb']:>7.1f} MiB"
+        )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="classedgee-bench-") as data_dir, LocalFileServer(data_dir) as server:
+        specs = plan(args, data_dir, server)
+        print(f"Running {len(specs)} benchmarks (engine={args.engine})")
+        for spec in specs:
+            result = {"name": spec["name"], "stage": spec["stage"], **run_isolated(run_stage, spec, args.stage_timeout)}
+            report["results"].append(result)
+            print_result(result)
+
+    commit = (report["environment"]["commit"] or "nogit")[:10]
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    write_json(output, report)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+        write_json(output, report)
+        if regressions:
+            print(f"Regressions against {args.baseline} (> {args.tolerance:.0%}):")
+            for regression in regressions:
+                print(
+                    f"  {regression['name']:<72} {regression['metric']}: "
+                    f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.0%})"
+                )
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Benchmark stages for the face recognition hot paths.
+
+Each stage is a function taking the stage spec built by run.py and
+returning the measurement dict from harness.measure() plus stage-specific
+details. Stages run in their own spawned process (see harness.run_isolated)
+and import the service they measure from the repository checkout:
+
+- backend.*: python-backend/app/routes (InsightFaceService)
+- worker.*: ml-worker/worker.py
+
+Galleries, frames and videos come from the data directory prepared by
+run.py; section models are downloaded from its local file server.
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+ENGINE_SYNTHETIC = "synthetic"
+ENGINE_INSIGHTFACE = "insightface"
+
+FACES_PER_FRAME = 30
+CONFIDENCE_THRESHOLD = 0.6
+
+
+class StageSkipped(Exception):
+    pass
+
+
+def _import_backend(spec: Dict[str, Any]):
+    # Models are served by the local file server; keep the cache in memory
+    os.environ["MODEL_CACHE_DIR"] = ""
+    sys.path.insert(0, os.path.join(spec["repo"], "python-backend", "app"))
+    try:
+        from routes import insightface_service
+    except ImportError as error:
+        raise StageSkipped(f"python-backend dependency missing: {error}")
+    return insightface_service
+
+
+def _import_worker(spec: Dict[str, Any], **env: str):
+    os.environ.update({
+        "MODEL_CACHE_DIR": "",
+        "CAPTURE_CACHE_DIR": "",
+        "RESULT_STORE_PATH": "",
+        "INSIGHTFACE_MODEL_ROOT": spec["insightface_root"],
+        **env,
+    })
+    sys.path.insert(0, os.path.join(spec["repo"], "ml-worker"))
+    try:
+        import worker
+    except ImportError as error:
+        raise StageSkipped(f"ml-worker dependency missing: {error}")
+    return worker
+
+
+def _identities(spec: Dict[str, Any]) -> np.ndarray:
+    return np.load(spec["identities_path"])
+
+
+def _queries(identities: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    # Noisy views of random students, like embeddings from a new capture
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(identities), size=count)
+    return (identities[picks] + 0.35 * rng.normal(size=(count, identities.shape[1]))).astype(np.float32)
+
+
+def _face_apps(spec: Dict[str, Any], count: int, create: Callable[[], Any]):
+    if spec["engine"] == ENGINE_SYNTHETIC:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from synthetic import SyntheticFaceApp
+
+        identities = _identities(spec) if spec.get("identities_path") else None
+        return [SyntheticFaceApp(identities, seed=index) for index in range(count)]
+
+    model_dir = os.path.join(spec["insightface_root"], "models", spec["insightface_model"])
+    if not os.path.isdir(model_dir):
+        # FaceAnalysis would try to download the pack; benchmarks stay offline
+        raise StageSkipped(f"InsightFace models not found in {model_dir}")
+    return [create() for _ in range(count)]
+
+
+def backend_detect_faces(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    service_module = _import_backend(spec)
+    from routes.face_detection import FACE_MODULES, FIXED_DET_SIZE, DetectionTimings
+
+    def create():
+        from insightface.app import FaceAnalysis
+
+        app = FaceAnalysis(
+            name=spec["insightface_model"],
+            root=spec["insightface_root"],
+            providers=["CPUExecutionProvider"],
+            allowed_modules=FACE_MODULES,
+        )
+        app.prepare(ctx_id=-1, det_size=FIXED_DET_SIZE)
+        return app
+
+    app = _face_apps(spec, 1, create)[0]
+    service = service_module.InsightFaceService()
+    frame = np.load(spec["frame_path"])
+    timings = DetectionTimings()
+    faces = []
+
+    def call():
+        faces[:] = service.detect_faces(frame, app=app, expected_faces=spec["faces"], timings=timings)
+        return 1
+
+    result = measure(call, spec["iterations"], spec["warmup"])
+    calls = max(1, timings.frames)
+    result.update({
+        "faces_found": len(faces),
+        "detection_mode": service_module.FACE_DETECTION_MODE,
+        "tiles_per_frame": round(timings.tiles / calls, 2),
+        "detection_ms_per_frame": round(timings.detection_ms / calls, 3),
+        "recognition_ms_per_frame": round(timings.recognition_ms / calls, 3),
+    })
+    return result
+
+
+def backend_find_matching_face(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    service_module = _import_backend(spec)
+    service = service_module.InsightFaceService()
+    service.similarity_threshold = CONFIDENCE_THRESHOLD
+    gallery = service.load_gallery(spec["model_url"])
+    if not len(gallery):
+        raise RuntimeError(f"Could not load {spec['model_url']}")
+    queries = _queries(_identities(spec), 256)
+    batch = spec.get("batch", 1)
+    cursor = [0]
+    matched = [0]
+
+    def call():
+        start = cursor[0]
+        cursor[0] = (start + batch) % (len(queries) - batch + 1)
+        if batch == 1:
+            results = [service.find_matching_face(queries[start], gallery)]
+        else:
+            results = service.find_matching_faces(list(queries[start:start + batch]), gallery)
+        matched[0] += sum(1 for match in results if match)
+        return batch
+
+    result = measure(call, spec["iterations"], spec["warmup"])
+    result["match_rate"] = round(matched[0] / max(1, (spec["iterations"] + spec["warmup"]) * batch), 3)
+    result["gallery_rows"] = int(gallery.matrix.shape[0])
+    return result
+
+
+def backend_load_model_from_url(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    service_module = _import_backend(spec)
+    service = service_module.InsightFaceService()
+    loop = asyncio.new_event_loop()
+    cold = spec["cache"] == "cold"
+
+    def call():
+        if cold:
+            service_module.section_model_cache.clear()
+        known_faces = loop.run_until_complete(service.load_model_from_url(spec["model_url"]))
+        if not known_faces:
+            raise RuntimeError(f"Could not load {spec['model_url']}")
+        return 1
+
+    try:
+        result = measure(call, spec["iterations"], spec["warmup"])
+    finally:
+        loop.close()
+    result["model_cache"] = service_module.section_model_cache.stats()
+    return result
+
+
+def worker_load_model_from_url(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    worker = _import_worker(spec)
+    cold = spec["cache"] == "cold"
+
+    def call():
+        if cold:
+            worker._model_cache.clear()
+        enrollments, _ = worker.load_model_from_url(spec["model_url"])
+        if not enrollments:
+            raise RuntimeError(f"Could not load {spec['model_url']}")
+        return 1
+
+    result = measure(call, spec["iterations"], spec["warmup"])
+    result["model_cache"] = worker._model_cache.stats()
+    return result
+
+
+def worker_score_capture(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    worker = _import_worker(spec)
+    from capture_cache import CaptureAnalysis
+
+    enrollments, embeddings = worker.load_model_from_url(spec["model_url"])
+    known_normalized = worker.normalize_rows(embeddings.astype(np.float32))
+    queries = _queries(_identities(spec), spec["frames"] * FACES_PER_FRAME)
+    analysis = CaptureAnalysis("video", np.split(queries, spec["frames"]))
+    matched = [0]
+
+    def call():
+        matches_map = {}
+        worker.score_capture(analysis, 0, enrollments, known_normalized, CONFIDENCE_THRESHOLD, matches_map)
+        matched[0] = len(matches_map)
+        return len(queries)
+
+    result = measure(call, spec["iterations"], spec["warmup"])
+    result["students_matched"] = matched[0]
+    return result
+
+
+def worker_analyze_video_file(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from harness import measure
+
+    worker = _import_worker(spec, FACE_TRACKING="1" if spec["tracking"] else "0")
+    from face_detection import DetectionTimings
+
+    apps = _face_apps(spec, worker.VIDEO_PIPELINE_WORKERS, worker.create_face_app)
+    worker._face_app = apps[0]
+    worker._extra_face_apps[:] = apps[1:]
+
+    enrollments, embeddings = worker.load_model_from_url(spec["model_url"])
+    known_normalized = worker.normalize_rows(embeddings.astype(np.float32))
+
+    def below_threshold(embedding):
+        query = worker.normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        return float(np.max(known_normalized @ query.T)) < CONFIDENCE_THRESHOLD
+
+    timings = DetectionTimings()
+    totals = {}
+    last = {}
+
+    def call():
+        totals.update({"frames_decoded": 0, "frames_analyzed": 0, "fallback": None, "faces_detected": 0, "embeddings_computed": 0})
+        analysis = worker.analyze_video_file(
+            spec["video_path"],
+            spec["skip_frames"],
+            spec["sampling_mode"],
+            1.0,
+            totals,
+            below_threshold,
+            len(set(enrollments)),
+            timings,
+        )
+        if analysis is None:
+            raise RuntimeError(f"Could not read {spec['video_path']}")
+        matches_map = {}
+        worker.score_capture(analysis, 0, enrollments, known_normalized, CONFIDENCE_THRESHOLD, matches_map)
+        last.update(totals, students_matched=len(matches_map))
+        return len(analysis.frames)
+
+    result = measure(call, spec["iterations"], spec["warmup"])
+    calls = spec["iterations"] + spec["warmup"]
+    result.update({
+        "throughput_unit": "analyzed frames",
+        "frames_decoded": last.get("frames_decoded"),
+        "faces_detected": last.get("faces_detected"),
+        "embeddings_computed": last.get("embeddings_computed"),
+        "students_matched": last.get("students_matched"),
+        "detection_ms_per_video": round(timings.detection_ms / calls, 2),
+        "recognition_ms_per_video": round(timings.recognition_ms / calls, 2),
+    })
+    return result
+
+
+STAGES = {
+    "backend.detect_faces": backend_detect_faces,
+    "backend.find_matching_face": backend_find_matching_face,
+    "backend.load_model_from_url": backend_load_model_from_url,
+    "worker.load_model_from_url": worker_load_model_from_url,
+    "worker.score_capture": worker_score_capture,
+    "worker.analyze_video_file": worker_analyze_video_file,
+}
+
+
+def run_stage(spec: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return STAGES[spec["stage"]](spec)
+    except StageSkipped as reason:
+        return {"skipped": str(reason)}
+    except ImportError as error:
+        return {"skipped": f"dependency missing: {error}"}
@@ -0,0 +1,236 @@
+"""
+Synthetic inputs for the face pipeline benchmarks.
+
+- Galleries: `n_students` enrollments with a few noisy views each, written
+  as a section model manifest (base segment plus delta segments) in the
+  embedding store format, exactly as the services publish them.
+- Frames and videos: a noisy classroom-grey background with one red
+  ellipse per "face". The centre of every ellipse carries the student's
+  gallery index in its blue/green channels, so the synthetic engine below
+  can tell who it is looking at after video compression.
+- SyntheticFaceApp: a stand-in for a prepared FaceAnalysis with the two
+  entry points the services call (`det_model.detect` and
+  `models["recognition"].get`). It finds the ellipses with a colour mask and
+  returns the student's gallery embedding plus noise, so the pipeline code
+  around the models (sampling, tiling, tracking, matching) is measured
+  without the ONNX models being installed.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+EMBEDDING_DIM = 512
+VIEWS_PER_STUDENT = 3
+FACE_COLOR = (0, 0, 230)  # BGR
+_ID_LEVEL = 8
+_ID_LEVELS = 256 // _ID_LEVEL
+
+
+def enrollment_name(index: int) -> str:
+    return f"BENCH{index:05d}"
+
+
+def make_gallery(n_students: int, views: int = VIEWS_PER_STUDENT, seed: int = 0) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Random gallery: one identity vector per student and `views` noisy views.
+
+    Returns:
+        (row enrollments, (n_students * views, D) rows, (n_students, D)
+        identity vectors)
+    """
+    rng = np.random.default_rng(seed)
+    identities = rng.normal(size=(n_students, EMBEDDING_DIM)).astype(np.float32)
+    rows = np.repeat(identities, views, axis=0)
+    rows += 0.35 * rng.normal(size=rows.shape).astype(np.float32)
+    enrollments = [enrollment_name(i) for i in range(n_students) for _ in range(views)]
+    return enrollments, rows, identities
+
+
+def write_section_model(
+    directory: str,
+    base_url: str,
+    section_id: int,
+    n_students: int,
+    deltas: int = 2,
+    seed: int = 0,
+) -> Tuple[str, np.ndarray]:
+    """
+    Write a manifest plus segments for one synthetic section.
+
+    The base segment holds most students and each delta a few more, like a
+    section that had late registrations since its last compaction.
+
+    Returns:
+        (manifest URL, identity vectors)
+    """
+    from embedding_store import EmbeddingStore
+    from model_log import SectionModelManifest
+
+    enrollments, rows, identities = make_gallery(n_students, seed=seed)
+    per_delta = max(1, n_students // 20) if deltas else 0
+    base_students = max(1, n_students - per_delta * deltas)
+    bounds = [0, base_students] + [min(n_students, base_students + per_delta * (i + 1)) for i in range(deltas)]
+
+    manifest = SectionModelManifest(section_id=section_id)
+    version = 0
+    for segment, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        if end <= start:
+            continue
+        version += 1
+        row_slice = slice(start * VIEWS_PER_STUDENT, end * VIEWS_PER_STUDENT)
+        store = EmbeddingStore.from_rows(enrollments[row_slice], rows[row_slice])
+        name = f"section_{section_id}_{'base' if segment == 0 else 'delta'}_v{version}.cef"
+        store.save(os.path.join(directory, name))
+        url = f"{base_url}/{name}"
+        if segment == 0:
+            manifest.base_url, manifest.base_rows = url, len(store.row_enrollments())
+        else:
+            manifest = manifest.with_delta(version, url, len(store.row_enrollments()))
+    manifest.model_version = version
+
+    manifest_name = f"section_{section_id}_v{version}.json"
+    with open(os.path.join(directory, manifest_name), "wb") as f:
+        f.write(manifest.to_bytes())
+    return f"{base_url}/{manifest_name}", identities
+
+
+def face_layout(width: int, height: int, n_faces: int, seed: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Seat positions (x, y, face width) on a grid, smaller towards the back
+    rows like a shot from the front of a classroom.
+    """
+    rng = np.random.default_rng(seed)
+    columns = max(1, int(np.ceil(np.sqrt(n_faces * width / max(height, 1)))))
+    rows = max(1, int(np.ceil(n_faces / columns)))
+    seats = []
+    for index in range(n_faces):
+        row, column = divmod(index, columns)
+        depth = (row + 1) / rows
+        face_px = int(max(12, min(width / columns, height / rows) * (0.35 + 0.3 * depth)))
+        x = int((column + 0.5) * width / columns + rng.uniform(-0.1, 0.1) * width / columns)
+        y = int((row + 0.5) * height / rows)
+        seats.append((x, y, face_px))
+    return seats
+
+
+def draw_face(frame: np.ndarray, seat: Tuple[int, int, int], student: int, offset: Tuple[float, float] = (0.0, 0.0)) -> None:
+    x, y, face_px = seat
+    center = (int(x + offset[0] * face_px), int(y + offset[1] * face_px))
+    cv2.ellipse(frame, center, (face_px // 2, int(face_px * 0.65)), 0, 0, 360, FACE_COLOR, -1)
+    # Student index in the centre patch: blue = low digit, green = high
+    low, high = student % _ID_LEVELS, student // _ID_LEVELS
+    half = max(2, face_px // 6)
+    color = (low * _ID_LEVEL + _ID_LEVEL // 2, high * _ID_LEVEL + _ID_LEVEL // 2, 230)
+    cv2.rectangle(frame, (center[0] - half, center[1] - half), (center[0] + half, center[1] + half), color, -1)
+
+
+def background(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    frame = np.full((height, width, 3), 110, dtype=np.uint8)
+    frame += rng.integers(0, 24, size=(height, width, 1), dtype=np.uint8)
+    return frame
+
+
+def make_frame(width: int, height: int, n_faces: int, seed: int = 0) -> np.ndarray:
+    frame = background(width, height, np.random.default_rng(seed))
+    for student, seat in enumerate(face_layout(width, height, n_faces, seed)):
+        draw_face(frame, seat, student)
+    return frame
+
+
+def write_video(
+    path: str,
+    width: int,
+    height: int,
+    n_faces: int,
+    seconds: float,
+    fps: int = 30,
+    seed: int = 0,
+) -> int:
+    """
+    Write an MJPG .avi with faces that sway slightly, like seated students.
+
+    Returns:
+        Number of frames written
+    """
+    rng = np.random.default_rng(seed)
+    seats = face_layout(width, height, n_faces, seed)
+    phases = rng.uniform(0, 2 * np.pi, size=n_faces)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write video to {path}")
+    total = int(seconds * fps)
+    try:
+        for index in range(total):
+            frame = background(width, height, rng)
+            for student, (seat, phase) in enumerate(zip(seats, phases)):
+                draw_face(frame, seat, student, (0.15 * np.sin(0.8 * index / fps + phase), 0.0))
+            writer.write(frame)
+    finally:
+        writer.release()
+    return total
+
+
+class _SyntheticDetector:
+    def __init__(self, input_size: Tuple[int, int]):
+        self.input_size = input_size
+
+    def detect(self, img, input_size=None, max_num=0, metric="default"):
+        # Work at the requested input size like SCRFD, so adaptive sizing
+        # and tiling change the cost the same way
+        width, height = input_size or self.input_size
+        scale = min(width / img.shape[1], height / img.shape[0])
+        resized = cv2.resize(img, (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale))))
+        red = resized[:, :, 2].astype(np.int16)
+        mask = ((red > 170) & (red - resized[:, :, 1] > 60)).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        boxes = []
+        for label in range(1, count):
+            x, y, w, h, area = stats[label]
+            if w < 6 or h < 6 or area < 24:
+                continue
+            boxes.append([x / scale, y / scale, (x + w) / scale, (y + h) / scale, 0.9])
+        bboxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 5)
+        return bboxes, np.zeros((len(bboxes), 5, 2), dtype=np.float32)
+
+
+class _SyntheticRecognizer:
+    def __init__(self, identities: np.ndarray, seed: int = 0):
+        self.identities = identities
+        self.rng = np.random.default_rng(seed)
+        # Stands in for the ArcFace forward pass: one 112x112 crop through
+        # a dense projection
+        self.projection = self.rng.normal(size=(112 * 112, 16)).astype(np.float32)
+
+    def get(self, img, face):
+        x1, y1, x2, y2 = [int(v) for v in face.bbox[:4]]
+        crop = img[max(0, y1):max(y1 + 1, y2), max(0, x1):max(x1 + 1, x2)]
+        gray = cv2.cvtColor(cv2.resize(crop, (112, 112)), cv2.COLOR_BGR2GRAY).astype(np.float32)
+        _ = gray.reshape(1, -1) @ self.projection
+
+        cy, cx = crop.shape[0] // 2, crop.shape[1] // 2
+        patch = crop[max(0, cy - 1):cy + 2, max(0, cx - 1):cx + 2].reshape(-1, 3).mean(axis=0)
+        student = int(patch[1] // _ID_LEVEL) * _ID_LEVELS + int(patch[0] // _ID_LEVEL)
+        if len(self.identities):
+            base = self.identities[student % len(self.identities)]
+        else:
+            base = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        face.embedding = base + 0.35 * self.rng.normal(size=EMBEDDING_DIM).astype(np.float32)
+        return face.embedding
+
+
+class SyntheticFaceApp:
+    def __init__(self, identities: Optional[np.ndarray] = None, det_size: Tuple[int, int] = (320, 320), seed: int = 0):
+        identities = identities if identities is not None else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.det_model = _SyntheticDetector(det_size)
+        self.models: Dict[str, object] = {"recognition": _SyntheticRecognizer(identities, seed)}
+
+
+def write_json(path: str, data) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
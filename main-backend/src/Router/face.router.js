@@ -1,6 +1,7 @@
 import express from "express";
 import {
   getFaceJobStatus,
+  queueFaceBatchRegistration,
   queueFaceClassProcessing,
   queueFaceRegistration,
 } from "../controllers/face.controller.js";
@@ -11,6 +12,7 @@ const router = express.Router();
 router.use(requireAuth);
 
 router.post("/register", queueFaceRegistration);
+router.post("/register-batch", queueFaceBatchRegistration);
 router.post("/process-class", queueFaceClassProcessing);
 router.get("/job/:jobId", getFaceJobStatus);
 
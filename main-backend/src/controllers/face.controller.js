@@ -125,6 +125,7 @@ export const queueFaceRegistration = async (req, res) => {
         section_id: student.section_id,
         student_id: student.student_id,
       },
+      payload,
     });
 
     await publishFaceJob(FACE_REGISTER_QUEUE, payload);
@@ -143,6 +144,101 @@ export const queueFaceRegistration = async (req, res) => {
   }
 };
 
+// Registers several students of one section in a single register_batch job;
+// the worker writes them as one model version
+export const queueFaceBatchRegistration = async (req, res) => {
+  try {
+    const sectionId = Number(req.body.section_id ?? req.body.sectionId);
+    const entries = Array.isArray(req.body.students) ? req.body.students : [];
+
+    if (!Number.isFinite(sectionId)) {
+      return res.status(400).json({
+        success: false,
+        message: "section_id is required",
+      });
+    }
+
+    const requested = entries.map((entry) => ({
+      enrollment: entry?.enrollment ? String(entry.enrollment) : null,
+      image_urls: normalizeImageUrls(entry || {}),
+    }));
+    if (
+      requested.length === 0 ||
+      requested.some((entry) => !entry.enrollment || entry.image_urls.length === 0)
+    ) {
+      return res.status(400).json({
+        success: false,
+        message: "students is required and every entry needs an enrollment and imageUrls",
+      });
+    }
+
+    const section = await prisma.sections.findUnique({
+      where: { section_id: sectionId },
+      select: {
+        face_recognition_model: true,
+      },
+    });
+    if (!section) {
+      return res.status(404).json({
+        success: false,
+        message: "Section not found",
+      });
+    }
+
+    const enrolled = await prisma.students.findMany({
+      where: {
+        section_id: sectionId,
+        enrollment_number: { in: requested.map((entry) => entry.enrollment) },
+      },
+      select: { enrollment_number: true },
+    });
+    const enrolledSet = new Set(enrolled.map((student) => student.enrollment_number));
+    const unknown = requested.filter((entry) => !enrolledSet.has(entry.enrollment));
+    if (unknown.length > 0) {
+      return res.status(400).json({
+        success: false,
+        message: "Students not found in section",
+        enrollments: unknown.map((entry) => entry.enrollment),
+      });
+    }
+
+    const jobId = uuidv4();
+    const payload = {
+      job_id: jobId,
+      job_type: "register_batch",
+      section_id: sectionId,
+      students: requested,
+      current_model_url: section.face_recognition_model || null,
+    };
+
+    // The payload is kept so the job can be re-queued if its model loses
+    // the compare-and-set against another registration
+    createFaceJob({
+      jobId,
+      jobType: "register_batch",
+      payloadMeta: {
+        section_id: sectionId,
+        students: requested.length,
+      },
+      payload,
+    });
+
+    await publishFaceJob(FACE_REGISTER_QUEUE, payload);
+
+    return res.status(202).json({
+      success: true,
+      message: "Face batch registration job queued",
+      job_id: jobId,
+    });
+  } catch (error) {
+    return res.status(500).json({
+      success: false,
+      message: "Failed to queue face batch registration",
+      error: error.message,
+    });
+  }
+};
+
 export const queueFaceClassProcessing = async (req, res) => {
   try {
     const classId = Number(req.body.class_id ?? req.body.classId);
@@ -201,6 +297,7 @@ export const queueFaceClassProcessing = async (req, res) => {
       capture_urls: captureUrls,
       confidence_threshold: Number(req.body.confidence_threshold ?? 0.6),
       attendance_date: req.body.attendance_date || null,
+      deadline: req.body.deadline || null,
     };
 
     createFaceJob({
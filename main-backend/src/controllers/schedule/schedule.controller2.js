@@ -154,9 +154,30 @@ export const fetchData = async () => {
 };
 
 
+// CP-SAT options the scheduler accepts (see SolverOptions in
+// python-backend/app/schedule/models.py)
+const SOLVER_OPTION_KEYS = [
+    "time_limit_seconds",
+    "num_workers",
+    "relative_gap_limit",
+    "random_seed",
+    "stop_after_first_solution",
+    "log_search_progress",
+];
+
+const pickSolverOptions = (solver) => {
+    const options = {};
+    for (const key of SOLVER_OPTION_KEYS) {
+        if (solver[key] !== undefined && solver[key] !== null) {
+            options[key] = solver[key];
+        }
+    }
+    return options;
+};
+
 const generateSchedule = async (req, res) => {
     try {
-        const { created_by, semester_weeks } = req.body;
+        const { created_by, semester_weeks, solver } = req.body;
         if (!created_by) {
             return res.status(400).json({
                 success: false,
@@ -170,6 +191,12 @@ const generateSchedule = async (req, res) => {
             Number.isFinite(Number(semester_weeks)) && Number(semester_weeks) > 0
                 ? Number(semester_weeks)
                 : 16;
+        // Optional CP-SAT options (time limit, workers, gap, seed). Only the
+        // known options are forwarded; the scheduler rejects values above
+        // its limits
+        if (solver && typeof solver === "object") {
+            data.solver = pickSolverOptions(solver);
+        }
 
         // Validate fetched data
         if (!data || !data.departments || Object.keys(data.departments).length === 0) {
@@ -193,12 +220,14 @@ const generateSchedule = async (req, res) => {
 
             const solverStatus = response.data.status || "feasible";
             const solverMessage = response.data.message || null;
+            const solverStats = response.data.stats || null;
 
             if (solverStatus === "infeasible") {
                 return res.status(422).json({
                     success: false,
                     message: solverMessage || "No feasible schedule could be generated for the given constraints.",
                     solver_status: "infeasible",
+                    solver_stats: solverStats,
                 });
             }
 
@@ -227,6 +256,7 @@ const generateSchedule = async (req, res) => {
                 success: true,
                 message: "Schedule generated successfully",
                 solver_status: solverStatus,
+                solver_stats: solverStats,
                 data: savedSchedule,
             });
         } catch (error) {
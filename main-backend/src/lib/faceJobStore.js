@@ -1,8 +1,11 @@
 const faceJobs = new Map();
+// job_id -> payload as published, kept so a job can be re-queued; not part
+// of the job status returned to clients
+const jobPayloads = new Map();
 
 const nowIso = () => new Date().toISOString();
 
-export const createFaceJob = ({ jobId, jobType, payloadMeta = {} }) => {
+export const createFaceJob = ({ jobId, jobType, payloadMeta = {}, payload = null }) => {
   const createdAt = nowIso();
   const job = {
     job_id: jobId,
@@ -16,6 +19,9 @@ export const createFaceJob = ({ jobId, jobType, payloadMeta = {} }) => {
   };
 
   faceJobs.set(jobId, job);
+  if (payload) {
+    jobPayloads.set(jobId, payload);
+  }
   return job;
 };
 
@@ -36,3 +42,13 @@ export const updateFaceJob = (jobId, patch) => {
 };
 
 export const getFaceJob = (jobId) => faceJobs.get(jobId) || null;
+
+export const getFaceJobPayload = (jobId) => jobPayloads.get(jobId) || null;
+
+export const setFaceJobPayload = (jobId, payload) => {
+  jobPayloads.set(jobId, payload);
+};
+
+export const dropFaceJobPayload = (jobId) => {
+  jobPayloads.delete(jobId);
+};
@@ -48,7 +48,10 @@ export const publishFaceJob = async (queueName, payload) => {
   const channel = await getFaceQueueChannel();
   await assertFaceQueues(channel);
 
-  return channel.sendToQueue(queueName, Buffer.from(JSON.stringify(payload)), {
+  // The worker reports queue wait from this timestamp (epoch ms).
+  const message = { ...payload, enqueued_at: Date.now() };
+
+  return channel.sendToQueue(queueName, Buffer.from(JSON.stringify(message)), {
     contentType: "application/json",
     persistent: true,
   });
@@ -1,5 +1,11 @@
 import { PrismaClient } from "@prisma/client";
-import { updateFaceJob } from "./faceJobStore.js";
+import {
+  dropFaceJobPayload,
+  getFaceJobPayload,
+  setFaceJobPayload,
+  updateFaceJob,
+} from "./faceJobStore.js";
+import { FACE_REGISTER_QUEUE, publishFaceJob } from "./faceQueue.js";
 
 const prisma = new PrismaClient();
 
@@ -48,24 +54,109 @@ const decideAttendance = (match) => {
   };
 };
 
+const parseModelVersion = (modelUrl) => {
+  const match = /_v(\d+)\.(?:npz|cef|json)/.exec(modelUrl || "");
+  return match ? Number(match[1]) : 0;
+};
+
+// Returns false when the registration lost the race for the section's model
 const handleRegisterResult = async (payload) => {
   if (payload.status !== "success") {
-    return;
+    return true;
   }
 
   const sectionId = toNumber(payload.section_id, NaN);
   const modelUrl = payload.model_url;
 
   if (!Number.isFinite(sectionId) || !modelUrl) {
-    return;
+    return true;
   }
 
-  await prisma.sections.update({
+  // Compare-and-set: the model was built on top of `based_on` and only
+  // replaces it if no other registration or compaction landed meanwhile
+  if ("based_on" in payload) {
+    const { count } = await prisma.sections.updateMany({
+      where: { section_id: sectionId, face_recognition_model: payload.based_on || null },
+      data: {
+        face_recognition_model: modelUrl,
+      },
+    });
+    return count > 0;
+  }
+
+  const section = await prisma.sections.findUnique({
     where: { section_id: sectionId },
+    select: { face_recognition_model: true },
+  });
+  if (!section) {
+    return true;
+  }
+
+  // Results of workers without `based_on` can arrive out of order; never
+  // replace a newer model version
+  const currentModelUrl = section.face_recognition_model;
+  const incomingVersion = toNumber(payload.model_version, parseModelVersion(modelUrl));
+  if (currentModelUrl && parseModelVersion(currentModelUrl) >= incomingVersion) {
+    return true;
+  }
+
+  await prisma.sections.updateMany({
+    where: { section_id: sectionId, face_recognition_model: currentModelUrl },
     data: {
       face_recognition_model: modelUrl,
     },
   });
+  return true;
+};
+
+// Re-queue a registration whose model lost the compare-and-set, on top of
+// the section's current model. Returns false once the attempts run out.
+const retryRegisterJob = async (jobId, sectionId) => {
+  const original = jobId ? getFaceJobPayload(jobId) : null;
+  if (!original) {
+    // Only jobs queued through this gateway (register, register_batch)
+    // keep their payload, and only until a restart
+    console.warn(
+      `Face registration ${jobId || "without job_id"} lost its model update and cannot be re-queued`
+    );
+    return false;
+  }
+  const attempt = toNumber(original.attempt, 0) + 1;
+  if (attempt >= toNumber(process.env.FACE_REGISTER_MAX_ATTEMPTS, 5)) {
+    return false;
+  }
+
+  const section = await prisma.sections.findUnique({
+    where: { section_id: toNumber(sectionId, NaN) },
+    select: { face_recognition_model: true },
+  });
+  const retry = {
+    ...original,
+    attempt,
+    current_model_url: section?.face_recognition_model || null,
+  };
+  setFaceJobPayload(jobId, retry);
+  await publishFaceJob(FACE_REGISTER_QUEUE, retry);
+  return true;
+};
+
+const handleCompactResult = async (payload) => {
+  if (payload.status !== "success" || !payload.model_url || !payload.compacted_from) {
+    return;
+  }
+
+  const sectionId = toNumber(payload.section_id, NaN);
+  if (!Number.isFinite(sectionId)) {
+    return;
+  }
+
+  // Only swap in the compacted model if no registration landed meanwhile
+  await prisma.sections.updateMany({
+    where: { section_id: sectionId, face_recognition_model: payload.compacted_from },
+    data: {
+      face_recognition_model: payload.model_url,
+    },
+  });
 };
 
 const handleRecognizeResult = async (payload) => {
@@ -139,19 +230,42 @@ export const processFaceResultMessage = async (payload) => {
   const jobId = payload.job_id || payload.jobId;
   const jobType = payload.job_type || payload.jobType;
 
-  if (jobType === "register") {
-    await handleRegisterResult(payload);
+  if (jobType === "register" || jobType === "register_batch") {
+    const applied = await handleRegisterResult(payload);
+    if (!applied) {
+      if (await retryRegisterJob(jobId, payload.section_id)) {
+        if (jobId) {
+          updateFaceJob(jobId, { status: "queued" });
+        }
+        return;
+      }
+      payload = {
+        ...payload,
+        status: "failed",
+        error: "Section model changed during registration; retry the registration",
+      };
+    }
   }
 
   if (jobType === "recognize") {
     await handleRecognizeResult(payload);
   }
 
+  if (jobType === "compact") {
+    await handleCompactResult(payload);
+  }
+
   if (jobId) {
+    dropFaceJobPayload(jobId);
     updateFaceJob(jobId, {
       status: payload.status === "success" ? "completed" : "failed",
       result: payload.status === "success" ? payload : null,
       error: payload.status === "success" ? null : payload.error || "Worker job failed",
+      timings: {
+        queue_wait_ms: payload.queue_wait_ms ?? null,
+        processing_ms: payload.processing_ms ?? null,
+        deadline_missed: payload.deadline_missed ?? null,
+      },
     });
   }
 };
@@ -0,0 +1,149 @@
+"""
+On-disk cache of the face embeddings detected in each capture.
+
+Re-running recognition on the same captures (another confidence threshold,
+or a section model updated after a late registration) used to download
+every capture again and rerun detection and embedding on every frame.
+Detection does not depend on the section model or the threshold, so the
+worker keeps, per capture, the embeddings of every analyzed frame; a rerun
+only has to score them against the gallery, which is one matrix product.
+
+Entries are addressed by a SHA-256 of the capture URL plus everything that
+changes what is detected (detector model and input size, and for videos
+the sampling and tracking parameters). With tracking on, faces are
+re-embedded until they match the section model at the job's threshold, so
+the key then also holds the threshold and the model URL; untracked entries
+are reused across both. Each entry is one .npz file written atomically, so the inference
+processes can share the directory. The directory is trimmed to
+`max_bytes`, least recently used first.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_SUFFIX = ".npz"
+
+
+class CaptureAnalysis:
+    # Embeddings of every analyzed frame of one capture, in frame order.
+    # `frames[i]` is an (F_i, D) float32 array (F_i may be 0).
+    def __init__(self, kind, frames, frames_decoded=0, fallback=None):
+        self.kind = kind
+        self.frames = frames
+        self.frames_decoded = int(frames_decoded)
+        self.fallback = fallback
+
+    def to_bytes(self):
+        dim = next((frame.shape[1] for frame in self.frames if frame.ndim == 2 and frame.shape[1]), 512)
+        counts = np.asarray([frame.shape[0] for frame in self.frames], dtype=np.int64)
+        embeddings = (
+            np.concatenate([frame.reshape(-1, dim) for frame in self.frames]).astype(np.float32)
+            if counts.sum() else np.empty((0, dim), dtype=np.float32)
+        )
+        meta = json.dumps({
+            "kind": self.kind,
+            "frames_decoded": self.frames_decoded,
+            "fallback": self.fallback,
+        })
+        buffer = io.BytesIO()
+        np.savez(buffer, embeddings=embeddings, counts=counts, meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+            embeddings = data["embeddings"]
+            counts = data["counts"]
+            meta = json.loads(bytes(data["meta"]).decode("utf-8"))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        frames = [embeddings[offsets[i]:offsets[i + 1]] for i in range(len(counts))]
+        return cls(meta["kind"], frames, meta.get("frames_decoded", 0), meta.get("fallback"))
+
+
+class CaptureEmbeddingCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        os.makedirs(directory, exist_ok=True)
+        self._approx_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(capture_url, **analysis):
+        canonical = json.dumps({"url": capture_url, **analysis}, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                analysis = CaptureAnalysis.from_bytes(f.read())
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return analysis
+
+    def put(self, key, analysis):
+        payload = analysis.to_bytes()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if self._approx_bytes is None:
+            self._approx_bytes = self._directory_bytes()
+        else:
+            self._approx_bytes += len(payload)
+        if self._approx_bytes > self.max_bytes:
+            self._trim()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _directory_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _trim(self):
+        # Other processes write to the same directory, so the size is
+        # recounted from disk; trims to 90% to avoid trimming on every put
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                continue
+        self._approx_bytes = total
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
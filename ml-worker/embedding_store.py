@@ -0,0 +1,340 @@
+"""
+Memory-mappable section model format.
+
+A section model is a few hundred 512-d embeddings grouped by enrollment.
+Pickling them as dicts of Python lists makes every load a full
+deserialization plus a per-embedding array conversion. This format keeps
+the embeddings as one contiguous block that numpy can use in place:
+
+    offset  size  field
+    0       8     magic b"CEFACES\\0"
+    8       2     format version (1)
+    10      2     dtype code (1 = float32, 2 = float16)
+    12      4     flags (bit 0: rows are L2-normalized)
+    16      4     embedding dimension
+    20      4     row count
+    24      4     enrollment count
+    28      4     enrollment table offset
+    32      4     enrollment names offset
+    36      4     enrollment names size
+    40      8     embedding block offset (64-byte aligned)
+    48      16    reserved
+
+The enrollment table holds (row_start, row_count, name_start, name_length)
+per enrollment as little-endian uint32; rows of one enrollment are
+contiguous. Names are UTF-8.
+
+Opening a file with EmbeddingStore.open() memory-maps it, and
+EmbeddingStore.from_buffer() wraps an in-memory payload; neither copies
+the embedding block.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"CEFACES\0"
+FORMAT_VERSION = 1
+FILE_EXTENSION = ".cef"
+
+FLAG_NORMALIZED = 1
+
+_HEADER = struct.Struct("<8sHHIIIIIIIQ16x")
+_ALIGNMENT = 64
+
+_DTYPE_CODES = {np.dtype(np.float32): 1, np.dtype(np.float16): 2}
+_CODE_DTYPES = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+
+_TABLE_DTYPE = np.dtype([
+    ("row_start", "<u4"),
+    ("row_count", "<u4"),
+    ("name_start", "<u4"),
+    ("name_length", "<u4"),
+])
+
+
+def is_embedding_store(payload) -> bool:
+    """
+    True if a bytes-like payload starts with the embedding store magic.
+    """
+    return bytes(memoryview(payload)[:len(MAGIC)]) == MAGIC
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class EmbeddingStore:
+    """
+    Section embeddings grouped by enrollment.
+
+    `embeddings` is an (N, D) array whose rows row_starts[i] to
+    row_starts[i] + row_counts[i] belong to enrollments[i]. When the store
+    was opened from a buffer or file it is a read-only view of that memory.
+    """
+
+    def __init__(
+        self,
+        enrollments: List[str],
+        row_starts: np.ndarray,
+        row_counts: np.ndarray,
+        embeddings: np.ndarray,
+        normalized: bool = False,
+    ):
+        if len(enrollments) != len(row_starts) or len(row_starts) != len(row_counts):
+            raise ValueError("Enrollment table is inconsistent")
+        if int(np.sum(row_counts)) != embeddings.shape[0]:
+            raise ValueError("Enrollment table does not cover the embedding block")
+
+        self.enrollments = enrollments
+        self.row_starts = row_starts
+        self.row_counts = row_counts
+        self.embeddings = embeddings
+        self.normalized = normalized
+        self._buffer = None
+
+    def __len__(self) -> int:
+        return len(self.enrollments)
+
+    @property
+    def dim(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.embeddings.nbytes + self.row_starts.nbytes + self.row_counts.nbytes)
+
+    @classmethod
+    def from_rows(
+        cls,
+        row_enrollments: Sequence[str],
+        embeddings: np.ndarray,
+        normalize: bool = True,
+    ) -> "EmbeddingStore":
+        """
+        Build a store from one enrollment label per embedding row.
+
+        Rows are grouped by enrollment (first occurrence order, stable within
+        an enrollment).
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1) if matrix.size else matrix.reshape(0, 512)
+        elif matrix.ndim != 2:
+            raise ValueError("Embeddings must be a 2-d array")
+        if len(row_enrollments) != matrix.shape[0]:
+            raise ValueError("One enrollment per embedding row is required")
+
+        positions: Dict[str, List[int]] = {}
+        for row_index, enrollment in enumerate(row_enrollments):
+            positions.setdefault(str(enrollment), []).append(row_index)
+
+        enrollments = list(positions)
+        order = [row for enrollment in enrollments for row in positions[enrollment]]
+        row_counts = np.asarray([len(positions[e]) for e in enrollments], dtype=np.uint32)
+        row_starts = np.zeros(len(enrollments), dtype=np.uint32)
+        if len(enrollments):
+            row_starts[1:] = np.cumsum(row_counts)[:-1]
+
+        grouped = np.ascontiguousarray(matrix[order])
+        if normalize and grouped.shape[0]:
+            norms = np.linalg.norm(grouped, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            grouped = grouped / norms
+        return cls(enrollments, row_starts, row_counts, grouped, normalized=normalize)
+
+    @classmethod
+    def from_known_faces(cls, known_faces: Dict[str, List[Dict]], normalize: bool = True) -> "EmbeddingStore":
+        """
+        Build a store from the enrollment -> [{'embedding': ...}] dict used
+        by the pickle section models. Entries without an embedding are skipped.
+        """
+        row_enrollments = []
+        rows = []
+        for enrollment, student_embeddings in known_faces.items():
+            for stored in student_embeddings:
+                embedding = stored.get('embedding')
+                if embedding is None:
+                    continue
+                row_enrollments.append(enrollment)
+                rows.append(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        matrix = np.vstack(rows) if rows else np.empty((0, 512), dtype=np.float32)
+        return cls.from_rows(row_enrollments, matrix, normalize=normalize)
+
+    @classmethod
+    def merge(cls, stores: Sequence["EmbeddingStore"]) -> "EmbeddingStore":
+        """
+        Combine stores in order into one normalized float32 store.
+
+        An enrollment present in several stores keeps only the rows of the
+        last one, so a re-registration replaces the earlier embeddings.
+        """
+        latest: Dict[str, Tuple[int, int]] = {}
+        for store_index, store in enumerate(stores):
+            for enrollment_index, enrollment in enumerate(store.enrollments):
+                latest[enrollment] = (store_index, enrollment_index)
+
+        dim = next((store.dim for store in stores if store.embeddings.shape[0]), 512)
+        blocks = []
+        for store_index, enrollment_index in latest.values():
+            store = stores[store_index]
+            block = store.rows(enrollment_index).astype(np.float32)
+            if not store.normalized and block.shape[0]:
+                norms = np.linalg.norm(block, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                block = block / norms
+            blocks.append(block)
+
+        row_counts = np.asarray([block.shape[0] for block in blocks], dtype=np.uint32)
+        row_starts = np.zeros(len(blocks), dtype=np.uint32)
+        if len(blocks):
+            row_starts[1:] = np.cumsum(row_counts)[:-1]
+        embeddings = (
+            np.ascontiguousarray(np.concatenate(blocks), dtype=np.float32)
+            if blocks else np.empty((0, dim), dtype=np.float32)
+        )
+        return cls(list(latest), row_starts, row_counts, embeddings, normalized=True)
+
+    @classmethod
+    def from_buffer(cls, payload) -> "EmbeddingStore":
+        """
+        Wrap a serialized store without copying the embedding block.
+
+        Args:
+            payload: bytes, memoryview, mmap or np.memmap holding the file
+
+        Raises:
+            ValueError: If the payload is not a valid embedding store
+        """
+        buffer = np.frombuffer(payload, dtype=np.uint8)
+        if buffer.size < _HEADER.size:
+            raise ValueError("Embedding store is truncated")
+
+        (
+            magic, version, dtype_code, flags, dim, row_count, enrollment_count,
+            table_offset, names_offset, names_size, embeddings_offset
+        ) = _HEADER.unpack_from(buffer, 0)
+
+        if magic != MAGIC:
+            raise ValueError("Not an embedding store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store version: {version}")
+        if dtype_code not in _CODE_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype code: {dtype_code}")
+
+        dtype = _CODE_DTYPES[dtype_code]
+        embeddings_size = row_count * dim * dtype.itemsize
+        if embeddings_offset + embeddings_size > buffer.size:
+            raise ValueError("Embedding store is truncated")
+
+        table = np.frombuffer(
+            buffer, dtype=_TABLE_DTYPE, count=enrollment_count, offset=table_offset
+        )
+        names = bytes(buffer[names_offset:names_offset + names_size])
+        enrollments = [
+            names[start:start + length].decode("utf-8")
+            for start, length in zip(table["name_start"].tolist(), table["name_length"].tolist())
+        ]
+        embeddings = np.frombuffer(
+            buffer, dtype=dtype.newbyteorder("<"), count=row_count * dim, offset=embeddings_offset
+        ).reshape(row_count, dim)
+
+        store = cls(
+            enrollments,
+            table["row_start"],
+            table["row_count"],
+            embeddings,
+            normalized=bool(flags & FLAG_NORMALIZED),
+        )
+        # Keep the mapping alive as long as the views into it
+        store._buffer = payload
+        return store
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingStore":
+        """
+        Memory-map a store file; pages are read on first access.
+        """
+        return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    def to_bytes(self, dtype=np.float32) -> bytes:
+        """
+        Serialize the store, storing embeddings as float32 or float16.
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in _DTYPE_CODES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+        encoded_names = [enrollment.encode("utf-8") for enrollment in self.enrollments]
+        table = np.zeros(len(self.enrollments), dtype=_TABLE_DTYPE)
+        table["row_start"] = self.row_starts
+        table["row_count"] = self.row_counts
+        name_lengths = np.asarray([len(encoded) for encoded in encoded_names], dtype=np.int64)
+        table["name_length"] = name_lengths
+        table["name_start"] = np.cumsum(name_lengths) - name_lengths
+        names = b"".join(encoded_names)
+
+        table_offset = _HEADER.size
+        names_offset = table_offset + table.nbytes
+        embeddings_offset = _align(names_offset + len(names))
+
+        block = np.ascontiguousarray(self.embeddings, dtype=dtype.newbyteorder("<"))
+        header = _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            _DTYPE_CODES[dtype],
+            FLAG_NORMALIZED if self.normalized else 0,
+            self.dim,
+            int(self.embeddings.shape[0]),
+            len(self.enrollments),
+            table_offset,
+            names_offset,
+            len(names),
+            embeddings_offset,
+        )
+        padding = b"\0" * (embeddings_offset - names_offset - len(names))
+        return b"".join([header, table.tobytes(), names, padding, block.tobytes()])
+
+    def save(self, path: str, dtype=np.float32) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes(dtype))
+
+    def rows(self, enrollment_index: int) -> np.ndarray:
+        start = int(self.row_starts[enrollment_index])
+        return self.embeddings[start:start + int(self.row_counts[enrollment_index])]
+
+    def row_enrollments(self) -> List[str]:
+        """
+        Enrollment label of every embedding row, in row order.
+        """
+        return [
+            enrollment
+            for enrollment, count in zip(self.enrollments, self.row_counts.tolist())
+            for _ in range(count)
+        ]
+
+    def to_known_faces(self) -> Dict[str, List[Dict]]:
+        """
+        enrollment -> [{'enrollment', 'embedding'}] dict, with embeddings as
+        views into the store.
+        """
+        return {
+            enrollment: [
+                {'enrollment': enrollment, 'embedding': row}
+                for row in self.rows(idx)
+            ]
+            for idx, enrollment in enumerate(self.enrollments)
+        }
+
+    def float32_embeddings(self) -> np.ndarray:
+        """
+        The embedding block as float32; a view when already stored as float32.
+        """
+        if self.embeddings.dtype == np.float32:
+            return self.embeddings
+        return self.embeddings.astype(np.float32)
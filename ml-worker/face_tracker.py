@@ -0,0 +1,143 @@
+"""
+IoU face tracking across the sampled frames of one video.
+
+In classroom footage most students barely move between sampled frames, so
+running the recognition model on every detection of every frame mostly
+recomputes the same embedding. FaceTracker links each frame's detections
+to the tracks of the previous frames by bounding-box IoU (greedy, highest
+IoU first) and only asks for a new embedding when
+
+- the detection starts a new track,
+- the box drifted away from where the track was last embedded, or
+- the track's embedding has not reached the confidence threshold yet
+  (`needs_refresh`), so a better view can still produce a match.
+
+Every other detection reuses its track's embedding, so callers still get
+one embedding per detected face per frame and can score frames exactly as
+before; best confidence and seen_in_frames carry forward per track.
+"""
+
+import numpy as np
+
+DEFAULT_IOU_THRESHOLD = 0.5
+DEFAULT_DRIFT_IOU = 0.6
+DEFAULT_MAX_MISSED = 2
+
+
+def box_iou(boxes_a, boxes_b):
+    # Pairwise IoU of (N, 4) and (M, 4) x1, y1, x2, y2 boxes
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(np.clip(boxes_a[:, 2:] - boxes_a[:, :2], 0, None), axis=1)
+    area_b = np.prod(np.clip(boxes_b[:, 2:] - boxes_b[:, :2], 0, None), axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+class FaceTrack:
+    def __init__(self, track_id, bbox, embedding, refresh):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.embedded_bbox = bbox
+        self.embedding = embedding
+        self.refresh = refresh
+        self.missed = 0
+
+
+class FaceTracker:
+    def __init__(
+        self,
+        embed,
+        needs_refresh=None,
+        iou_threshold=DEFAULT_IOU_THRESHOLD,
+        drift_iou=DEFAULT_DRIFT_IOU,
+        max_missed=DEFAULT_MAX_MISSED,
+    ):
+        # embed(detection) -> embedding for one detection of the current
+        # frame; needs_refresh(embedding) -> True while a track should be
+        # re-embedded on its next detection
+        self.embed = embed
+        self.needs_refresh = needs_refresh or (lambda embedding: False)
+        self.iou_threshold = float(iou_threshold)
+        self.drift_iou = float(drift_iou)
+        self.max_missed = max(0, int(max_missed))
+
+        self._tracks = []
+        self._next_id = 0
+        self.faces_detected = 0
+        self.embeddings_computed = 0
+
+    def update(self, detections, bboxes):
+        """
+        Advance by one sampled frame.
+
+        Args:
+            detections: Per-face objects handed to `embed`
+            bboxes: (N, 4) boxes of the detections, in the same order
+
+        Returns:
+            (N, D) embeddings for the detections, in order
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self.faces_detected += len(detections)
+
+        assigned = {}
+        if self._tracks and len(detections):
+            ious = box_iou([track.bbox for track in self._tracks], bboxes)
+            track_order, detection_order = np.unravel_index(np.argsort(-ious, axis=None), ious.shape)
+            used_tracks = set()
+            for track_index, detection_index in zip(track_order.tolist(), detection_order.tolist()):
+                if ious[track_index, detection_index] < self.iou_threshold:
+                    break
+                if track_index in used_tracks or detection_index in assigned:
+                    continue
+                used_tracks.add(track_index)
+                assigned[detection_index] = self._tracks[track_index]
+
+        embeddings = []
+        seen = set()
+        for index, detection in enumerate(detections):
+            bbox = bboxes[index]
+            track = assigned.get(index)
+            if track is None:
+                track = self._start_track(detection, bbox)
+            else:
+                drifted = box_iou(track.embedded_bbox, bbox)[0, 0] < self.drift_iou
+                if drifted or track.refresh:
+                    self._embed_into(track, detection, bbox)
+                track.bbox = bbox
+                track.missed = 0
+            seen.add(track.track_id)
+            embeddings.append(track.embedding)
+
+        survivors = []
+        for track in self._tracks:
+            if track.track_id not in seen:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        self._tracks = survivors
+
+        if not embeddings:
+            return np.empty((0, 512), dtype=np.float32)
+        return np.vstack([np.asarray(embedding, dtype=np.float32).reshape(1, -1) for embedding in embeddings])
+
+    def _start_track(self, detection, bbox):
+        embedding = self._compute(detection)
+        track = FaceTrack(self._next_id, bbox, embedding, self.needs_refresh(embedding))
+        self._next_id += 1
+        self._tracks.append(track)
+        return track
+
+    def _embed_into(self, track, detection, bbox):
+        track.embedding = self._compute(detection)
+        track.embedded_bbox = bbox
+        track.refresh = self.needs_refresh(track.embedding)
+
+    def _compute(self, detection):
+        self.embeddings_computed += 1
+        return self.embed(detection)
@@ -0,0 +1,201 @@
+"""
+Bounded-concurrency HTTP downloads with ordered results.
+
+Registration images and attendance captures used to be fetched one after
+another, so a job waited for the sum of all round trips. Fetcher keeps one
+keep-alive requests.Session for the process (HTTPAdapter with at most
+`per_host` connections to any one host, blocking instead of opening more)
+and a small thread pool. map_ordered() downloads up to `window` URLs ahead
+of the consumer and yields them in input order as soon as each is ready,
+so decoding and inference of item i overlap with the downloads of the
+items after it, and wall time approaches the slowest download instead of
+their sum.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FetchResult:
+    index: int
+    url: str
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Fetcher:
+    """
+    Shared session plus thread pool for concurrent downloads.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        per_host: int = DEFAULT_PER_HOST,
+        timeout: float = DEFAULT_TIMEOUT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.timeout = float(timeout)
+        self.chunk_size = int(chunk_size)
+
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Fetcher":
+        """
+        Build a fetcher from FETCH_MAX_WORKERS, FETCH_PER_HOST_CONNECTIONS
+        and FETCH_TIMEOUT_SECONDS.
+        """
+        return cls(
+            max_workers=int(os.getenv("FETCH_MAX_WORKERS", str(DEFAULT_MAX_WORKERS))),
+            per_host=int(os.getenv("FETCH_PER_HOST_CONNECTIONS", str(DEFAULT_PER_HOST))),
+            timeout=float(os.getenv("FETCH_TIMEOUT_SECONDS", str(DEFAULT_TIMEOUT))),
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=self.max_workers,
+                    pool_maxsize=self.per_host,
+                    pool_block=True,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="fetcher"
+                )
+            return self._executor
+
+    def get_bytes(self, url: str) -> bytes:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def get_to_file(self, url: str, suffix: str = "", dir: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Stream a URL into a new temp file, one chunk in memory at a time.
+
+        Returns:
+            Tuple of (temp file path, bytes written); the caller removes the file
+        """
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=dir)
+        bytes_written = 0
+        try:
+            # Owns fd from here on, so a failed request still closes it
+            with os.fdopen(fd, "wb") as temp_file:
+                with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            temp_file.write(chunk)
+                            bytes_written += len(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path, bytes_written
+
+    def map_ordered(
+        self,
+        fetch: Callable[[str], Any],
+        urls: Iterable[str],
+        window: Optional[int] = None,
+        discard: Optional[Callable[[Any], None]] = None,
+    ) -> Iterator[FetchResult]:
+        """
+        Run fetch(url) concurrently and yield the results in input order.
+
+        Args:
+            fetch: Download function, e.g. get_bytes or get_to_file
+            urls: URLs to fetch
+            window: Maximum number of URLs fetched ahead of the consumer;
+                defaults to max_workers
+            discard: Called with every value that was fetched but never
+                yielded because the consumer stopped early (e.g. to delete
+                temp files)
+
+        Yields:
+            FetchResult per URL; failed downloads carry the error instead of
+            raising, so one bad URL does not end the iteration
+        """
+        urls = list(urls)
+        window = max(1, int(window or self.max_workers))
+        executor = self._get_executor()
+        pending = deque()
+        next_index = 0
+
+        def fill():
+            nonlocal next_index
+            while next_index < len(urls) and len(pending) < window:
+                url = urls[next_index]
+                pending.append((next_index, url, executor.submit(fetch, url)))
+                next_index += 1
+
+        try:
+            fill()
+            while pending:
+                index, url, future = pending.popleft()
+                try:
+                    result = FetchResult(index, url, value=future.result())
+                except Exception as error:
+                    result = FetchResult(index, url, error=error)
+                fill()
+                yield result
+        finally:
+            for _, _, future in pending:
+                if future.cancel() or discard is None:
+                    continue
+                future.add_done_callback(lambda done: _discard(done, discard))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+def _discard(future, discard: Callable[[Any], None]) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        discard(future.result())
+    except Exception:
+        pass
@@ -0,0 +1,103 @@
+"""
+Order in which prefetched jobs are handed to the inference processes.
+
+The worker prefetches deliveries from every queue and picks the next job
+itself whenever a process is free:
+
+1. Higher priority first. Priority comes from the queue, so a burst of
+   registrations cannot delay end-of-class recognize jobs.
+2. Within one priority, jobs with a deadline run earliest deadline first,
+   ahead of jobs without one.
+3. The remaining jobs are served round-robin across their fairness key
+   (section), FIFO within a key, so one section's bulk onboarding does
+   not hold back every other section.
+
+Jobs that cannot start yet (see `eligible` in pop()) keep their place.
+"""
+
+import itertools
+from collections import OrderedDict, deque
+from datetime import datetime
+
+
+def parse_deadline(value):
+    # Unix seconds or milliseconds, or an ISO 8601 timestamp; None if unset
+    # or unreadable
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / 1000.0 if value > 1e11 else float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return None
+    return parsed.timestamp()
+
+
+class _PriorityClass:
+    def __init__(self):
+        self.deadline_jobs = []
+        self.fair_queues = OrderedDict()
+
+    def __len__(self):
+        return len(self.deadline_jobs) + sum(len(jobs) for jobs in self.fair_queues.values())
+
+
+class JobScheduler:
+    def __init__(self):
+        self._classes = {}
+        self._sequence = itertools.count()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, job, priority=0, deadline=None, fairness_key=None):
+        priority_class = self._classes.setdefault(priority, _PriorityClass())
+        if deadline is not None:
+            priority_class.deadline_jobs.append((deadline, next(self._sequence), job))
+            priority_class.deadline_jobs.sort(key=lambda entry: entry[:2])
+        else:
+            priority_class.fair_queues.setdefault(fairness_key, deque()).append(job)
+        self._size += 1
+
+    def pop(self, eligible=None):
+        eligible = eligible or (lambda job: True)
+        for priority in sorted(self._classes, reverse=True):
+            priority_class = self._classes[priority]
+            job = self._pop_deadline(priority_class, eligible)
+            if job is None:
+                job = self._pop_round_robin(priority_class, eligible)
+            if job is None:
+                continue
+            if not len(priority_class):
+                del self._classes[priority]
+            self._size -= 1
+            return job
+        return None
+
+    def _pop_deadline(self, priority_class, eligible):
+        for index, (_, _, job) in enumerate(priority_class.deadline_jobs):
+            if eligible(job):
+                del priority_class.deadline_jobs[index]
+                return job
+        return None
+
+    def _pop_round_robin(self, priority_class, eligible):
+        # fair_queues is ordered by turn; the key that was served moves to
+        # the back
+        for key, jobs in priority_class.fair_queues.items():
+            for index, job in enumerate(jobs):
+                if not eligible(job):
+                    continue
+                del jobs[index]
+                if jobs:
+                    priority_class.fair_queues.move_to_end(key)
+                else:
+                    del priority_class.fair_queues[key]
+                return job
+        return None
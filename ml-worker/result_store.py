@@ -0,0 +1,83 @@
+"""
+On-disk idempotency store for worker job results.
+
+A job is recomputed whenever RabbitMQ redelivers it (the worker died after
+publishing but before the ack) or the gateway republishes it after a
+timeout. Successful results are kept in SQLite under
+(job_id, content hash of the job inputs), so a repeated job is answered
+from the store without touching the inference processes, also after a
+worker restart. Entries expire after `ttl_seconds`.
+
+Only the connection thread of the runtime uses the store.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Payload fields that change between deliveries of the same job
+VOLATILE_FIELDS = ("job_id", "enqueued_at", "deadline")
+
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+def content_hash(payload):
+    inputs = {key: value for key, value in payload.items() if key not in VOLATILE_FIELDS}
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path, ttl_seconds=86400):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = float(ttl_seconds)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (job_id, content_hash)
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS job_results_expiry ON job_results (expires_at)"
+        )
+        self._db.commit()
+        self._last_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, job_id, payload_hash):
+        now = time.time()
+        row = self._db.execute(
+            "SELECT result FROM job_results WHERE job_id = ? AND content_hash = ? AND expires_at > ?",
+            (str(job_id), payload_hash, now),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, job_id, payload_hash, result):
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO job_results (job_id, content_hash, result, expires_at) VALUES (?, ?, ?, ?)",
+            (str(job_id), payload_hash, json.dumps(result), now + self.ttl_seconds),
+        )
+        if now - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+            self._db.execute("DELETE FROM job_results WHERE expires_at <= ?", (now,))
+            self._last_purge = now
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,309 @@
+"""
+Multi-process consumer runtime for the ML worker.
+
+The AMQP connection lives on the main thread, which only moves messages:
+a delivery is handed to a pool of inference processes (each with its own
+warm FaceAnalysis sessions) and the consumer callback returns at once, so
+the connection keeps serving heartbeats while jobs run. When a job
+finishes, the pool's result thread schedules the publish and ack back onto
+the connection thread with add_callback_threadsafe(); pika channels are
+never touched from another thread.
+
+Every consumed queue gets its own channel and prefetch count, so a burst
+of one job type cannot take all the delivery slots of another. Prefetched
+deliveries wait in a JobScheduler (queue priority, deadline, per-section
+round-robin) and are only handed to the pool when a process is free, so
+the pool never holds a backlog that the scheduler cannot reorder.
+
+Jobs that share a lane key (for example registrations of one section) run
+one at a time in delivery order; later ones wait in the scheduler, still
+unacked, until the earlier job and its follow-up are done.
+
+With a ResultStore, a job whose (job_id, inputs) already succeeded is
+answered from the store right away, without a follow-up.
+
+Results are annotated with queue_wait_ms (publish or delivery until start)
+and processing_ms (start until the job finished).
+"""
+
+import functools
+import json
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pika
+
+from job_scheduler import JobScheduler
+from result_store import content_hash
+
+
+class Delivery:
+    def __init__(self, channel, delivery_tag, payload, lane):
+        self.channel = channel
+        self.delivery_tag = delivery_tag
+        self.payload = payload
+        self.lane = lane
+        self.received_at = time.time()
+        self.started_at = None
+        self.deadline = None
+        self.content_hash = None
+
+    def queue_wait_ms(self):
+        # Prefer the publisher's timestamp (epoch ms) so time spent in the
+        # broker counts as queue wait too
+        enqueued_at = self.payload.get("enqueued_at")
+        if isinstance(enqueued_at, (int, float)) and not isinstance(enqueued_at, bool):
+            waited_from = min(enqueued_at / 1000.0, self.received_at)
+        else:
+            waited_from = self.received_at
+        return max(0, int(round((self.started_at - waited_from) * 1000)))
+
+
+class WorkerRuntime:
+    def __init__(
+        self,
+        amqp_url,
+        queue_prefetch,
+        queue_priority,
+        results_queue,
+        processes,
+        run_job,
+        failure_result,
+        initializer=None,
+        lane_of=None,
+        fairness_of=None,
+        deadline_of=None,
+        prepare_job=None,
+        record_result=None,
+        follow_up_due=None,
+        run_follow_up=None,
+        result_store=None,
+    ):
+        # run_job, run_follow_up and initializer run in the pool processes
+        # and must be module-level functions; the other hooks run on the
+        # connection thread.
+        self.amqp_url = amqp_url
+        self.queue_prefetch = dict(queue_prefetch)
+        self.queue_priority = dict(queue_priority)
+        self.results_queue = results_queue
+        self.processes = max(1, int(processes))
+        self.run_job = run_job
+        self.failure_result = failure_result
+        self.initializer = initializer
+        self.lane_of = lane_of or (lambda payload: None)
+        self.fairness_of = fairness_of or (lambda payload: None)
+        self.deadline_of = deadline_of or (lambda payload: None)
+        self.prepare_job = prepare_job or (lambda payload: payload)
+        self.record_result = record_result or (lambda result: None)
+        self.follow_up_due = follow_up_due or (lambda result: False)
+        self.run_follow_up = run_follow_up
+        self.result_store = result_store
+
+        self._connection = None
+        self._publish_channel = None
+        self._pool = None
+        self._scheduler = JobScheduler()
+        self._busy_lanes = set()
+        self._running = 0
+
+    def _new_pool(self):
+        # spawn: children must not inherit the AMQP socket or ONNX threads
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self.initializer,
+        )
+
+    def run(self):
+        self._pool = self._new_pool()
+        self._connection = pika.BlockingConnection(pika.URLParameters(self.amqp_url))
+        self._publish_channel = self._connection.channel()
+        self._publish_channel.queue_declare(queue=self.results_queue, durable=True)
+
+        for queue_name, prefetch in self.queue_prefetch.items():
+            channel = self._connection.channel()
+            channel.queue_declare(queue=queue_name, durable=True)
+            channel.basic_qos(prefetch_count=max(1, int(prefetch)))
+            channel.basic_consume(
+                queue=queue_name,
+                on_message_callback=functools.partial(self._on_message, queue_name),
+            )
+
+        try:
+            while self._connection.is_open:
+                self._connection.process_data_events(time_limit=1)
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            if self._connection.is_open:
+                self._connection.close()
+
+    def _on_message(self, queue_name, channel, method, properties, body):
+        try:
+            payload = json.loads(body.decode("utf-8"))
+            if not isinstance(payload, dict):
+                raise ValueError("job payload must be a JSON object")
+        except Exception as error:
+            self._finish(
+                Delivery(channel, method.delivery_tag, {}, None),
+                self.failure_result({}, f"invalid job payload: {str(error)}"),
+            )
+            return
+
+        delivery = Delivery(channel, method.delivery_tag, payload, self.lane_of(payload))
+        if self._replay_stored_result(delivery):
+            return
+        delivery.deadline = self.deadline_of(payload)
+        self._scheduler.push(
+            delivery,
+            priority=self.queue_priority.get(queue_name, 0),
+            deadline=delivery.deadline,
+            fairness_key=self.fairness_of(payload),
+        )
+        self._dispatch()
+
+    def _replay_stored_result(self, delivery):
+        if self.result_store is None or not delivery.payload.get("job_id"):
+            return False
+        try:
+            delivery.content_hash = content_hash(delivery.payload)
+            stored = self.result_store.get(delivery.payload["job_id"], delivery.content_hash)
+        except Exception:
+            traceback.print_exc()
+            return False
+        if stored is None:
+            return False
+        stored.update(replayed=True, queue_wait_ms=0, processing_ms=0)
+        self._finish(delivery, stored)
+        return True
+
+    def _store_result(self, delivery, result):
+        if delivery.content_hash is None or result.get("status") != "success":
+            return
+        try:
+            self.result_store.put(delivery.payload["job_id"], delivery.content_hash, result)
+        except Exception:
+            traceback.print_exc()
+
+    def _dispatch(self):
+        while self._running < self.processes:
+            delivery = self._scheduler.pop(
+                eligible=lambda waiting: waiting.lane is None or waiting.lane not in self._busy_lanes
+            )
+            if delivery is None:
+                return
+            if delivery.lane is not None:
+                self._busy_lanes.add(delivery.lane)
+            self._start(delivery)
+
+    def _start(self, delivery):
+        delivery.started_at = time.time()
+        try:
+            payload = self.prepare_job(delivery.payload)
+            self._submit(self.run_job, payload, functools.partial(self._on_job_done, delivery))
+        except Exception as error:
+            traceback.print_exc()
+            self._finish(delivery, self.failure_result(delivery.payload, f"worker crashed: {str(error)}"))
+            self._release(delivery.lane)
+
+    def _submit(self, fn, arg, on_done):
+        try:
+            future = self._pool.submit(fn, arg)
+        except BrokenProcessPool:
+            self._replace_pool(self._pool)
+            future = self._pool.submit(fn, arg)
+        pool = self._pool
+        self._running += 1
+        # Runs on the pool's result thread; hop back to the connection thread
+        future.add_done_callback(
+            lambda done: self._connection.add_callback_threadsafe(
+                functools.partial(on_done, pool, done)
+            )
+        )
+
+    def _replace_pool(self, broken_pool):
+        # Every future of a crashed pool fails; only the first replaces it
+        if broken_pool is self._pool:
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+
+    def _future_result(self, pool, future, payload):
+        self._running -= 1
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            traceback.print_exc()
+            self._replace_pool(pool)
+            return self.failure_result(payload, "worker process crashed")
+        except Exception as error:
+            traceback.print_exc()
+            return self.failure_result(payload, f"worker crashed: {str(error)}")
+
+    def _on_job_done(self, delivery, pool, future):
+        result = self._future_result(pool, future, delivery.payload)
+        finished_at = time.time()
+        result["queue_wait_ms"] = delivery.queue_wait_ms()
+        result["processing_ms"] = max(0, int(round((finished_at - delivery.started_at) * 1000)))
+        if delivery.deadline is not None:
+            result["deadline_missed"] = finished_at > delivery.deadline
+        # Stored before the ack, so a redelivery after a crash in between
+        # is answered from the store
+        self._store_result(delivery, result)
+        if not self._finish(delivery, result):
+            self._release(delivery.lane)
+            return
+
+        try:
+            if self.run_follow_up is not None and self.follow_up_due(result):
+                # The follow-up stays in the lane, so the next job of the
+                # lane starts from whatever it produced
+                self._submit(
+                    self.run_follow_up,
+                    result,
+                    functools.partial(self._on_follow_up_done, delivery.lane, result),
+                )
+                return
+        except Exception:
+            traceback.print_exc()
+        self._release(delivery.lane)
+
+    def _on_follow_up_done(self, lane, source_result, pool, future):
+        result = self._future_result(pool, future, source_result)
+        try:
+            if result is not None and result.get("status") == "success":
+                self.record_result(result)
+                self._publish(result)
+        except Exception:
+            traceback.print_exc()
+        self._release(lane)
+
+    def _finish(self, delivery, result):
+        try:
+            self.record_result(result)
+            self._publish(result)
+            delivery.channel.basic_ack(delivery_tag=delivery.delivery_tag)
+            return True
+        except Exception:
+            traceback.print_exc()
+            try:
+                delivery.channel.basic_nack(delivery_tag=delivery.delivery_tag, requeue=False)
+            except Exception:
+                traceback.print_exc()
+            return False
+
+    def _publish(self, result):
+        self._publish_channel.basic_publish(
+            exchange="",
+            routing_key=self.results_queue,
+            body=json.dumps(result).encode("utf-8"),
+            properties=pika.BasicProperties(
+                content_type="application/json",
+                delivery_mode=2,
+            ),
+        )
+
+    def _release(self, lane):
+        self._busy_lanes.discard(lane)
+        self._dispatch()
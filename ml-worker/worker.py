@@ -1,19 +1,49 @@
 import io
-import json
 import os
-import re
+import queue
 import tempfile
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import cloudinary
 import cloudinary.uploader
 import cv2
 import numpy as np
-import pika
-import requests
 from insightface.app import FaceAnalysis
 
+from capture_cache import CaptureAnalysis, CaptureEmbeddingCache
+from embedding_store import EmbeddingStore, is_embedding_store
+from face_detection import (
+    DEFAULT_MAX_SIZE,
+    DEFAULT_MIN_FACE_PX,
+    DETECTION_ADAPTIVE,
+    DETECTION_FIXED,
+    DETECTION_MODES,
+    FACE_MODULES,
+    FIXED_DET_SIZE,
+    DetectionTimings,
+    analyze_faces,
+    detect_faces,
+    embed_face,
+)
+from face_tracker import DEFAULT_DRIFT_IOU, DEFAULT_IOU_THRESHOLD, DEFAULT_MAX_MISSED, FaceTracker
+from fetcher import Fetcher
+from frame_pipeline import run_frame_pipeline
+from frame_sampling import SAMPLING_MODES, SAMPLING_STRIDE, FrameSampler
+from job_scheduler import parse_deadline
+from model_cache import ModelCache, parse_model_version
+from result_store import ResultStore
+from runtime import WorkerRuntime
+from model_log import (
+    DEFAULT_COMPACT_MIN_ROWS,
+    SectionModelManifest,
+    base_public_id,
+    delta_public_id,
+    is_manifest,
+    manifest_public_id,
+)
+
 RABBITMQ_URL = os.getenv("RABBITMQ_URL", "amqp://localhost:5672")
 FACE_REGISTER_QUEUE = os.getenv("FACE_REGISTER_QUEUE", "face.register")
 FACE_RECOGNIZE_QUEUE = os.getenv("FACE_RECOGNIZE_QUEUE", "face.recognize")
@@ -21,8 +51,60 @@ FACE_RESULTS_QUEUE = os.getenv("FACE_RESULTS_QUEUE", "face.results")
 
 INSIGHTFACE_MODEL_NAME = os.getenv("INSIGHTFACE_MODEL_NAME", "buffalo_s")
 INSIGHTFACE_MODEL_ROOT = os.getenv("INSIGHTFACE_MODEL_ROOT", "./insightface_models")
+# "adaptive" picks the detector input per frame (tiling large frames);
+# "fixed" detects at FIXED_DET_SIZE like FaceAnalysis.get()
+FACE_DETECTION_MODE = os.getenv("FACE_DETECTION_MODE", DETECTION_ADAPTIVE)
+if FACE_DETECTION_MODE not in DETECTION_MODES:
+    raise ValueError(f"FACE_DETECTION_MODE must be one of {DETECTION_MODES}")
+DETECTION_MAX_SIZE = int(os.getenv("DETECTION_MAX_SIZE", str(DEFAULT_MAX_SIZE)))
+DETECTION_MIN_FACE_PX = int(os.getenv("DETECTION_MIN_FACE_PX", str(DEFAULT_MIN_FACE_PX)))
+VIDEO_PIPELINE_WORKERS = max(1, int(os.getenv("VIDEO_PIPELINE_WORKERS", "2")))
+REGISTER_DOWNLOAD_WORKERS = max(1, int(os.getenv("REGISTER_DOWNLOAD_WORKERS", "8")))
+CAPTURE_PREFETCH = max(1, int(os.getenv("CAPTURE_PREFETCH", "4")))
+
+# Inference processes per container; each loads its own FaceAnalysis
+# sessions (VIDEO_PIPELINE_WORKERS of them for video and batch jobs)
+WORKER_PROCESSES = max(1, int(os.getenv("WORKER_PROCESSES", str(max(1, (os.cpu_count() or 1) // VIDEO_PIPELINE_WORKERS)))))
+# Deliveries held per queue; the scheduler can only reorder what it holds
+FACE_REGISTER_PREFETCH = max(1, int(os.getenv("FACE_REGISTER_PREFETCH", str(WORKER_PROCESSES * 4))))
+FACE_RECOGNIZE_PREFETCH = max(1, int(os.getenv("FACE_RECOGNIZE_PREFETCH", str(WORKER_PROCESSES * 2))))
+# Video frames: detections are linked across sampled frames by IoU and only
+# new, drifted or not yet confident tracks are re-embedded
+FACE_TRACKING = os.getenv("FACE_TRACKING", "1") != "0"
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", str(DEFAULT_IOU_THRESHOLD)))
+TRACK_DRIFT_IOU = float(os.getenv("TRACK_DRIFT_IOU", str(DEFAULT_DRIFT_IOU)))
+TRACK_MAX_MISSED = int(os.getenv("TRACK_MAX_MISSED", str(DEFAULT_MAX_MISSED)))
+
+# Face embeddings detected per capture, so reruns only re-score them; an
+# empty CAPTURE_CACHE_DIR disables the cache
+CAPTURE_CACHE_DIR = os.getenv("CAPTURE_CACHE_DIR", "./worker_state/capture_embeddings")
+CAPTURE_CACHE_MAX_BYTES = int(os.getenv("CAPTURE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Successful results are kept this long for redelivered/republished jobs;
+# an empty RESULT_STORE_PATH disables the store
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "./worker_state/results.sqlite3")
+RESULT_STORE_TTL_SECONDS = float(os.getenv("RESULT_STORE_TTL_SECONDS", "86400"))
+# Higher runs first; faculty wait on recognize jobs at the end of class
+FACE_REGISTER_PRIORITY = int(os.getenv("FACE_REGISTER_PRIORITY", "0"))
+FACE_RECOGNIZE_PRIORITY = int(os.getenv("FACE_RECOGNIZE_PRIORITY", "10"))
+
+MODEL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+MODEL_EMBEDDING_DTYPE = np.float16 if os.getenv("MODEL_EMBEDDING_DTYPE", "float32") == "float16" else np.float32
+MODEL_LOG_COMPACT_MIN_ROWS = int(os.getenv("MODEL_LOG_COMPACT_MIN_ROWS", str(DEFAULT_COMPACT_MIN_ROWS)))
 
 _face_app = None
+_extra_face_apps = []
+_model_cache = ModelCache.from_env(default_max_bytes=MODEL_CACHE_MAX_BYTES)
+# One keep-alive session and download pool for every job in this process
+_fetcher = Fetcher.from_env()
+_capture_cache = CaptureEmbeddingCache(CAPTURE_CACHE_DIR, CAPTURE_CACHE_MAX_BYTES) if CAPTURE_CACHE_DIR else None
+# section_id -> (model_version, manifest_url) of the newest manifest this
+# worker wrote. Register jobs carry the model URL from when they were
+# queued, so back-to-back registrations would otherwise build on the same
+# manifest and drop each other's delta. The consumer process records the
+# heads from job results and serializes register jobs per section, so the
+# inference processes always start from the newest one.
+_section_heads = {}
+REGISTER_JOB_TYPES = ("register", "register_batch")
 
 
 def configure_cloudinary():
@@ -33,18 +115,31 @@ def configure_cloudinary():
     )
 
 
+def create_face_app():
+    face_app = FaceAnalysis(
+        name=INSIGHTFACE_MODEL_NAME,
+        root=INSIGHTFACE_MODEL_ROOT,
+        providers=["CPUExecutionProvider"],
+        allowed_modules=FACE_MODULES,
+    )
+    face_app.prepare(ctx_id=-1, det_size=FIXED_DET_SIZE)
+    return face_app
+
+
 def get_face_app():
     global _face_app
     if _face_app is None:
-        _face_app = FaceAnalysis(
-            name=INSIGHTFACE_MODEL_NAME,
-            root=INSIGHTFACE_MODEL_ROOT,
-            providers=["CPUExecutionProvider"],
-        )
-        _face_app.prepare(ctx_id=-1, det_size=(320, 320))
+        _face_app = create_face_app()
     return _face_app
 
 
+def get_face_apps(count):
+    # Independent ONNX sessions for the video pipeline's inference threads.
+    while len(_extra_face_apps) < count - 1:
+        _extra_face_apps.append(create_face_app())
+    return [get_face_app()] + _extra_face_apps[: count - 1]
+
+
 def build_failure_result(payload, message):
     return {
         "job_id": payload.get("job_id"),
@@ -66,19 +161,20 @@ def build_success_result(payload, extra):
     return base
 
 
-def parse_model_version(model_url):
-    if not model_url:
-        return 0
-    match = re.search(r"_v(\d+)\.npz", model_url)
-    if not match:
-        return 0
-    return int(match.group(1))
+def download_bytes(url):
+    return _fetcher.get_bytes(url)
 
 
-def download_bytes(url):
-    response = requests.get(url, timeout=60)
-    response.raise_for_status()
-    return response.content
+def download_to_file(url, suffix=""):
+    # Streams the response so only one chunk is in memory at a time; the
+    # caller owns (and must remove) the returned temp file.
+    return _fetcher.get_to_file(url, suffix=suffix)
+
+
+def remove_downloaded_file(download):
+    temp_path, _ = download
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
 
 
 def decode_image(image_bytes):
@@ -92,38 +188,59 @@ def normalize_rows(matrix):
     return matrix / norms
 
 
-def match_enrollment(query_embedding, known_enrollments, known_embeddings, threshold):
-    if known_embeddings.shape[0] == 0:
-        return None
+def expected_faces_bucket(count):
+    # Rounded up to a power of two: a section model that gains or loses a
+    # few students keeps the same detector input and capture cache key
+    return 1 << max(0, int(count) - 1).bit_length()
 
-    query = query_embedding.astype(np.float32).reshape(1, -1)
-    query_norm = normalize_rows(query)
-    known_norm = normalize_rows(known_embeddings)
 
-    similarities = (known_norm @ query_norm.T).reshape(-1)
-    best_idx = int(np.argmax(similarities))
-    best_sim = float(similarities[best_idx])
+def detection_params(expected_faces):
+    # Part of the capture cache key: anything that changes what is detected
+    if FACE_DETECTION_MODE == DETECTION_FIXED:
+        return {"mode": FACE_DETECTION_MODE, "det_size": FIXED_DET_SIZE}
+    return {
+        "mode": FACE_DETECTION_MODE,
+        "max_size": DETECTION_MAX_SIZE,
+        "min_face_px": DETECTION_MIN_FACE_PX,
+        "expected_faces": expected_faces,
+    }
 
-    if best_sim < threshold:
-        return None
 
-    return known_enrollments[best_idx], best_sim
+def find_faces(app, frame, expected_faces=None, timings=None):
+    return detect_faces(
+        app,
+        frame,
+        FACE_DETECTION_MODE,
+        expected_faces,
+        timings,
+        max_size=DETECTION_MAX_SIZE,
+        min_face_px=DETECTION_MIN_FACE_PX,
+    )
 
 
-def extract_primary_embedding(image):
-    app = get_face_app()
-    faces = app.get(image)
+def find_and_embed_faces(app, frame, expected_faces=None, timings=None):
+    return analyze_faces(
+        app,
+        frame,
+        FACE_DETECTION_MODE,
+        expected_faces,
+        timings,
+        max_size=DETECTION_MAX_SIZE,
+        min_face_px=DETECTION_MIN_FACE_PX,
+    )
+
+
+def extract_primary_embedding(image, app=None):
+    if app is None:
+        app = get_face_app()
+    faces = find_and_embed_faces(app, image, expected_faces=1)
     if not faces:
         return None
     best_face = max(faces, key=lambda f: float(f.det_score))
     return best_face.embedding.astype(np.float32)
 
 
-def load_npz_model_from_url(model_url):
-    if not model_url:
-        return [], np.empty((0, 512), dtype=np.float32)
-
-    model_bytes = download_bytes(model_url)
+def decode_npz_model(model_bytes):
     with np.load(io.BytesIO(model_bytes), allow_pickle=False) as data:
         enrollments = data["enrollments"].astype(str).tolist()
         embeddings = data["embeddings"].astype(np.float32)
@@ -133,31 +250,115 @@ def load_npz_model_from_url(model_url):
     if len(enrollments) != len(embeddings):
         raise ValueError("Model file is corrupted: enrollments and embeddings length mismatch")
 
+    # Cached models are shared between jobs; guard against in-place edits.
+    embeddings.setflags(write=False)
     return enrollments, embeddings
 
 
-def upload_npz_model(section_id, model_version, enrollments, embeddings):
+def decode_segment(model_bytes):
+    if is_embedding_store(model_bytes):
+        return EmbeddingStore.from_buffer(model_bytes)
+    # Models uploaded before the embedding store format
+    enrollments, embeddings = decode_npz_model(model_bytes)
+    return EmbeddingStore.from_rows(enrollments, embeddings)
+
+
+def decode_section_model(model_bytes):
+    if is_manifest(model_bytes):
+        # Base plus deltas; later segments replace earlier rows per student
+        manifest = SectionModelManifest.from_bytes(model_bytes)
+        store = EmbeddingStore.merge([load_segment_store(url) for url in manifest.segment_urls()])
+        store.embeddings.setflags(write=False)
+    else:
+        # Zero-copy (and read-only) view of the payload for float32 stores
+        store = decode_segment(model_bytes)
+    return store.row_enrollments(), store.float32_embeddings()
+
+
+def load_segment_store(segment_url):
+    return _model_cache.get_or_load(
+        segment_url,
+        fetch=download_bytes,
+        decode=decode_segment,
+        sizer=lambda store: store.nbytes,
+    )
+
+
+def load_model_from_url(model_url):
+    if not model_url:
+        return [], np.empty((0, 512), dtype=np.float32)
+
+    enrollments, embeddings = _model_cache.get_or_load(
+        model_url,
+        fetch=download_bytes,
+        decode=decode_section_model,
+        sizer=lambda model: model[1].nbytes + sum(len(e) for e in model[0]) * 8,
+    )
+    return list(enrollments), embeddings
+
+
+def record_section_head(section_id, model_version, model_url):
+    head = _section_heads.get(str(section_id))
+    if head is None or model_version > head[0]:
+        _section_heads[str(section_id)] = (model_version, model_url)
+
+
+def resolve_current_model_url(section_id, model_url):
+    head = _section_heads.get(str(section_id))
+    if head and head[0] > parse_model_version(model_url):
+        return head[1]
+    return model_url
+
+
+def register_base_url(payload):
+    # The gateway re-queues a registration whose result lost the
+    # compare-and-set (`attempt` > 0) with the section's current model;
+    # this worker's heads may be on the losing branch, so they are dropped
+    section_id = payload["section_id"]
+    if payload.get("attempt"):
+        _section_heads.pop(str(section_id), None)
+        return payload.get("current_model_url")
+    return resolve_current_model_url(section_id, payload.get("current_model_url"))
+
+
+def load_manifest(model_url, section_id):
+    # A section still on a single-file model gets that file as its base, so
+    # the first registration migrates it without rewriting it.
+    if not model_url:
+        return SectionModelManifest(section_id=int(section_id))
+
+    model_bytes = download_bytes(model_url)
+    if is_manifest(model_bytes):
+        return SectionModelManifest.from_bytes(model_bytes)
+
+    base = decode_segment(model_bytes)
+    return SectionModelManifest(
+        section_id=int(section_id),
+        model_version=parse_model_version(model_url),
+        base_url=model_url,
+        base_rows=int(base.embeddings.shape[0]),
+    )
+
+
+def upload_model_artifact(payload_bytes, public_id):
     if not os.getenv("CLOUDINARY_CLOUD_NAME"):
         raise ValueError("Cloudinary configuration is missing")
 
-    with tempfile.NamedTemporaryFile(suffix=".npz", delete=False) as tmp_file:
+    suffix = os.path.splitext(public_id)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp_file:
+        tmp_file.write(payload_bytes)
         temp_path = tmp_file.name
 
     try:
-        np.savez_compressed(
-            temp_path,
-            enrollments=np.array(enrollments),
-            embeddings=np.array(embeddings, dtype=np.float32),
-        )
-
-        public_id = f"section_{section_id}_model_v{model_version}"
+        # Raw assets keep the extension in the public id, so the URL ends
+        # in _vN.<ext> and parse_model_version can read it back. Public ids
+        # are unique per content and never overwritten (see model_log.py)
         upload_response = cloudinary.uploader.upload(
             temp_path,
             resource_type="raw",
             folder="face-models",
             public_id=public_id,
-            overwrite=True,
-            invalidate=True,
+            overwrite=False,
         )
         return upload_response["secure_url"]
     finally:
@@ -165,31 +366,79 @@ def upload_npz_model(section_id, model_version, enrollments, embeddings):
             os.remove(temp_path)
 
 
-def process_frame_for_matches(
-    frame,
-    frame_index,
+def append_model_delta(section_id, manifest, delta_store):
+    next_version = manifest.model_version + 1
+    delta_bytes = delta_store.to_bytes(MODEL_EMBEDDING_DTYPE)
+    delta_url = upload_model_artifact(
+        delta_bytes,
+        delta_public_id(section_id, next_version, delta_bytes),
+    )
+    next_manifest = manifest.with_delta(next_version, delta_url, delta_store.embeddings.shape[0])
+    manifest_bytes = next_manifest.to_bytes()
+    model_url = upload_model_artifact(
+        manifest_bytes,
+        manifest_public_id(section_id, next_version, manifest_bytes),
+    )
+    record_section_head(section_id, next_version, model_url)
+    return model_url, next_manifest
+
+
+def compact_section_model(section_id, model_url):
+    manifest = load_manifest(model_url, section_id)
+    if not manifest.needs_compaction(MODEL_LOG_COMPACT_MIN_ROWS):
+        return None
+
+    merged = EmbeddingStore.merge([load_segment_store(url) for url in manifest.segment_urls()])
+    next_version = manifest.model_version + 1
+    base_bytes = merged.to_bytes(MODEL_EMBEDDING_DTYPE)
+    base_url = upload_model_artifact(
+        base_bytes,
+        base_public_id(section_id, next_version, base_bytes),
+    )
+    compacted = manifest.compacted(next_version, base_url, merged.embeddings.shape[0], manifest)
+    compacted_bytes = compacted.to_bytes()
+    compacted_url = upload_model_artifact(
+        compacted_bytes,
+        manifest_public_id(section_id, next_version, compacted_bytes),
+    )
+    record_section_head(section_id, next_version, compacted_url)
+    return compacted_url, compacted
+
+
+def face_embeddings(faces):
+    if not faces:
+        return np.empty((0, 512), dtype=np.float32)
+    return np.vstack([face.embedding.astype(np.float32).reshape(1, -1) for face in faces])
+
+
+def score_capture(
+    analysis,
+    frame_index_start,
     known_enrollments,
-    known_embeddings,
+    known_normalized,
     confidence_threshold,
     matches_map,
 ):
-    app = get_face_app()
-    faces = app.get(frame)
-    unmatched_faces = 0
-
-    for face in faces:
-        match = match_enrollment(
-            face.embedding.astype(np.float32),
-            known_enrollments,
-            known_embeddings,
-            confidence_threshold,
-        )
+    # Every face of every analyzed frame is scored against the gallery in
+    # one matrix product; frames are numbered from frame_index_start.
+    counts = [frame.shape[0] for frame in analysis.frames]
+    if not sum(counts):
+        return 0, len(counts)
+
+    embeddings = np.concatenate(analysis.frames).astype(np.float32)
+    frame_ids = np.repeat(np.arange(len(counts)), counts)
+    similarities = normalize_rows(embeddings) @ known_normalized.T
+    best_indices = np.argmax(similarities, axis=1)
+    best_similarities = similarities[np.arange(len(best_indices)), best_indices]
 
-        if match is None:
+    unmatched_faces = 0
+    for row, best_idx in enumerate(best_indices.tolist()):
+        confidence = float(best_similarities[row])
+        if confidence < confidence_threshold:
             unmatched_faces += 1
             continue
 
-        enrollment, confidence = match
+        enrollment = known_enrollments[best_idx]
         entry = matches_map.setdefault(
             enrollment,
             {
@@ -200,61 +449,136 @@ def process_frame_for_matches(
         )
         if confidence > entry["best_confidence"]:
             entry["best_confidence"] = confidence
-        entry["seen_in_frames"].add(frame_index)
+        entry["seen_in_frames"].add(frame_index_start + int(frame_ids[row]))
 
-    return unmatched_faces, len(faces)
+    return unmatched_faces, len(counts)
 
 
-def process_video_bytes(
-    media_bytes,
-    known_enrollments,
-    known_embeddings,
-    confidence_threshold,
-    matches_map,
-    frame_index_start,
+def tracking_params():
+    if not FACE_TRACKING:
+        return None
+    return [TRACK_IOU_THRESHOLD, TRACK_DRIFT_IOU, TRACK_MAX_MISSED]
+
+
+def analyze_video_file(
+    video_path,
     skip_frames,
+    sampling_mode=SAMPLING_STRIDE,
+    sample_seconds=1.0,
+    sampling_totals=None,
+    needs_refresh=None,
+    expected_faces=None,
+    timings=None,
 ):
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-        temp_file.write(media_bytes)
-        temp_path = temp_file.name
+    # Embeddings of the sampled frames in video order, whatever order the
+    # inference threads finish them in; None if the video cannot be read.
+    frames = {}
+    face_apps = get_face_apps(VIDEO_PIPELINE_WORKERS)
+    # One timings object per thread, merged at the end
+    thread_timings = [DetectionTimings() for _ in face_apps]
+
+    if FACE_TRACKING:
+        # Inference threads only detect; the tracker needs frames in order,
+        # so results are reordered here and recognition runs on this thread
+        recognizer = face_apps[0]
+        recognizer_timings = DetectionTimings()
+        thread_timings.append(recognizer_timings)
+        tracker = FaceTracker(
+            lambda detection: embed_face(recognizer, *detection, timings=recognizer_timings),
+            needs_refresh=needs_refresh,
+            iou_threshold=TRACK_IOU_THRESHOLD,
+            drift_iou=TRACK_DRIFT_IOU,
+            max_missed=TRACK_MAX_MISSED,
+        )
+        detected = {}
+        detectors = [
+            lambda frame, app=app, app_timings=app_timings: (
+                frame, find_faces(app, frame, expected_faces, app_timings)
+            )
+            for app, app_timings in zip(face_apps, thread_timings)
+        ]
+
+        def collect_frame(raw_frame_index, sample_index, result):
+            detected[sample_index] = result
+            while len(frames) in detected:
+                frame, faces = detected.pop(len(frames))
+                frames[len(frames)] = tracker.update(
+                    [(frame, face) for face in faces],
+                    [face.bbox for face in faces],
+                )
+    else:
+        tracker = None
+        detectors = [
+            lambda frame, app=app, app_timings=app_timings: find_and_embed_faces(
+                app, frame, expected_faces, app_timings
+            )
+            for app, app_timings in zip(face_apps, thread_timings)
+        ]
 
+        def collect_frame(raw_frame_index, sample_index, faces):
+            frames[sample_index] = face_embeddings(faces)
+
+    sampler = FrameSampler(sampling_mode, stride=skip_frames, interval_seconds=sample_seconds)
     try:
-        cap = cv2.VideoCapture(temp_path)
-        if not cap.isOpened():
-            return 0, 0, frame_index_start
+        run_frame_pipeline(video_path, sampler, detectors, collect_frame)
+    except ValueError:
+        return None
 
-        unmatched_faces = 0
-        processed_frames = 0
-        raw_frame_index = 0
-        frame_cursor = frame_index_start
+    if timings is not None:
+        for part in thread_timings:
+            timings.add(part)
+    if sampling_totals is not None:
+        sampling_totals["frames_decoded"] += sampler.stats.frames_decoded
+        sampling_totals["frames_analyzed"] += sampler.stats.frames_analyzed
+        if sampler.stats.fallback:
+            sampling_totals["fallback"] = sampler.stats.fallback
+        if tracker is not None:
+            sampling_totals["faces_detected"] += tracker.faces_detected
+            sampling_totals["embeddings_computed"] += tracker.embeddings_computed
+
+    return CaptureAnalysis(
+        "video",
+        [frames[index] for index in sorted(frames)],
+        frames_decoded=sampler.stats.frames_decoded,
+        fallback=sampler.stats.fallback,
+    )
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
 
-            if raw_frame_index % skip_frames != 0:
-                raw_frame_index += 1
-                continue
+def analyze_capture(
+    capture_path,
+    skip_frames,
+    sampling_mode,
+    sample_seconds,
+    sampling_totals,
+    needs_refresh=None,
+    expected_faces=None,
+    timings=None,
+):
+    image = cv2.imread(capture_path, cv2.IMREAD_COLOR)
+    if image is not None:
+        faces = find_and_embed_faces(get_face_app(), image, expected_faces, timings)
+        return CaptureAnalysis("image", [face_embeddings(faces)])
+    return analyze_video_file(
+        capture_path,
+        skip_frames,
+        sampling_mode,
+        sample_seconds,
+        sampling_totals,
+        needs_refresh,
+        expected_faces,
+        timings,
+    )
 
-            unmatched, _ = process_frame_for_matches(
-                frame,
-                frame_cursor,
-                known_enrollments,
-                known_embeddings,
-                confidence_threshold,
-                matches_map,
-            )
-            unmatched_faces += unmatched
-            processed_frames += 1
-            frame_cursor += 1
-            raw_frame_index += 1
 
-        cap.release()
-        return unmatched_faces, processed_frames, frame_cursor
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+def cached_capture_analyses(capture_urls, **analysis_params):
+    # (cache key, cached CaptureAnalysis or None) per capture URL
+    if _capture_cache is None:
+        return [(None, None) for _ in capture_urls]
+    entries = []
+    for capture_url in capture_urls:
+        key = CaptureEmbeddingCache.make_key(capture_url, **analysis_params)
+        entries.append((key, _capture_cache.get(key)))
+    return entries
 
 
 def handle_register_job(payload):
@@ -269,16 +593,15 @@ def handle_register_job(payload):
         return build_failure_result(payload, "image_urls must be a non-empty array")
 
     try:
-        current_model_url = payload.get("current_model_url")
-        existing_enrollments, existing_embeddings = load_npz_model_from_url(current_model_url)
-
         new_embeddings = []
         successful_images = 0
 
-        for image_url in image_urls:
+        # Images download concurrently and are decoded in order as they arrive
+        for fetched in _fetcher.map_ordered(download_bytes, image_urls):
+            if not fetched.ok:
+                continue
             try:
-                image_bytes = download_bytes(image_url)
-                image = decode_image(image_bytes)
+                image = decode_image(fetched.value)
                 if image is None:
                     continue
 
@@ -294,32 +617,147 @@ def handle_register_job(payload):
         if len(new_embeddings) == 0:
             return build_failure_result(payload, "No faces detected in registration images")
 
-        new_embeddings_arr = np.array(new_embeddings, dtype=np.float32)
-        merged_embeddings = (
-            new_embeddings_arr
-            if existing_embeddings.shape[0] == 0
-            else np.vstack([existing_embeddings, new_embeddings_arr])
+        # Only the new embeddings are uploaded, as one delta segment on top
+        # of the section's current manifest
+        current_model_url = register_base_url(payload)
+        manifest = load_manifest(current_model_url, section_id)
+        delta_store = EmbeddingStore.from_rows(
+            [str(enrollment)] * len(new_embeddings),
+            np.array(new_embeddings, dtype=np.float32),
         )
-        merged_enrollments = existing_enrollments + ([str(enrollment)] * len(new_embeddings))
-
-        next_version = parse_model_version(current_model_url) + 1
-        model_url = upload_npz_model(section_id, next_version, merged_enrollments, merged_embeddings)
+        model_url, next_manifest = append_model_delta(section_id, manifest, delta_store)
 
         return build_success_result(
             payload,
             {
                 "section_id": int(section_id),
                 "model_url": model_url,
-                "model_version": next_version,
+                "model_version": next_manifest.model_version,
+                # The gateway applies model_url only if the section still
+                # points at the manifest it was built on
+                "based_on": current_model_url,
                 "faces_detected": len(new_embeddings),
-                "embeddings_count": int(merged_embeddings.shape[0]),
+                "embeddings_count": next_manifest.total_rows,
                 "successful_images": successful_images,
+                "compaction_due": next_manifest.needs_compaction(MODEL_LOG_COMPACT_MIN_ROWS),
             },
         )
     except Exception as error:
         return build_failure_result(payload, f"Registration pipeline failed: {str(error)}")
 
 
+def extract_embeddings_concurrently(image_urls):
+    # Downloads run on REGISTER_DOWNLOAD_WORKERS threads (sharing the
+    # fetcher's keep-alive session and per-host limit); each thread then
+    # borrows one of the VIDEO_PIPELINE_WORKERS face sessions, so downloads
+    # overlap with detection and no session is used by two threads at once.
+    # Returns one embedding (or None) per URL, in order.
+    sessions = queue.Queue()
+    for app in get_face_apps(VIDEO_PIPELINE_WORKERS):
+        sessions.put(app)
+
+    def extract(image_url):
+        try:
+            image = decode_image(download_bytes(image_url))
+            if image is None:
+                return None
+            app = sessions.get()
+            try:
+                return extract_primary_embedding(image, app)
+            finally:
+                sessions.put(app)
+        except Exception:
+            return None
+
+    if not image_urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(REGISTER_DOWNLOAD_WORKERS, len(image_urls))) as pool:
+        return list(pool.map(extract, image_urls))
+
+
+def handle_register_batch_job(payload):
+    section_id = payload.get("section_id")
+    students = payload.get("students") or []
+
+    if not section_id:
+        return build_failure_result(payload, "section_id is required")
+
+    if not isinstance(students, list) or len(students) == 0:
+        return build_failure_result(payload, "students must be a non-empty array")
+
+    try:
+        outcomes = []
+        image_owners = []
+        image_urls = []
+        for entry in students:
+            entry = entry if isinstance(entry, dict) else {}
+            enrollment = entry.get("enrollment")
+            entry_urls = entry.get("image_urls") or []
+            outcome = {
+                "enrollment": str(enrollment) if enrollment else None,
+                "status": "failed",
+                "faces_detected": 0,
+            }
+            outcomes.append(outcome)
+            if not enrollment:
+                outcome["error"] = "enrollment is required"
+                continue
+            if not isinstance(entry_urls, list) or len(entry_urls) == 0:
+                outcome["error"] = "image_urls must be a non-empty array"
+                continue
+            image_owners.extend([len(outcomes) - 1] * len(entry_urls))
+            image_urls.extend(entry_urls)
+
+        row_enrollments = []
+        rows = []
+        for owner, embedding in zip(image_owners, extract_embeddings_concurrently(image_urls)):
+            if embedding is None:
+                continue
+            outcomes[owner]["faces_detected"] += 1
+            row_enrollments.append(outcomes[owner]["enrollment"])
+            rows.append(embedding)
+
+        for outcome in outcomes:
+            if outcome.get("error"):
+                continue
+            if outcome["faces_detected"]:
+                outcome["status"] = "registered"
+            else:
+                outcome["error"] = "No faces detected in registration images"
+
+        registered = sum(1 for outcome in outcomes if outcome["status"] == "registered")
+        if not rows:
+            result = build_failure_result(payload, "No faces detected for any student in the batch")
+            result["students"] = outcomes
+            return result
+
+        # The whole batch becomes one delta segment and one model version
+        current_model_url = register_base_url(payload)
+        manifest = load_manifest(current_model_url, section_id)
+        delta_store = EmbeddingStore.from_rows(row_enrollments, np.array(rows, dtype=np.float32))
+        model_url, next_manifest = append_model_delta(section_id, manifest, delta_store)
+
+        return build_success_result(
+            payload,
+            {
+                "section_id": int(section_id),
+                "model_url": model_url,
+                "model_version": next_manifest.model_version,
+                # The gateway applies model_url only if the section still
+                # points at the manifest it was built on
+                "based_on": current_model_url,
+                "students_registered": registered,
+                "students_failed": len(outcomes) - registered,
+                "faces_detected": len(rows),
+                "embeddings_count": next_manifest.total_rows,
+                "compaction_due": next_manifest.needs_compaction(MODEL_LOG_COMPACT_MIN_ROWS),
+                "students": outcomes,
+            },
+        )
+    except Exception as error:
+        return build_failure_result(payload, f"Batch registration pipeline failed: {str(error)}")
+
+
 def handle_recognize_job(payload):
     model_url = payload.get("model_url")
     capture_urls = payload.get("capture_urls") or []
@@ -327,6 +765,8 @@ def handle_recognize_job(payload):
     section_id = payload.get("section_id")
     confidence_threshold = float(payload.get("confidence_threshold", 0.6))
     video_skip_frames = int(payload.get("video_skip_frames", 30))
+    video_sampling_mode = payload.get("video_sampling_mode") or SAMPLING_STRIDE
+    video_sample_seconds = float(payload.get("video_sample_seconds", 1.0))
 
     if not model_url:
         return build_failure_result(payload, "model_url is required")
@@ -334,9 +774,11 @@ def handle_recognize_job(payload):
         return build_failure_result(payload, "class_id and section_id are required")
     if not isinstance(capture_urls, list) or len(capture_urls) == 0:
         return build_failure_result(payload, "capture_urls must be a non-empty array")
+    if video_sampling_mode not in SAMPLING_MODES:
+        return build_failure_result(payload, f"unknown video_sampling_mode: {video_sampling_mode}")
 
     try:
-        known_enrollments, known_embeddings = load_npz_model_from_url(model_url)
+        known_enrollments, known_embeddings = load_model_from_url(model_url)
         if known_embeddings.shape[0] == 0:
             return build_failure_result(payload, "Model has no embeddings")
 
@@ -345,38 +787,90 @@ def handle_recognize_job(payload):
         processed_captures = 0
         processed_frames = 0
         frame_cursor = 0
+        sampling_totals = {
+            "mode": video_sampling_mode,
+            "frames_decoded": 0,
+            "frames_analyzed": 0,
+            "fallback": None,
+            "faces_detected": 0,
+            "embeddings_computed": 0,
+        }
+
+        known_normalized = normalize_rows(known_embeddings.astype(np.float32))
+        skip_frames = max(1, video_skip_frames)
+        # The gallery size bounds how many faces a capture should show,
+        # which sizes the adaptive detector input
+        expected_faces = expected_faces_bucket(len(set(known_enrollments)))
+        detection_timings = DetectionTimings()
+
+        def below_threshold(embedding):
+            # Tracks keep being re-embedded until one view matches someone
+            query = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+            return float(np.max(known_normalized @ query.T)) < confidence_threshold
+
+        cached = cached_capture_analyses(
+            capture_urls,
+            model=INSIGHTFACE_MODEL_NAME,
+            detection=detection_params(expected_faces),
+            sampling_mode=video_sampling_mode,
+            skip_frames=skip_frames,
+            sample_seconds=video_sample_seconds,
+            tracking=tracking_params(),
+            # Tracked videos re-embed faces until they match this gallery
+            # at this threshold, so their embeddings depend on both
+            refresh=[confidence_threshold, model_url] if FACE_TRACKING else None,
+        )
 
-        for capture_url in capture_urls:
+        # Only captures without cached embeddings are downloaded, up to
+        # CAPTURE_PREFETCH ahead of the one being analyzed. Captures are
+        # still scored in capture order, so frame_cursor numbers frames
+        # exactly as a sequential run would.
+        downloads = _fetcher.map_ordered(
+            download_to_file,
+            [capture_url for capture_url, (_, analysis) in zip(capture_urls, cached) if analysis is None],
+            window=CAPTURE_PREFETCH,
+            discard=remove_downloaded_file,
+        )
+        for cache_key, analysis in cached:
             try:
-                media_bytes = download_bytes(capture_url)
-                image = decode_image(media_bytes)
-
-                if image is not None:
-                    unmatched, _ = process_frame_for_matches(
-                        image,
-                        frame_cursor,
-                        known_enrollments,
-                        known_embeddings,
-                        confidence_threshold,
-                        matches_map,
-                    )
-                    unmatched_faces += unmatched
-                    processed_frames += 1
-                    frame_cursor += 1
-                    processed_captures += 1
-                    continue
-
-                unmatched, frames_done, frame_cursor = process_video_bytes(
-                    media_bytes,
+                if analysis is None:
+                    fetched = next(downloads)
+                    if not fetched.ok:
+                        continue
+                    try:
+                        analysis = analyze_capture(
+                            fetched.value[0],
+                            skip_frames,
+                            video_sampling_mode,
+                            video_sample_seconds,
+                            sampling_totals,
+                            below_threshold,
+                            expected_faces,
+                            detection_timings,
+                        )
+                    finally:
+                        remove_downloaded_file(fetched.value)
+
+                    if analysis is None:
+                        processed_captures += 1
+                        continue
+                    if cache_key is not None:
+                        try:
+                            _capture_cache.put(cache_key, analysis)
+                        except OSError:
+                            traceback.print_exc()
+
+                unmatched, frames_done = score_capture(
+                    analysis,
+                    frame_cursor,
                     known_enrollments,
-                    known_embeddings,
+                    known_normalized,
                     confidence_threshold,
                     matches_map,
-                    frame_cursor,
-                    max(1, video_skip_frames),
                 )
                 unmatched_faces += unmatched
                 processed_frames += frames_done
+                frame_cursor += frames_done
                 processed_captures += 1
             except Exception:
                 continue
@@ -401,76 +895,123 @@ def handle_recognize_job(payload):
                 "unmatched_faces": int(unmatched_faces),
                 "processed_captures": int(processed_captures),
                 "processed_frames": int(processed_frames),
+                "video_sampling": sampling_totals,
+                "detection_timings": detection_timings.as_dict(),
                 "confidence_threshold": confidence_threshold,
+                "model_cache": _model_cache.stats(),
+                "capture_cache": {
+                    "hits": sum(1 for _, analysis in cached if analysis is not None),
+                    "misses": sum(1 for _, analysis in cached if analysis is None),
+                },
             },
         )
     except Exception as error:
         return build_failure_result(payload, f"Recognition pipeline failed: {str(error)}")
 
 
-def publish_result(channel, result_payload):
-    channel.basic_publish(
-        exchange="",
-        routing_key=FACE_RESULTS_QUEUE,
-        body=json.dumps(result_payload).encode("utf-8"),
-        properties=pika.BasicProperties(
-            content_type="application/json",
-            delivery_mode=2,
-        ),
-    )
+def init_worker_process():
+    # Runs once in every inference process, so jobs find warm sessions
+    configure_cloudinary()
+    get_face_apps(VIDEO_PIPELINE_WORKERS)
 
 
-def process_message(channel, method, properties, body):
-    payload = {}
+def run_job(payload):
     try:
-        payload = json.loads(body.decode("utf-8"))
         job_type = payload.get("job_type")
 
         if job_type == "register":
-            result = handle_register_job(payload)
-        elif job_type == "recognize":
-            result = handle_recognize_job(payload)
-        else:
-            result = build_failure_result(payload, f"unknown job type: {job_type}")
+            return handle_register_job(payload)
+        if job_type == "register_batch":
+            return handle_register_batch_job(payload)
+        if job_type == "recognize":
+            return handle_recognize_job(payload)
+        return build_failure_result(payload, f"unknown job type: {job_type}")
     except Exception as error:
         traceback.print_exc()
-        result = build_failure_result(payload, f"worker crashed: {str(error)}")
+        return build_failure_result(payload, f"worker crashed: {str(error)}")
+
 
+def run_compaction_job(register_result):
+    # Runs after the registration was acknowledged; the compacted manifest
+    # is published as its own result so the gateway can swap it in.
+    section_id = register_result["section_id"]
     try:
-        publish_result(channel, result)
-        channel.basic_ack(delivery_tag=method.delivery_tag)
+        compacted = compact_section_model(section_id, register_result["model_url"])
+        if compacted is None:
+            return None
+        model_url, manifest = compacted
+        return {
+            "job_type": "compact",
+            "status": "success",
+            "section_id": int(section_id),
+            "model_url": model_url,
+            "model_version": manifest.model_version,
+            "compacted_from": register_result["model_url"],
+            "embeddings_count": manifest.total_rows,
+            "timestamp": int(time.time()),
+        }
     except Exception:
         traceback.print_exc()
-        channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return None
 
 
-def main():
-    configure_cloudinary()
+def register_job_lane(payload):
+    # Registrations of one section run one after another (with their
+    # compaction), each starting from the manifest the previous one wrote
+    if payload.get("job_type") in REGISTER_JOB_TYPES and payload.get("section_id"):
+        return str(payload["section_id"])
+    return None
 
-    params = pika.URLParameters(RABBITMQ_URL)
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
 
-    channel.queue_declare(queue=FACE_REGISTER_QUEUE, durable=True)
-    channel.queue_declare(queue=FACE_RECOGNIZE_QUEUE, durable=True)
-    channel.queue_declare(queue=FACE_RESULTS_QUEUE, durable=True)
-    channel.basic_qos(prefetch_count=1)
+def job_section(payload):
+    section_id = payload.get("section_id")
+    return str(section_id) if section_id else None
 
-    channel.basic_consume(
-        queue=FACE_REGISTER_QUEUE,
-        on_message_callback=lambda ch, method, props, msg_body: process_message(
-            ch, method, props, msg_body
-        ),
-    )
-    channel.basic_consume(
-        queue=FACE_RECOGNIZE_QUEUE,
-        on_message_callback=lambda ch, method, props, msg_body: process_message(
-            ch, method, props, msg_body
-        ),
+
+def prepare_register_job(payload):
+    if payload.get("job_type") not in REGISTER_JOB_TYPES or not payload.get("section_id"):
+        return payload
+    return dict(payload, current_model_url=register_base_url(payload))
+
+
+def record_result_head(result):
+    if result.get("status") != "success" or not result.get("model_url"):
+        return
+    if result.get("job_type") in REGISTER_JOB_TYPES + ("compact",):
+        record_section_head(result["section_id"], int(result["model_version"]), result["model_url"])
+
+
+def main():
+    runtime = WorkerRuntime(
+        amqp_url=RABBITMQ_URL,
+        queue_prefetch={
+            FACE_REGISTER_QUEUE: FACE_REGISTER_PREFETCH,
+            FACE_RECOGNIZE_QUEUE: FACE_RECOGNIZE_PREFETCH,
+        },
+        queue_priority={
+            FACE_REGISTER_QUEUE: FACE_REGISTER_PRIORITY,
+            FACE_RECOGNIZE_QUEUE: FACE_RECOGNIZE_PRIORITY,
+        },
+        results_queue=FACE_RESULTS_QUEUE,
+        processes=WORKER_PROCESSES,
+        run_job=run_job,
+        failure_result=build_failure_result,
+        initializer=init_worker_process,
+        lane_of=register_job_lane,
+        fairness_of=job_section,
+        deadline_of=lambda payload: parse_deadline(payload.get("deadline")),
+        prepare_job=prepare_register_job,
+        record_result=record_result_head,
+        follow_up_due=lambda result: bool(result.get("compaction_due")),
+        run_follow_up=run_compaction_job,
+        result_store=ResultStore(RESULT_STORE_PATH, RESULT_STORE_TTL_SECONDS) if RESULT_STORE_PATH else None,
     )
 
-    print("ML worker started. Waiting for face jobs...")
-    channel.start_consuming()
+    print(f"ML worker started with {WORKER_PROCESSES} inference processes. Waiting for face jobs...")
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
@@ -4,17 +4,20 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import uuid
 import pandas as pd
 import numpy as np
-from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import execute_values
 from datetime import datetime, date
 import bcrypt
 from student.studentRouter import student_router
-from schedule.models import ScheduleRequest
-from schedule.scheduler import generate_schedule as solve_schedule
+from routes.dependencies import db_pool, get_db, get_db_connection
+from schedule.models import ScheduleRepairRequest, ScheduleRequest
+from schedule.jobs import ScheduleJobNotFound, schedule_jobs
+import asyncio
+import json
 load_dotenv()
 
 # Load environment variables
@@ -149,23 +152,12 @@ class DataValidator:
         
         return validated_data
 
-# Database connection function (same as previous implementation)
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
-        )
-        return conn
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
-
 @app.post("/generate-schedule")
 async def generate_schedule_endpoint(request: ScheduleRequest):
     try:
-        solved = solve_schedule(request)
+        # Solved in the schedule job pool so the event loop keeps serving
+        # other requests for the whole solve
+        solved = await schedule_jobs.solve(request)
         if hasattr(solved, "model_dump"):
             return solved.model_dump()
         return solved.dict()
@@ -173,6 +165,100 @@ async def generate_schedule_endpoint(request: ScheduleRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/repair-schedule")
+async def repair_schedule_endpoint(request: ScheduleRepairRequest):
+    """
+    Re-solve a previous timetable after faculty leave or room closures,
+    reopening only the classes the change touches where possible.
+    """
+    try:
+        solved = await schedule_jobs.solve(request)
+        if hasattr(solved, "model_dump"):
+            return solved.model_dump()
+        return solved.dict()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _schedule_job_or_404(job_id: str):
+    try:
+        return schedule_jobs.get(job_id)
+    except ScheduleJobNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown schedule job: {job_id}")
+
+
+@app.post("/schedule-jobs", status_code=202)
+async def submit_schedule_job(request: ScheduleRequest):
+    """
+    Start a schedule solve in the background and return its job id.
+    Progress is available from GET /schedule-jobs/{job_id} (polling) or
+    GET /schedule-jobs/{job_id}/events (server-sent events).
+    """
+    job = schedule_jobs.submit(request)
+    return job.snapshot(include_result=False)
+
+
+@app.post("/schedule-jobs/repair", status_code=202)
+async def submit_schedule_repair_job(request: ScheduleRepairRequest):
+    """
+    Start a timetable repair in the background; tracked like any other
+    schedule job.
+    """
+    job = schedule_jobs.submit(request)
+    return job.snapshot(include_result=False)
+
+
+@app.get("/schedule-jobs")
+async def list_schedule_jobs():
+    return {"jobs": schedule_jobs.list_jobs(), **schedule_jobs.stats()}
+
+
+@app.get("/schedule-jobs/{job_id}")
+async def get_schedule_job(job_id: str):
+    return _schedule_job_or_404(job_id).snapshot()
+
+
+@app.delete("/schedule-jobs/{job_id}")
+async def cancel_schedule_job(job_id: str):
+    """
+    Cancel a queued job, or stop a running one; a stopped job keeps the
+    best schedule found so far as its result.
+    """
+    _schedule_job_or_404(job_id)
+    return schedule_jobs.cancel(job_id).snapshot(include_result=False)
+
+
+@app.get("/schedule-jobs/{job_id}/events")
+async def stream_schedule_job(job_id: str):
+    """
+    Server-sent events: `status` on state changes, `progress` for every
+    improving solution (objective, best bound, gap, wall time) and a final
+    `done` event carrying the result.
+    """
+    _schedule_job_or_404(job_id)
+
+    async def events():
+        sent = 0
+        while True:
+            try:
+                pending, finished = schedule_jobs.events_since(job_id, sent)
+            except ScheduleJobNotFound:
+                return
+            for kind, payload in pending:
+                yield f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+            sent += len(pending)
+            if finished and not pending:
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Router for faculty bulk upload
 faculty_router = APIRouter(prefix="/faculty", tags=["Faculty"])
 
@@ -180,7 +266,7 @@ faculty_router = APIRouter(prefix="/faculty", tags=["Faculty"])
 
 
 @faculty_router.post("/process-faculty-excel")
-async def process_faculty_excel(file: UploadFile = File(...)):
+def process_faculty_excel(file: UploadFile = File(...), conn=Depends(get_db)):
     try:
         # Read Excel file
         df = pd.read_excel(file.file)
@@ -196,8 +282,6 @@ async def process_faculty_excel(file: UploadFile = File(...)):
             if col not in df.columns:
                 raise HTTPException(status_code=400, detail=f"Missing required column: {col}")
         
-        # Establish database connection
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Prepare lists for bulk insert
@@ -277,9 +361,7 @@ async def process_faculty_excel(file: UploadFile = File(...)):
             }, status_code=500)
         
         finally:
-            # Close database connection
             cursor.close()
-            conn.close()
         
         return JSONResponse(content={
             "message": f"Successfully uploaded {successful_uploads} faculty records",
@@ -291,10 +373,8 @@ async def process_faculty_excel(file: UploadFile = File(...)):
 
 # Additional SQL-based endpoints
 @faculty_router.get("/")
-async def list_faculty(skip: int = 0, take: int = 10):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+def list_faculty(skip: int = 0, take: int = 10):
+    with get_db_connection() as conn, conn.cursor() as cursor:
         query = """
         SELECT 
             f.faculty_id, 
@@ -321,15 +401,10 @@ async def list_faculty(skip: int = 0, take: int = 10):
         ]
         
         return faculty_list
-    finally:
-        cursor.close()
-        conn.close()
 
 @faculty_router.get("/{faculty_id}")
-async def get_faculty(faculty_id: int):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
+def get_faculty(faculty_id: int):
+    with get_db_connection() as conn, conn.cursor() as cursor:
         query = """
         SELECT 
             f.*, 
@@ -371,16 +446,31 @@ async def get_faculty(faculty_id: int):
         }
         
         return faculty_dict
-    finally:
-        cursor.close()
-        conn.close()
 
 # Include the router in the app
 from routes.face_recognition import face_router
+from routes.insightface_service import face_model_manager
 app.include_router(face_router)
 app.include_router(faculty_router)
 app.include_router(student_router)
 
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    # Connection pool counters for monitoring
+    return db_pool.stats()
+
+@app.on_event("startup")
+async def preload_face_model():
+    # FACE_MODEL_PRELOAD=true pays the InsightFace cold start at boot
+    # instead of on the first face request
+    if face_model_manager.preload_on_startup:
+        face_model_manager.preload()
+
+@app.on_event("shutdown")
+async def stop_schedule_jobs():
+    # Stops running searches and the schedule job pool
+    schedule_jobs.shutdown()
+
 # Optional: Add a root endpoint
 @app.get("/")
 async def root():
@@ -0,0 +1,159 @@
+"""
+Buffered attendance writes for face recognition sessions.
+
+A video or live stream can recognize the same students hundreds of times.
+Instead of a connection, a student lookup and a commit per recognized face,
+the buffer resolves enrollment -> student_id for the whole section with one
+query, collects matches in memory and writes them with a single multi-row
+INSERT ... ON CONFLICT DO NOTHING per flush. A flush is due once the flush
+interval has passed or max_pending students are queued, whichever is first.
+"""
+
+import json
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import psycopg2.extras
+from psycopg2.extras import execute_values
+
+DEFAULT_MAX_PENDING = 200
+
+
+class AttendanceWriteBuffer:
+    """
+    Collects recognized students for one class session and flushes them to
+    the attendance table in batches.
+    """
+
+    def __init__(
+        self,
+        section_id: int,
+        class_id: int,
+        attendance_date: date,
+        device_type: str,
+        flush_interval_seconds: float = 5.0,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ):
+        self.section_id = section_id
+        self.class_id = class_id
+        self.attendance_date = attendance_date
+        self.device_type = device_type
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max(1, max_pending)
+
+        self.student_ids: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushed = set()
+        self._last_flush = time.monotonic()
+
+        self.flushes = 0
+        self.unknown_enrollments = 0
+
+    def load_students(self, conn) -> int:
+        """
+        Resolve enrollment -> student_id for the whole section in one query.
+
+        Returns:
+            Number of students in the section
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT enrollment_number, student_id
+            FROM students
+            WHERE section_id = %s
+        """, (self.section_id,))
+        self.student_ids = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.close()
+        return len(self.student_ids)
+
+    def add(
+        self,
+        enrollment: str,
+        confidence: float,
+        detection_score: float,
+        **extra_device_info
+    ) -> bool:
+        """
+        Queue a recognized student. Repeated sightings before a flush keep the
+        most confident one; students already written are ignored.
+
+        Returns:
+            True if the sighting was queued or improved a queued one
+        """
+        if enrollment in self._flushed:
+            return False
+        if enrollment not in self.student_ids:
+            self.unknown_enrollments += 1
+            return False
+
+        queued = self._pending.get(enrollment)
+        if queued is not None and queued['recognition_confidence'] >= confidence:
+            return False
+
+        self._pending[enrollment] = {
+            "device_type": self.device_type,
+            "recognition_confidence": confidence,
+            "detection_score": detection_score,
+            **extra_device_info
+        }
+        return True
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def should_flush(self) -> bool:
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            return True
+        return time.monotonic() - self._last_flush >= self.flush_interval_seconds
+
+    def flush(self, conn) -> List[Dict]:
+        """
+        Insert every queued student in one statement and commit.
+
+        Returns:
+            Newly inserted attendance rows (students already marked for this
+            class and date are skipped by ON CONFLICT)
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return []
+
+        now = datetime.now()
+        rows = [
+            (
+                self.class_id,
+                self.student_ids[enrollment],
+                self.attendance_date,
+                'present',
+                'facial',
+                json.dumps(device_info),
+                now
+            )
+            for enrollment, device_info in self._pending.items()
+        ]
+
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            inserted = execute_values(cursor, """
+                INSERT INTO attendance (
+                    class_id, student_id, date, status,
+                    verification_method, device_info, created_at
+                ) VALUES %s
+                ON CONFLICT (class_id, student_id, date) DO NOTHING
+                RETURNING *
+            """, rows, page_size=max(100, len(rows)), fetch=True)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self._flushed.update(self._pending.keys())
+        self._pending.clear()
+        self.flushes += 1
+        return inserted
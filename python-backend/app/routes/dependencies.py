@@ -1,36 +1,190 @@
 import psycopg2
+from psycopg2 import pool
 from typing import Generator
 import os
+import threading
+import time
 from contextlib import contextmanager
 
+from fastapi import HTTPException
+
 def get_db_settings():
     return {
         "dbname": os.getenv("DB_NAME"),
         "user": os.getenv("DB_USER"),
         "password": os.getenv("DB_PASSWORD"),
-        "host": os.getenv("DB_HOST"),
+        "host": os.getenv("DB_HOST", "localhost"),
     }
 
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class DatabasePool:
+    """
+    Process-wide psycopg2 ThreadedConnectionPool with bounded checkout waits,
+    health checks for idle connections and usage counters.
+    """
+
+    def __init__(
+        self,
+        minconn: int = 1,
+        maxconn: int = 10,
+        checkout_timeout: float = 10.0,
+        health_check_after: float = 30.0,
+    ):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        self._pool = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool fails immediately when exhausted; the
+        # semaphore turns that into a bounded wait.
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._returned_at = {}
+
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.total_wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "DatabasePool":
+        return cls(
+            minconn=int(os.getenv("DB_POOL_MIN", "1")),
+            maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+            checkout_timeout=float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10")),
+            health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+        )
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn, **get_db_settings()
+                )
+            return self._pool
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.checkout_timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeoutError(
+                    f"No database connection available within {self.checkout_timeout}s"
+                )
+        waited = time.monotonic() - started
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.total_wait_seconds += waited
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+        return conn
+
+    def _checkout_healthy(self):
+        db_pool = self._get_pool()
+        conn = db_pool.getconn()
+        if conn.closed or self._needs_health_check(conn):
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                with self._lock:
+                    self.health_check_failures += 1
+                db_pool.putconn(conn, close=True)
+                conn = db_pool.getconn()
+        return conn
+
+    def _needs_health_check(self, conn) -> bool:
+        returned_at = self._returned_at.get(id(conn))
+        return returned_at is None or time.monotonic() - returned_at > self.health_check_after
+
+    def putconn(self, conn):
+        close = bool(conn.closed)
+        if not close and conn.status != psycopg2.extensions.STATUS_READY:
+            # Never hand an open transaction to the next caller
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        try:
+            self._get_pool().putconn(conn, close=close)
+            if close:
+                self._returned_at.pop(id(conn), None)
+            else:
+                self._returned_at[id(conn)] = time.monotonic()
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_connections": self.minconn,
+                "max_connections": self.maxconn,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                # Checkouts that can start without waiting
+                "available": self.maxconn - self.in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "health_check_failures": self.health_check_failures,
+                "avg_wait_ms": (self.total_wait_seconds / self.checkouts * 1000) if self.checkouts else 0.0,
+                "checkout_timeout_seconds": self.checkout_timeout,
+            }
+
+    def closeall(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._returned_at.clear()
+
+
+db_pool = DatabasePool.from_env()
+
 @contextmanager
 def get_db_connection():
-    conn = psycopg2.connect(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password= os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-    )
+    """
+    Check a connection out of the pool for the duration of the block.
+
+    Blocks for up to DB_POOL_CHECKOUT_TIMEOUT seconds, so call it from plain
+    `def` endpoints (FastAPI's threadpool), never from the event loop. A
+    checkout that times out or cannot connect raises HTTPException 500.
+    """
+    try:
+        conn = db_pool.getconn()
+    except (pool.PoolError, psycopg2.Error) as e:
+        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}") from e
     try:
         yield conn
     finally:
-        conn.close()
+        db_pool.putconn(conn)
 
-# Dependency to get DB connection
-async def get_db():
+# Dependency to get DB connection; a plain generator so FastAPI checks the
+# connection out on its threadpool instead of blocking the event loop
+def get_db():
     with get_db_connection() as conn:
-        try:
-            yield conn
-        finally:
-            conn.close()
+        yield conn
 
 # Usage in FastAPI endpoints
-# db: Connection = Depends(get_db)
\ No newline at end of file
+# db: Connection = Depends(get_db)
@@ -0,0 +1,364 @@
+"""
+Adaptive face detection and separately timed recognition.
+
+FaceAnalysis.get() runs the detector at one fixed input size and then
+every model head the pack ships. With det_size fixed at 320x320, a 1080p
+classroom shot is shrunk six times and back-row faces fall below the
+detector's minimum face size, while a small phone capture pays for the
+same 320x320 pass as anything else.
+
+Here the detector input is chosen per frame: it keeps the frame's aspect
+ratio and is scaled so the faces expected in the frame (from the frame
+area and the expected face count) stay above `min_face_px`, within
+[min_size, max_size]. A frame that would need a larger input than
+`max_size` is split into overlapping tiles that are detected separately
+and merged with NMS. Only the detection and recognition models are loaded
+(`FACE_MODULES`); the landmark and gender/age heads of the buffalo packs
+are skipped. Detector and recognizer time are accumulated separately in
+DetectionTimings.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DETECTION_FIXED = "fixed"
+DETECTION_ADAPTIVE = "adaptive"
+DETECTION_MODES = (DETECTION_FIXED, DETECTION_ADAPTIVE)
+
+# Model heads loaded into FaceAnalysis (allowed_modules)
+FACE_MODULES = ["detection", "recognition"]
+
+FIXED_DET_SIZE = (320, 320)
+DEFAULT_MIN_SIZE = 160
+DEFAULT_MAX_SIZE = 960
+DEFAULT_MIN_FACE_PX = 32
+DEFAULT_TILE_OVERLAP = 0.2
+DEFAULT_NMS_IOU = 0.4
+
+# Share of the frame area one expected face accounts for (face box plus
+# body and background around it), used to estimate the face size
+_FACE_AREA_FRACTION = 1.0 / 12.0
+_STRIDE = 32
+
+
+@dataclass
+class DetectionTimings:
+    frames: int = 0
+    tiles: int = 0
+    faces: int = 0
+    detection_ms: float = 0.0
+    recognition_ms: float = 0.0
+
+    def add(self, other: "DetectionTimings") -> None:
+        self.frames += other.frames
+        self.tiles += other.tiles
+        self.faces += other.faces
+        self.detection_ms += other.detection_ms
+        self.recognition_ms += other.recognition_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["detection_ms"] = round(self.detection_ms, 2)
+        data["recognition_ms"] = round(self.recognition_ms, 2)
+        return data
+
+
+def _round_to_stride(value: float) -> int:
+    return max(_STRIDE, int(math.ceil(value / _STRIDE)) * _STRIDE)
+
+
+def detection_scale(
+    frame_shape: Tuple[int, ...],
+    expected_faces: Optional[int] = None,
+    min_size: int = DEFAULT_MIN_SIZE,
+    min_face_px: int = DEFAULT_MIN_FACE_PX,
+) -> float:
+    """
+    Factor (at most 1) by which the frame is shrunk for the detector so the
+    expected faces stay about min_face_px wide.
+    """
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    long_side = max(height, width, 1)
+    faces = max(1, int(expected_faces or 1))
+
+    face_px = math.sqrt(height * width * _FACE_AREA_FRACTION / faces)
+    scale = min(1.0, min_face_px / max(face_px, 1.0))
+    return min(1.0, max(scale, min_size / long_side))
+
+
+def choose_det_size(
+    frame_shape: Tuple[int, ...],
+    expected_faces: Optional[int] = None,
+    min_size: int = DEFAULT_MIN_SIZE,
+    max_size: int = DEFAULT_MAX_SIZE,
+    min_face_px: int = DEFAULT_MIN_FACE_PX,
+) -> Tuple[Tuple[int, int], bool]:
+    """
+    Detector input size for a frame.
+
+    Args:
+        frame_shape: Shape of the BGR frame (height, width, ...)
+        expected_faces: Roughly how many faces the frame holds (e.g. the
+            section size for a classroom shot); 1 when unknown
+        min_size: Smallest long side of the detector input
+        max_size: Largest long side before the frame is tiled
+        min_face_px: Face size to keep at the detector's resolution
+
+    Returns:
+        ((width, height) multiples of 32, needs_tiling); when tiling is
+        needed the size is capped at max_size
+    """
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    scale = detection_scale(frame_shape, expected_faces, min_size, min_face_px)
+    needs_tiling = max(height, width) * scale > max_size
+    if needs_tiling:
+        scale = max_size / max(height, width)
+    return (_round_to_stride(width * scale), _round_to_stride(height * scale)), needs_tiling
+
+
+def _tile_origins(length: int, tile: int, overlap: float) -> List[int]:
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1.0 - overlap)))
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def _inner_edge_cuts(
+    boxes: np.ndarray,
+    x: int,
+    y: int,
+    tile: int,
+    x_origins: List[int],
+    y_origins: List[int],
+    margin: float = 2.0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Boxes cut by an inner tile edge, and those of them inside the overlap
+    with the neighbouring tile, which sees at least as much of the face
+    (all of it when the face fits in the overlap). Faces wider than the
+    overlap are cut in every tile they touch.
+    """
+    cut = np.zeros(len(boxes), dtype=bool)
+    whole = np.zeros(len(boxes), dtype=bool)
+    for origin, origins, low, high in ((x, x_origins, 0, 2), (y, y_origins, 1, 3)):
+        position = origins.index(origin)
+        if position > 0:
+            previous_end = origins[position - 1] + tile - origin
+            at_edge = boxes[:, low] <= margin
+            cut |= at_edge
+            whole |= at_edge & (boxes[:, high] <= previous_end)
+        if position + 1 < len(origins):
+            next_start = origins[position + 1] - origin
+            at_edge = boxes[:, high] >= tile - margin
+            cut |= at_edge
+            whole |= at_edge & (boxes[:, low] >= next_start)
+    return cut, whole
+
+
+def _nms(boxes: np.ndarray, iou_threshold: float, pieces: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Indices of the boxes kept, best score first.
+
+    Boxes flagged in `pieces` are parts of a face cut by tile edges; they
+    are matched by containment rather than IoU, and the box kept grows to
+    their union (in place), so the parts of one face become one box.
+    """
+    # boxes: (N, 5) x1, y1, x2, y2, score
+    order = np.argsort(-boxes[:, 4])
+    keep = []
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    while order.size:
+        current = int(order[0])
+        keep.append(current)
+        rest = order[1:]
+        while rest.size:
+            x1 = np.maximum(boxes[current, 0], boxes[rest, 0])
+            y1 = np.maximum(boxes[current, 1], boxes[rest, 1])
+            x2 = np.minimum(boxes[current, 2], boxes[rest, 2])
+            y2 = np.minimum(boxes[current, 3], boxes[rest, 3])
+            intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+            overlap = intersection / np.maximum(areas[current] + areas[rest] - intersection, 1e-9)
+            if pieces is None:
+                rest = rest[overlap <= iou_threshold]
+                break
+            cut = pieces[current] | pieces[rest]
+            containment = intersection / np.maximum(np.minimum(areas[current], areas[rest]), 1e-9)
+            overlap = np.where(cut, np.maximum(overlap, containment), overlap)
+            merged = rest[cut & (overlap > iou_threshold)]
+            rest = rest[overlap <= iou_threshold]
+            if not merged.size:
+                break
+            # The grown box may now contain further pieces
+            boxes[current, :2] = np.minimum(boxes[current, :2], boxes[merged, :2].min(axis=0))
+            boxes[current, 2:4] = np.maximum(boxes[current, 2:4], boxes[merged, 2:4].max(axis=0))
+            areas[current] = (boxes[current, 2] - boxes[current, 0]) * (boxes[current, 3] - boxes[current, 1])
+        order = rest
+    return keep
+
+
+def detect_boxes(
+    det_model,
+    frame: np.ndarray,
+    expected_faces: Optional[int] = None,
+    min_size: int = DEFAULT_MIN_SIZE,
+    max_size: int = DEFAULT_MAX_SIZE,
+    min_face_px: int = DEFAULT_MIN_FACE_PX,
+    tile_overlap: float = DEFAULT_TILE_OVERLAP,
+    timings: Optional[DetectionTimings] = None,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Run the detector at an input size chosen for the frame.
+
+    Returns:
+        (N, 5) boxes with scores and (N, 5, 2) keypoints (or None), in frame
+        coordinates
+    """
+    started = time.perf_counter()
+    det_size, needs_tiling = choose_det_size(
+        frame.shape, expected_faces, min_size, max_size, min_face_px
+    )
+    tiles = 1
+
+    if not needs_tiling:
+        bboxes, kpss = det_model.detect(frame, input_size=det_size, max_num=0, metric="default")
+    else:
+        # Square tiles that are max_size wide at the scale wanted for the
+        # whole frame, overlapping so every face is whole in some tile
+        height, width = frame.shape[:2]
+        scale = detection_scale(frame.shape, expected_faces, min_size, min_face_px)
+        tile = int(max_size / scale)
+        x_origins = _tile_origins(width, tile, tile_overlap)
+        y_origins = _tile_origins(height, tile, tile_overlap)
+        all_boxes, all_kps, all_pieces = [], [], []
+        tiles = 0
+        for y in y_origins:
+            for x in x_origins:
+                crop = frame[y:y + tile, x:x + tile]
+                crop_input = (
+                    _round_to_stride(crop.shape[1] * scale),
+                    _round_to_stride(crop.shape[0] * scale),
+                )
+                boxes, kps = det_model.detect(crop, input_size=crop_input, max_num=0, metric="default")
+                tiles += 1
+                if boxes is None or not len(boxes):
+                    continue
+                # A face cut by an inner tile edge but inside the overlap is
+                # whole in the neighbouring tile, so its partial box is
+                # dropped. Larger faces are cut in every tile; their pieces
+                # are merged by _nms
+                cut, whole = _inner_edge_cuts(boxes, x, y, tile, x_origins, y_origins)
+                boxes = boxes[~whole]
+                kps = kps[~whole] if kps is not None else None
+                if not len(boxes):
+                    continue
+                all_pieces.append(cut[~whole])
+                boxes = boxes.copy()
+                boxes[:, [0, 2]] += x
+                boxes[:, [1, 3]] += y
+                all_boxes.append(boxes)
+                if kps is not None:
+                    kps = kps.copy()
+                    kps[:, :, 0] += x
+                    kps[:, :, 1] += y
+                    all_kps.append(kps)
+        if all_boxes:
+            bboxes = np.concatenate(all_boxes)
+            kpss = np.concatenate(all_kps) if len(all_kps) == len(all_boxes) else None
+            keep = _nms(bboxes, DEFAULT_NMS_IOU, np.concatenate(all_pieces))
+            bboxes = bboxes[keep]
+            kpss = kpss[keep] if kpss is not None else None
+        else:
+            bboxes, kpss = np.empty((0, 5), dtype=np.float32), None
+
+    if timings is not None:
+        timings.frames += 1
+        timings.tiles += tiles
+        timings.faces += int(len(bboxes))
+        timings.detection_ms += (time.perf_counter() - started) * 1000.0
+    return bboxes, kpss
+
+
+def detect_faces(
+    app,
+    frame: np.ndarray,
+    mode: str = DETECTION_ADAPTIVE,
+    expected_faces: Optional[int] = None,
+    timings: Optional[DetectionTimings] = None,
+    **options,
+) -> List[Any]:
+    """
+    Detect faces without running any other model head.
+
+    Args:
+        app: Prepared FaceAnalysis
+        frame: BGR frame
+        mode: "adaptive" (input size per frame, tiling) or "fixed" (the
+            size the app was prepared with)
+        expected_faces: Passed to choose_det_size in adaptive mode
+        timings: Accumulates detector time
+        **options: min_size, max_size, min_face_px, tile_overlap
+
+    Returns:
+        insightface Face objects with bbox, kps and det_score
+    """
+    from insightface.app.common import Face
+
+    if mode == DETECTION_FIXED:
+        started = time.perf_counter()
+        bboxes, kpss = app.det_model.detect(frame, max_num=0, metric="default")
+        if timings is not None:
+            timings.frames += 1
+            timings.tiles += 1
+            timings.faces += int(len(bboxes))
+            timings.detection_ms += (time.perf_counter() - started) * 1000.0
+    else:
+        bboxes, kpss = detect_boxes(
+            app.det_model, frame, expected_faces, timings=timings, **options
+        )
+
+    return [
+        Face(
+            bbox=bboxes[i, 0:4],
+            kps=kpss[i] if kpss is not None else None,
+            det_score=bboxes[i, 4],
+        )
+        for i in range(bboxes.shape[0])
+    ]
+
+
+def embed_face(app, frame: np.ndarray, face, timings: Optional[DetectionTimings] = None) -> np.ndarray:
+    """
+    Run the recognition model on one detected face (sets face.embedding).
+    """
+    started = time.perf_counter()
+    app.models["recognition"].get(frame, face)
+    if timings is not None:
+        timings.recognition_ms += (time.perf_counter() - started) * 1000.0
+    return face.embedding
+
+
+def analyze_faces(
+    app,
+    frame: np.ndarray,
+    mode: str = DETECTION_ADAPTIVE,
+    expected_faces: Optional[int] = None,
+    timings: Optional[DetectionTimings] = None,
+    **options,
+) -> List[Any]:
+    """
+    Detection plus recognition for every face; replaces app.get().
+    """
+    faces = detect_faces(app, frame, mode, expected_faces, timings, **options)
+    for face in faces:
+        embed_face(app, frame, face, timings)
+    return faces
@@ -0,0 +1,231 @@
+"""
+Lifecycle management for the InsightFace model.
+
+Building FaceAnalysis and preparing its ONNX sessions takes seconds, so
+whether the model stays resident between requests is a deployment choice:
+
+- keep_warm: load once and never release.
+- idle_timeout: release after FACE_MODEL_IDLE_SECONDS without use. An idle
+  timeout of 0 releases at the end of every request, which keeps the
+  footprint of the 512MB free-tier deployment (the default).
+- memory_watermark: keep the model loaded while the process RSS stays
+  below FACE_MODEL_MEMORY_WATERMARK_MB, release it once a request ends
+  above the watermark.
+
+Jobs hold the model with acquire() (or get_sessions()) and hand it back with
+release(); the policy only applies once the last holder has released, so a
+job finishing never unloads the model under another one still running.
+"""
+
+import gc
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+POLICY_KEEP_WARM = "keep_warm"
+POLICY_IDLE_TIMEOUT = "idle_timeout"
+POLICY_MEMORY_WATERMARK = "memory_watermark"
+
+POLICIES = (POLICY_KEEP_WARM, POLICY_IDLE_TIMEOUT, POLICY_MEMORY_WATERMARK)
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process.
+    Falls back to the peak RSS where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class FaceModelManager:
+    """
+    Owns the process-wide model instance and decides when to release it.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        policy: str = POLICY_IDLE_TIMEOUT,
+        idle_seconds: float = 0.0,
+        memory_watermark_mb: int = 400,
+        preload_on_startup: bool = False,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown face model policy: {policy}")
+
+        self.factory = factory
+        self.policy = policy
+        self.idle_seconds = max(0.0, float(idle_seconds))
+        self.memory_watermark_bytes = int(memory_watermark_mb) * 1024 * 1024
+        self.preload_on_startup = preload_on_startup
+
+        self._model = None
+        self._extra_models: List[Any] = []
+        self._lock = threading.RLock()
+        self._idle_timer: Optional[threading.Timer] = None
+        self._last_used = 0.0
+        self._holders = 0
+
+        self.loads = 0
+        self.releases = 0
+        self.last_load_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, factory: Callable[[], Any]) -> "FaceModelManager":
+        """
+        Build a manager from FACE_MODEL_POLICY, FACE_MODEL_IDLE_SECONDS,
+        FACE_MODEL_MEMORY_WATERMARK_MB and FACE_MODEL_PRELOAD.
+        """
+        return cls(
+            factory,
+            policy=os.getenv("FACE_MODEL_POLICY", POLICY_IDLE_TIMEOUT),
+            idle_seconds=float(os.getenv("FACE_MODEL_IDLE_SECONDS", "0")),
+            memory_watermark_mb=int(os.getenv("FACE_MODEL_MEMORY_WATERMARK_MB", "400")),
+            preload_on_startup=os.getenv("FACE_MODEL_PRELOAD", "false").lower() in ("1", "true", "yes"),
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def holders(self) -> int:
+        return self._holders
+
+    def acquire(self):
+        """
+        Hold the model for a job and return it, building it on first use.
+        Every acquire() must be paired with one release().
+        """
+        with self._lock:
+            model = self.get()
+            self._holders += 1
+            self._cancel_idle_timer()
+            return model
+
+    def get(self):
+        """
+        Return the loaded model, building it on first use.
+        Does not hold it; call it inside acquire()/release() so the policy
+        cannot unload the model while it is in use.
+        """
+        with self._lock:
+            self._last_used = time.monotonic()
+            if self._model is None:
+                started = time.perf_counter()
+                self._model = self.factory()
+                self.last_load_seconds = time.perf_counter() - started
+                self.loads += 1
+            return self._model
+
+    def get_sessions(self, count: int) -> List[Any]:
+        """
+        Return `count` independent model instances for parallel inference.
+
+        The first is the shared model returned by get(); the others are built
+        on demand and follow the same lifecycle policy. Holds the model like
+        acquire(), so it must be paired with one release().
+        """
+        with self._lock:
+            primary = self.get()
+            while len(self._extra_models) < max(0, count - 1):
+                started = time.perf_counter()
+                self._extra_models.append(self.factory())
+                self.last_load_seconds = time.perf_counter() - started
+                self.loads += 1
+            self._holders += 1
+            self._cancel_idle_timer()
+            return [primary] + self._extra_models[:max(0, count - 1)]
+
+    def preload(self) -> None:
+        """
+        Load the model ahead of the first request (FastAPI startup hook).
+        """
+        self.get()
+
+    def release(self) -> None:
+        """
+        Signal that a job holding the model has finished; once no job holds
+        it any more, apply the configured policy.
+        """
+        with self._lock:
+            if self._holders == 0:
+                raise RuntimeError("release() called without a matching acquire()")
+            self._holders -= 1
+            self._last_used = time.monotonic()
+            if self._holders > 0 or self._model is None:
+                return
+
+            if self.policy == POLICY_KEEP_WARM:
+                return
+
+            if self.policy == POLICY_MEMORY_WATERMARK:
+                if current_rss_bytes() > self.memory_watermark_bytes:
+                    self.unload()
+                return
+
+            if self.idle_seconds == 0:
+                self.unload()
+            else:
+                self._schedule_idle_check(self.idle_seconds)
+
+    def unload(self) -> None:
+        """
+        Drop the model immediately, regardless of policy.
+        """
+        with self._lock:
+            self._cancel_idle_timer()
+            if self._model is None and not self._extra_models:
+                return
+            self.releases += 1 + len(self._extra_models)
+            self._model = None
+            self._extra_models = []
+        gc.collect()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle_for = time.monotonic() - self._last_used if self._last_used else None
+            return {
+                "policy": self.policy,
+                "loaded": self._model is not None,
+                "instances": (self._model is not None) + len(self._extra_models),
+                "holders": self._holders,
+                "loads": self.loads,
+                "releases": self.releases,
+                "last_load_seconds": self.last_load_seconds,
+                "idle_seconds": self.idle_seconds,
+                "idle_for_seconds": idle_for,
+                "memory_watermark_mb": self.memory_watermark_bytes // (1024 * 1024),
+                "rss_mb": current_rss_bytes() / (1024 * 1024),
+            }
+
+    def _schedule_idle_check(self, delay: float) -> None:
+        self._cancel_idle_timer()
+        self._idle_timer = threading.Timer(delay, self._on_idle_timer)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _on_idle_timer(self) -> None:
+        with self._lock:
+            self._idle_timer = None
+            if self._model is None or self._holders > 0:
+                # The last holder to release re-arms the timer
+                return
+            idle_for = time.monotonic() - self._last_used
+            if idle_for >= self.idle_seconds:
+                self.unload()
+            else:
+                # Used again since the timer was armed; wait out the remainder.
+                self._schedule_idle_check(self.idle_seconds - idle_for)
@@ -1,8 +1,8 @@
 import os
-import requests
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks, Form
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import cv2 
 import numpy as np
@@ -12,19 +12,28 @@ from datetime import date, datetime
 import base64
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from routes.dependencies import get_db_connection
+from routes.dependencies import get_db, get_db_connection
 from routes.attendance import (
     FaceRegistrationRequest,
     AttendanceResponse,
     AttendanceRecord
 )
 from typing import Dict
+from functools import partial
 import asyncio
 import json
 import pickle
 
 # Import InsightFace service (replaces face_recognition library)
-from routes.insightface_service import InsightFaceService, release_face_app
+from routes.insightface_service import InsightFaceService, face_model_manager, section_model_cache
+from routes.face_detection import DetectionTimings
+from routes.frame_pipeline import run_frame_pipeline
+from routes.frame_sampling import FrameSampler, SAMPLING_MODES, SAMPLING_STRIDE
+from routes.attendance_writer import AttendanceWriteBuffer
+from routes.inference_executor import inference_executor, InferenceBusyError
+from routes.section_models import COMPACT_MIN_ROWS, append_section_delta, schedule_compaction
+from routes.fetcher import Fetcher
+from routes.uploads import remove_temp_file, save_upload_to_temp
 
 face_router = APIRouter(
     prefix="/api/face-recognition",
@@ -45,6 +54,16 @@ TEMP_FOLDER = "temp_images"
 TRAINING_FOLDER = "training_images"
 TRAINING_LABEL_FOLDER = "training_labels"
 
+# How often buffered attendance matches are written to the database
+STREAM_FLUSH_INTERVAL_SECONDS = 5.0
+VIDEO_FLUSH_INTERVAL_SECONDS = 30.0
+
+# Inference threads for uploaded videos; each holds its own ONNX session
+FACE_PIPELINE_WORKERS = max(1, int(os.getenv("FACE_PIPELINE_WORKERS", "1")))
+
+# Shared keep-alive session for registration image downloads
+http_fetcher = Fetcher.from_env()
+
 # Ensure directories exist
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 os.makedirs(TRAINING_FOLDER, exist_ok=True)
@@ -58,7 +77,7 @@ class FaceRegistrationRequest(BaseModel):
     imageUrls: List[str]
 
 
-async def upload_to_cloudinary(file_path: str, folder: str) -> str:
+def upload_to_cloudinary(file_path: str, folder: str) -> str:
     try:
         response = cloudinary.uploader.upload(
             file_path,
@@ -72,6 +91,18 @@ async def upload_to_cloudinary(file_path: str, folder: str) -> str:
         raise
 
 
+def flush_attendance(attendance_buffer: AttendanceWriteBuffer) -> List[Dict]:
+    """Write buffered matches in one batch; returns the newly inserted rows."""
+    if not attendance_buffer.pending_count:
+        return []
+    try:
+        with get_db_connection() as conn:
+            return attendance_buffer.flush(conn)
+    except Exception as e:
+        print(f"Error recording attendance: {str(e)}")
+        return []
+
+
 class AttendanceSystem:
     """
     Attendance system using InsightFace for face recognition.
@@ -94,21 +125,56 @@ class AttendanceSystem:
         """
         return self.face_service.process_images_for_registration(image_paths, enrollment)
 
-    async def load_section_model(self, model_url: str) -> Dict:
+    def load_section_model(self, model_url: str) -> Dict:
         """Load face recognition model from Cloudinary URL."""
-        return await self.face_service.load_model_from_url(model_url)
+        return self.face_service.load_model(model_url)
 
     def save_model(self, model_path: str, encodings: Dict) -> None:
         """Save face recognition model to file."""
         self.face_service.save_model(model_path, encodings)
 
 
+async def reserve_inference_slot(timeout: Optional[float] = None) -> None:
+    """
+    Reserve an inference slot for a job started with
+    inference_executor.run_reserved (or given back with release).
+
+    Raises:
+        HTTPException: 503 if no inference slot frees up in time
+    """
+    try:
+        await inference_executor.acquire(timeout)
+    except InferenceBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Face recognition is busy, retry shortly ({str(e)})",
+            headers={"Retry-After": "5"}
+        )
+
+
+async def run_inference_job(fn, *args, **kwargs):
+    """
+    Run a blocking face recognition job on the inference executor.
+    
+    Raises:
+        HTTPException: 503 if no inference slot frees up in time
+    """
+    await reserve_inference_slot()
+    return await inference_executor.run_reserved(fn, *args, **kwargs)
+
+
 @face_router.post("/register-face")
 async def register_face(request: FaceRegistrationRequest):
+    # Downloads, inference and the Cloudinary upload all block
+    return await run_inference_job(register_face_job, request)
+
+
+def register_face_job(request: FaceRegistrationRequest):
     image_paths = []
-    temp_model_path = None
     
     with get_db_connection() as conn:
+        # Hold the model for the whole job; released in the finally below
+        face_model_manager.acquire()
         try:
             cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
@@ -125,20 +191,19 @@ async def register_face(request: FaceRegistrationRequest):
             if not student_data:
                 raise HTTPException(status_code=404, detail="Student not found")
             
-            # Download and save images
-            for idx, url in enumerate(request.imageUrls):
+            # Download the images concurrently, saving them in request order
+            for fetched in http_fetcher.map_ordered(http_fetcher.get_bytes, request.imageUrls):
+                if not fetched.ok:
+                    print(f"Error downloading image {fetched.index}: {str(fetched.error)}")
+                    continue
                 try:
-                    print(f"Downloading image {url}")
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    
-                    temp_path = os.path.join(TEMP_FOLDER, f"{student_data['enrollment_number']}_face_{idx}.jpg")
+                    temp_path = os.path.join(TEMP_FOLDER, f"{student_data['enrollment_number']}_face_{fetched.index}.jpg")
                     os.makedirs(os.path.dirname(temp_path), exist_ok=True)  # Ensure directory exists
                     with open(temp_path, "wb") as f:
-                        f.write(response.content)
+                        f.write(fetched.value)
                     image_paths.append(temp_path)
                 except Exception as e:
-                    print(f"Error downloading image {idx}: {str(e)}")
+                    print(f"Error saving image {fetched.index}: {str(e)}")
                     continue
             
             if not image_paths:
@@ -151,33 +216,20 @@ async def register_face(request: FaceRegistrationRequest):
             if not new_encodings:
                 raise HTTPException(status_code=400, detail="No faces detected in the images")
             
-            # Load existing model if it exists
-            existing_encodings = await face_system.load_section_model(student_data['face_recognition_model'])
-            
-            # Combine existing and new encodings
-            section_encodings = existing_encodings.copy()
-            section_encodings[student_data['enrollment_number']] = new_encodings
-            
-            # Save combined model
-            model_filename = f"section_{student_data['section_id']}_model.pkl"
-            model_path = os.path.join(TRAINING_LABEL_FOLDER, model_filename)
-            face_system.save_model(model_path, section_encodings)
-            
-            # Upload to Cloudinary
-            model_url = await upload_to_cloudinary(
-                model_path,
-                f"face_recognition/section_{student_data['section_id']}"
+            # Append only this student's embeddings to the section's delta
+            # log; the section row stays locked until the commit, so
+            # concurrent registrations cannot drop each other
+            model_url, manifest = append_section_delta(
+                conn,
+                student_data['section_id'],
+                {student_data['enrollment_number']: new_encodings}
             )
             
-            # Update section
-            cur.execute("""
-                UPDATE sections 
-                SET face_recognition_model = %s
-                WHERE section_id = %s
-            """, (model_url, student_data['section_id']))
-            
             conn.commit()
             
+            if manifest.needs_compaction(COMPACT_MIN_ROWS):
+                schedule_compaction(student_data['section_id'])
+            
             return {
                 "message": "Face registration successful",
                 "model_url": model_url
@@ -194,13 +246,23 @@ async def register_face(request: FaceRegistrationRequest):
                     os.remove(path)
                 except:
                     pass
-            # Release face app to free memory after registration
-            release_face_app()
+            # Let the lifecycle policy decide whether the model stays warm
+            face_model_manager.release()
     
 
-attendance_states: Dict[str, datetime] = {}
 active_streams: Dict[int, bool] = {}
 
+
+def class_exists(class_id: int) -> bool:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT class_id 
+            FROM classes 
+            WHERE class_id = %s
+        """, (class_id,))
+        return cursor.fetchone() is not None
+
    
 @face_router.post("/stop-attendance/{class_id}")
 async def stop_attendance(class_id: int):
@@ -218,19 +280,11 @@ async def stop_attendance(class_id: int):
     """
     try:
         # First verify if the class exists
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("""
-                SELECT class_id 
-                FROM classes 
-                WHERE class_id = %s
-            """, (class_id,))
-            
-            if not cursor.fetchone():
-                raise HTTPException(
-                    status_code=404,
-                    detail="Class not found"
-                )
+        if not await run_in_threadpool(class_exists, class_id):
+            raise HTTPException(
+                status_code=404,
+                detail="Class not found"
+            )
 
         # Check if there's an active stream for this class
         if class_id not in active_streams:
@@ -267,6 +321,15 @@ async def stop_attendance(class_id: int):
 class AttendanceStart(BaseModel):
     duration_minutes: int = 60
 async def process_video_stream(section_id: int, class_id: int, duration_minutes: int):
+    # The capture loop blocks on the camera and on inference for the whole
+    # session, so it runs on the inference slot start_attendance reserved
+    # instead of the event loop; the slot is released when it finishes
+    await inference_executor.run_reserved(run_video_stream, section_id, class_id, duration_minutes)
+
+
+def run_video_stream(section_id: int, class_id: int, duration_minutes: int):
+    # Hold the model for the whole session; released in the finally below
+    face_model_manager.acquire()
     try:
         # Initial database connection to get section and model data
         with get_db_connection() as conn:
@@ -293,8 +356,8 @@ async def process_video_stream(section_id: int, class_id: int, duration_minutes:
 
         # Load face recognition model from URL
         face_service = InsightFaceService()
-        known_faces = await face_service.load_model_from_url(section_data['face_recognition_model'])
-        if not known_faces:
+        gallery = face_service.load_gallery(section_data['face_recognition_model'])
+        if not len(gallery):
             raise HTTPException(
                 status_code=500,
                 detail="Error loading face recognition model"
@@ -306,87 +369,51 @@ async def process_video_stream(section_id: int, class_id: int, duration_minutes:
         if not cap.isOpened():
             raise HTTPException(status_code=400, detail="Unable to access video source")
 
+        # Matches are written in batches every few seconds instead of one
+        # connection and commit per recognized face
+        attendance_buffer = AttendanceWriteBuffer(
+            section_id,
+            class_id,
+            date.today(),
+            device_type="Laptop Camera",
+            flush_interval_seconds=STREAM_FLUSH_INTERVAL_SECONDS
+        )
+        with get_db_connection() as conn:
+            attendance_buffer.load_students(conn)
+
+        sampler = FrameSampler(mode=SAMPLING_STRIDE, stride=30)
         start_time = datetime.now()
         active_streams[class_id] = True
         
         while (datetime.now() - start_time).seconds < (duration_minutes * 60) and active_streams[class_id]:
-            ret, frame = cap.read()
-            if not ret:
+            if not cap.grab():
                 continue
 
-            # Process every 30th frame
-            if cap.get(cv2.CAP_PROP_POS_FRAMES) % 30 != 0:
+            # Process every 30th frame; only those are converted to BGR
+            if not sampler.keep(int(cap.get(cv2.CAP_PROP_POS_FRAMES))):
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
                 continue
 
             # Use InsightFace for detection (frame is already BGR from OpenCV)
-            faces = face_service.detect_faces(frame)
-            current_date = date.today()
+            faces = face_service.detect_faces(frame, expected_faces=len(gallery))
 
-            # Process each detected face
-            for face_data in faces:
-                query_embedding = face_data['embedding']
-                
-                # Find matching face using InsightFace
-                match_result = face_service.find_matching_face(query_embedding, known_faces)
-                
+            # Match every face in the frame against the section gallery at once
+            match_results = face_service.find_matching_faces(
+                [face_data['embedding'] for face_data in faces],
+                gallery
+            )
+
+            for face_data, match_result in zip(faces, match_results):
                 if match_result:
                     enrollment, confidence = match_result
-                    state_key = f"{enrollment}_{class_id}_{current_date}"
-                    
-                    if state_key in attendance_states:
-                        if (datetime.now() - attendance_states[state_key]).seconds < 300:
-                            continue
-
-                    with get_db_connection() as conn:
-                        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                        
-                        try:
-                            # Updated query to include section_id check
-                            cursor.execute("""
-                                SELECT student_id 
-                                FROM students 
-                                WHERE enrollment_number = %s 
-                                AND section_id = %s
-                            """, (enrollment, section_id))
-                            
-                            student = cursor.fetchone()
-
-                            if student:
-                                cursor.execute("""
-                                    SELECT * FROM attendance 
-                                    WHERE class_id = %s 
-                                    AND student_id = %s 
-                                    AND date = %s
-                                """, (class_id, student['student_id'], current_date))
-
-                                if not cursor.fetchone():
-                                    device_info = json.dumps({
-                                        "device_type": "Laptop Camera",
-                                        "recognition_confidence": confidence,
-                                        "detection_score": face_data['det_score']
-                                    })
-
-                                    cursor.execute("""
-                                        INSERT INTO attendance (
-                                            class_id, student_id, date, status,
-                                            verification_method, device_info, created_at
-                                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                    """, (
-                                        class_id,
-                                        student['student_id'],
-                                        current_date,
-                                        'present',
-                                        'facial',
-                                        device_info,
-                                        datetime.now()
-                                    ))
-                                    conn.commit()
-                                    attendance_states[state_key] = datetime.now()
-                        except Exception as e:
-                            print(f"Error recording attendance: {str(e)}")
-                            conn.rollback()
-
-            await asyncio.sleep(0.1)
+                    attendance_buffer.add(enrollment, confidence, face_data['det_score'])
+
+            if attendance_buffer.should_flush():
+                flush_attendance(attendance_buffer)
+
+        flush_attendance(attendance_buffer)
 
     except Exception as e:
         print(f"Error in process_video_stream: {str(e)}")
@@ -395,8 +422,21 @@ async def process_video_stream(section_id: int, class_id: int, duration_minutes:
         if 'cap' in locals():
             cap.release()
         active_streams.pop(class_id, None)
-        # Release face app to free memory
-        release_face_app()
+        # Let the lifecycle policy decide whether the model stays warm
+        face_model_manager.release()
+
+
+def fetch_section_model(section_id: int, class_id: int) -> Optional[Dict]:
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT s.section_id, s.face_recognition_model 
+            FROM sections s
+            JOIN classes c ON s.section_id = c.section_id
+            WHERE s.section_id = %s AND c.class_id = %s
+        """, (section_id, class_id))
+        return cursor.fetchone()
+
 
 @face_router.post("/start-attendance/{section_id}/{class_id}")
 async def start_attendance(
@@ -408,33 +448,32 @@ async def start_attendance(
     try:
         if class_id in active_streams:
             raise HTTPException(status_code=400, detail="Attendance already in progress")
-            
-        # Updated query to match schema
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("""
-                SELECT s.section_id, s.face_recognition_model 
-                FROM sections s
-                JOIN classes c ON s.section_id = c.section_id
-                WHERE s.section_id = %s AND c.class_id = %s
-            """, (section_id, class_id))
-            
-            result = cursor.fetchone()
+
+        # A stream holds an inference slot for its whole duration; reserve
+        # it now (503 at once rather than queueing behind running jobs) and
+        # hand it to the background task
+        await reserve_inference_slot(timeout=0)
+        try:
+            # Updated query to match schema
+            result = await run_in_threadpool(fetch_section_model, section_id, class_id)
             if not result:
                 raise HTTPException(status_code=404, detail="Invalid section or class ID")
-            
+
             if not result['face_recognition_model']:
                 raise HTTPException(
-                    status_code=400, 
+                    status_code=400,
                     detail="Face recognition model not found. Please register student faces first."
                 )
-        
-        background_tasks.add_task(
-            process_video_stream,
-            section_id,
-            class_id,
-            request.duration_minutes
-        )
+
+            background_tasks.add_task(
+                process_video_stream,
+                section_id,
+                class_id,
+                request.duration_minutes
+            )
+        except BaseException:
+            inference_executor.release()
+            raise
         
         return {
             "message": "Attendance monitoring started",
@@ -451,10 +490,10 @@ async def start_attendance(
         
         
 @face_router.get("/class-attendance/{class_id}")
-async def get_class_attendance(
+def get_class_attendance(
     class_id: int,
     date_str: Optional[str] = None,
-    conn = Depends(get_db_connection)
+    conn = Depends(get_db)
 ):
     try:
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -491,36 +530,36 @@ async def get_class_attendance(
 
 
 
-@face_router.post("/process-video-attendance/{section_id}/{class_id}")
-async def process_video_attendance(
+@face_router.get("/model-cache-stats")
+async def get_model_cache_stats():
+    """Hit/miss counters and memory use of the section model cache."""
+    return section_model_cache.stats()
+
+
+@face_router.get("/face-model-status")
+async def get_face_model_status():
+    """Lifecycle policy and load/release counters of the InsightFace model."""
+    return face_model_manager.stats()
+
+
+@face_router.get("/inference-status")
+async def get_inference_status():
+    """Admission counters of the inference executor."""
+    return inference_executor.stats()
+
+
+def process_video_job(
     section_id: int,
     class_id: int,
-    video: UploadFile = File(...),
-    duration_minutes: int = Form(default=60),
-    attendance_date: str = Form(default=None),
-    skip_frames: int = Form(default=30),
-    confidence_threshold: float = Form(default=0.6)
+    temp_video_path: str,
+    video_size: int,
+    skip_frames: int,
+    confidence_threshold: float,
+    sampling_mode: str,
+    sample_interval_seconds: float
 ):
+    sessions = []
     try:
-        # Validate video file
-        if not video.content_type.startswith('video/'):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid file type. Please upload a video file."
-            )
-
-        # Save uploaded video temporarily
-        temp_video_path = os.path.join(TEMP_FOLDER, f"temp_video_{class_id}.mp4")
-        try:
-            with open(temp_video_path, "wb") as buffer:
-                content = await video.read()
-                buffer.write(content)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error saving video file: {str(e)}"
-            )
-
         # Get section and model data
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -545,136 +584,170 @@ async def process_video_attendance(
         # Load face recognition model using InsightFace service
         face_service = InsightFaceService()
         face_service.similarity_threshold = confidence_threshold
-        known_faces = await face_service.load_model_from_url(section_data['face_recognition_model'])
-        if not known_faces:
+        gallery = face_service.load_gallery(section_data['face_recognition_model'])
+        if not len(gallery):
             raise HTTPException(
                 status_code=500,
                 detail="Error loading face recognition model"
             )
 
-        # Process video
+        # Process video; matches are buffered and written in batches
         attendance_records = []
+        attendance_buffer = AttendanceWriteBuffer(
+            section_id,
+            class_id,
+            date.today(),
+            device_type="Uploaded Video",
+            flush_interval_seconds=VIDEO_FLUSH_INTERVAL_SECONDS
+        )
+        with get_db_connection() as conn:
+            attendance_buffer.load_students(conn)
+        fps = 0.0
+
+        def record_frame(frame_index: int, sample_index: int, faces: List[Dict]):
+            # Runs on this thread as inference workers finish frames
+            match_results = face_service.find_matching_faces(
+                [face_data['embedding'] for face_data in faces],
+                gallery
+            )
+
+            for face_data, match_result in zip(faces, match_results):
+                if match_result:
+                    enrollment, confidence = match_result
+                    attendance_buffer.add(
+                        enrollment,
+                        confidence,
+                        face_data['det_score'],
+                        frame_timestamp=frame_index / fps if fps else None
+                    )
+
+            if attendance_buffer.should_flush():
+                attendance_records.extend(flush_attendance(attendance_buffer))
+
         cap = cv2.VideoCapture(temp_video_path)
         if not cap.isOpened():
             raise HTTPException(status_code=400, detail="Unable to process video file")
-
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = cap.get(cv2.CAP_PROP_FPS)
-        video_duration = total_frames / fps  # in seconds
+        cap.release()
 
-        # Process frames
-        processed_students = set()  # Track processed students
-        current_date = date.today()
+        # Decode the sampled frames on one thread and run detection on a pool
+        # of model sessions (FACE_PIPELINE_WORKERS, one by default for 512MB)
+        sampler = FrameSampler(
+            mode=sampling_mode,
+            stride=skip_frames,
+            interval_seconds=sample_interval_seconds
+        )
+        # The section size bounds how many faces a frame should show, which
+        # sizes the detector input; each session keeps its own timings
+        sessions = face_model_manager.get_sessions(FACE_PIPELINE_WORKERS)
+        session_timings = [DetectionTimings() for _ in sessions]
+        pipeline_stats = run_frame_pipeline(
+            temp_video_path,
+            sampler,
+            [
+                partial(
+                    face_service.detect_faces,
+                    app=session,
+                    expected_faces=len(gallery),
+                    timings=timings
+                )
+                for session, timings in zip(sessions, session_timings)
+            ],
+            record_frame
+        )
+        detection_timings = DetectionTimings()
+        for timings in session_timings:
+            detection_timings.add(timings)
+        video_duration = pipeline_stats.total_frames / fps if fps else 0  # in seconds
+        attendance_records.extend(flush_attendance(attendance_buffer))
 
-        frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        return {
+            "message": "Video attendance processing completed",
+            "video_duration_seconds": video_duration,
+            "video_size_bytes": video_size,
+            "processed_frames": pipeline_stats.frames_decoded,
+            "analyzed_frames": pipeline_stats.frames_analyzed,
+            "sampling": pipeline_stats.sampling.as_dict(),
+            "detection_timings": detection_timings.as_dict(),
+            "students_marked_present": len(attendance_records),
+            "attendance_records": attendance_records
+        }
 
-            # Process every Nth frame for efficiency
-            if frame_count % skip_frames != 0:
-                frame_count += 1
-                continue
+    finally:
+        # The lifecycle policy decides whether the model stays warm
+        if sessions:
+            face_model_manager.release()
+        remove_temp_file(temp_video_path)
 
-            # Use InsightFace for detection (frame is BGR from OpenCV)
-            faces = face_service.detect_faces(frame)
 
-            # Process each detected face
-            for face_data in faces:
-                query_embedding = face_data['embedding']
-                
-                # Find matching face
-                match_result = face_service.find_matching_face(query_embedding, known_faces)
-                
-                if match_result:
-                    enrollment, confidence = match_result
-                    
-                    # Skip if student already processed
-                    if enrollment in processed_students:
-                        continue
-
-                    with get_db_connection() as conn:
-                        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                        try:
-                            cursor.execute("""
-                                SELECT student_id 
-                                FROM students 
-                                WHERE enrollment_number = %s 
-                                AND section_id = %s
-                            """, (enrollment, section_id))
-                            
-                            student = cursor.fetchone()
-
-                            if student:
-                                # Record attendance
-                                device_info = json.dumps({
-                                    "device_type": "Uploaded Video",
-                                    "recognition_confidence": confidence,
-                                    "detection_score": face_data['det_score'],
-                                    "frame_timestamp": frame_count / fps
-                                })
-
-                                cursor.execute("""
-                                    INSERT INTO attendance (
-                                        class_id, student_id, date, status,
-                                        verification_method, device_info, created_at
-                                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                    ON CONFLICT (class_id, student_id, date) DO NOTHING
-                                    RETURNING *
-                                """, (
-                                    class_id,
-                                    student['student_id'],
-                                    current_date,
-                                    'present',
-                                    'facial',
-                                    device_info,
-                                    datetime.now()
-                                ))
-                                
-                                attendance_record = cursor.fetchone()
-                                if attendance_record:
-                                    attendance_records.append(attendance_record)
-                                    processed_students.add(enrollment)
-                                
-                                conn.commit()
-
-                        except Exception as e:
-                            print(f"Error recording attendance: {str(e)}")
-                            conn.rollback()
-
-            frame_count += 1
+@face_router.post("/process-video-attendance/{section_id}/{class_id}")
+async def process_video_attendance(
+    section_id: int,
+    class_id: int,
+    video: UploadFile = File(...),
+    duration_minutes: int = Form(default=60),
+    attendance_date: str = Form(default=None),
+    skip_frames: int = Form(default=30),
+    confidence_threshold: float = Form(default=0.6),
+    sampling_mode: str = Form(default=SAMPLING_STRIDE),
+    sample_interval_seconds: float = Form(default=1.0)
+):
+    try:
+        # Validate video file
+        if not video.content_type.startswith('video/'):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Please upload a video file."
+            )
 
-        cap.release()
-        
-        # Release face app to free memory
-        release_face_app()
+        if sampling_mode not in SAMPLING_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sampling_mode. Use one of: {', '.join(SAMPLING_MODES)}"
+            )
 
-        # Clean up
+        # Save uploaded video temporarily
         try:
-            os.remove(temp_video_path)
-        except:
-            pass
+            temp_video_path, video_size = await save_upload_to_temp(
+                video,
+                TEMP_FOLDER,
+                prefix=f"video_{class_id}_"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error saving video file: {str(e)}"
+            )
 
-        return {
-            "message": "Video attendance processing completed",
-            "video_duration_seconds": video_duration,
-            "processed_frames": frame_count,
-            "students_marked_present": len(processed_students),
-            "attendance_records": attendance_records
-        }
+        try:
+            await reserve_inference_slot()
+        except BaseException:
+            # The job never starts (busy, or the request was cancelled while
+            # waiting), so the file is removed here
+            remove_temp_file(temp_video_path)
+            raise
+
+        # Decoding and inference run on the inference executor; the
+        # event loop only streams the upload. The job owns the temp file
+        # and removes it when it finishes, even if this request is
+        # cancelled while it runs
+        return await inference_executor.run_reserved(
+            process_video_job,
+            section_id,
+            class_id,
+            temp_video_path,
+            video_size,
+            skip_frames,
+            confidence_threshold,
+            sampling_mode,
+            sample_interval_seconds
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing video attendance: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process video attendance: {str(e)}"
-        )
-    finally:
-        # Ensure video file is cleaned up and memory released
-        release_face_app()
-        if 'temp_video_path' in locals():
-            try:
-                os.remove(temp_video_path)
-            except:
-                pass
\ No newline at end of file
+        )
\ No newline at end of file
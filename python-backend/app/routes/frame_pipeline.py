@@ -0,0 +1,176 @@
+"""
+Multi-threaded frame pipeline for recorded videos.
+
+One decoder thread walks the video with a FrameSampler and hands every
+sampled frame to a bounded queue; a pool of inference threads (one face model / ONNX session
+each, so they never contend for a session) runs detection; results are
+delivered back on the calling thread in whatever order the workers finish,
+so callers can merge them into shared structures without locking.
+
+ONNX Runtime releases the GIL during inference, so throughput scales with
+the number of inference threads until the CPU cores are saturated.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+import cv2
+
+if __package__:
+    # python-backend imports this module as routes.frame_pipeline
+    from .frame_sampling import FrameSampler, SamplingStats
+else:
+    from frame_sampling import FrameSampler, SamplingStats
+
+DEFAULT_QUEUE_SIZE = 8
+
+_STOP = object()
+
+
+@dataclass
+class FramePipelineStats:
+    total_frames: int = 0
+    fps: float = 0.0
+    frames_decoded: int = 0
+    frames_analyzed: int = 0
+    sampling: Optional[SamplingStats] = field(default=None)
+
+
+class _WorkerFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def run_frame_pipeline(
+    video_path: str,
+    sampler: FrameSampler,
+    detectors: Sequence[Callable[[Any], Any]],
+    handle_result: Callable[[int, int, Any], None],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> FramePipelineStats:
+    """
+    Run detection over the sampled frames of a video file.
+
+    Args:
+        video_path: Path of a video readable by OpenCV
+        sampler: Fresh FrameSampler deciding which frames are analyzed
+        detectors: One callable per inference thread, mapping a BGR frame to
+            its detections; each should own its model session
+        handle_result: Called on the calling thread as
+            handle_result(raw_frame_index, sample_index, detections) for each
+            analyzed frame; sample_index numbers sampled frames 0, 1, 2...
+            in video order
+        queue_size: Maximum number of decoded frames waiting for inference
+
+    Returns:
+        FramePipelineStats for the run
+
+    Raises:
+        ValueError: If the video cannot be opened
+    """
+    if not detectors:
+        raise ValueError("At least one detector is required")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video: {video_path}")
+
+    stats = FramePipelineStats(
+        total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        fps=float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+        sampling=sampler.stats,
+    )
+
+    frames: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+    results: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    def put_frame(item) -> bool:
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode():
+        try:
+            for sample_index, (raw_index, frame) in enumerate(sampler.sample(cap, video_path)):
+                if not put_frame((raw_index, sample_index, frame)):
+                    break
+        except BaseException as error:
+            results.put(_WorkerFailure(error))
+        finally:
+            cap.release()
+            stats.frames_decoded = sampler.stats.frames_decoded
+            for _ in detectors:
+                put_frame(_STOP)
+
+    def infer(detector):
+        try:
+            while True:
+                try:
+                    item = frames.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        break
+                    continue
+                if item is _STOP:
+                    break
+                raw_index, sample_index, frame = item
+                results.put((raw_index, sample_index, detector(frame)))
+        except BaseException as error:
+            results.put(_WorkerFailure(error))
+        finally:
+            results.put(_STOP)
+
+    threads = [threading.Thread(target=decode, name="frame-decoder", daemon=True)]
+    threads.extend(
+        threading.Thread(target=infer, args=(detector,), name=f"frame-infer-{idx}", daemon=True)
+        for idx, detector in enumerate(detectors)
+    )
+    for thread in threads:
+        thread.start()
+
+    failure = None
+    running = len(detectors)
+    try:
+        while running:
+            item = results.get()
+            if item is _STOP:
+                running -= 1
+                continue
+            if isinstance(item, _WorkerFailure):
+                failure = failure or item.error
+                stop.set()
+                continue
+            if failure is None:
+                handle_result(*item)
+                stats.frames_analyzed += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        stop.set()
+        _drain(frames)
+        for thread in threads:
+            thread.join(timeout=5)
+
+    if failure is not None:
+        raise failure
+    return stats
+
+
+def _drain(frames: "queue.Queue") -> None:
+    while True:
+        try:
+            frames.get_nowait()
+        except queue.Empty:
+            return
@@ -0,0 +1,145 @@
+"""
+Frame sampling for video attendance.
+
+Decoding is the expensive half of reading a frame with OpenCV: read() is
+grab() (demux + decode) followed by retrieve() (conversion to a BGR array).
+The samplers here only call retrieve() for frames that will be analyzed
+and keep count of both, so the saving is measurable per video.
+
+Modes:
+- stride: every Nth frame.
+- time: one frame every N seconds of video, using the stream FPS.
+- keyframe: only the stream's keyframes (at most one per stride window),
+  reached by seeking so the frames between them are never decoded. Falls
+  back to stride sampling when the backend cannot report keyframes.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+
+SAMPLING_STRIDE = "stride"
+SAMPLING_TIME = "time"
+SAMPLING_KEYFRAME = "keyframe"
+
+SAMPLING_MODES = (SAMPLING_STRIDE, SAMPLING_TIME, SAMPLING_KEYFRAME)
+
+
+@dataclass
+class SamplingStats:
+    mode: str
+    frames_decoded: int = 0
+    frames_analyzed: int = 0
+    fallback: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class FrameSampler:
+    """
+    Chooses which frames of a capture are analyzed.
+
+    One sampler instance describes one pass over one video; `stats` holds
+    the decoded vs analyzed counters for that pass.
+    """
+
+    def __init__(self, mode: str = SAMPLING_STRIDE, stride: int = 30, interval_seconds: float = 1.0):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+
+        self.mode = mode
+        self.stride = max(1, int(stride))
+        self.interval_seconds = max(0.0, float(interval_seconds))
+        self.stats = SamplingStats(mode=mode)
+        self._next_sample_time = 0.0
+
+    def keep(self, raw_index: int, fps: float = 0.0) -> bool:
+        """
+        Decide whether the frame at `raw_index` is analyzed (stride and time
+        modes; frames must be offered in order).
+        """
+        if self.mode == SAMPLING_TIME and fps > 0 and self.interval_seconds > 0:
+            timestamp = raw_index / fps
+            if timestamp + 1e-9 < self._next_sample_time:
+                return False
+            self._next_sample_time = timestamp + self.interval_seconds
+            return True
+        return raw_index % self.stride == 0
+
+    def sample(self, cap, video_path: Optional[str] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Yield (raw_frame_index, frame) for every sampled frame of a capture.
+
+        Args:
+            cap: Opened cv2.VideoCapture positioned at the first frame
+            video_path: Source path; needed to scan keyframes in keyframe mode
+        """
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+
+        if self.mode == SAMPLING_TIME and fps <= 0:
+            self.stats.fallback = "stride: stream reports no FPS"
+
+        if self.mode == SAMPLING_KEYFRAME:
+            keyframes = _scan_keyframes(video_path) if video_path else None
+            if keyframes:
+                yield from self._sample_keyframes(cap, keyframes)
+                return
+            self.stats.fallback = "stride: keyframes not reported by the video backend"
+
+        raw_index = 0
+        while cap.grab():
+            self.stats.frames_decoded += 1
+            if self.keep(raw_index, fps):
+                ret, frame = cap.retrieve()
+                if ret:
+                    self.stats.frames_analyzed += 1
+                    yield raw_index, frame
+            raw_index += 1
+
+    def _sample_keyframes(self, cap, keyframes: List[int]) -> Iterator[Tuple[int, Any]]:
+        last_kept = None
+        for raw_index in keyframes:
+            if last_kept is not None and raw_index - last_kept < self.stride:
+                continue
+            # Seeking to a keyframe only decodes that frame
+            cap.set(cv2.CAP_PROP_POS_FRAMES, raw_index)
+            ret, frame = cap.read()
+            self.stats.frames_decoded += 1
+            if not ret:
+                continue
+            last_kept = raw_index
+            self.stats.frames_analyzed += 1
+            yield raw_index, frame
+
+
+def _scan_keyframes(video_path: str) -> Optional[List[int]]:
+    """
+    List keyframe indices by reading packets without decoding them.
+    Returns None when the backend cannot report keyframe flags.
+    """
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+
+    raw_cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    try:
+        if not raw_cap.isOpened():
+            return None
+
+        keyframes = []
+        packet_index = 0
+        while raw_cap.grab():
+            if raw_cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) == 1:
+                keyframes.append(packet_index)
+            elif packet_index == 0:
+                # Every stream starts on a keyframe; no flag means no support
+                return None
+            packet_index += 1
+        return keyframes or None
+    finally:
+        raw_cap.release()
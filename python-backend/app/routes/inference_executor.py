@@ -0,0 +1,195 @@
+"""
+Bounded executor for blocking face recognition work.
+
+The face endpoints are async, but model loading, ONNX inference, OpenCV
+decoding and Cloudinary uploads all block. Running them on the event loop
+stalls every other request on the uvicorn worker, so whole jobs (one
+registration, one uploaded video, one live stream session) run on a
+dedicated thread pool instead.
+
+Admission is bounded: at most INFERENCE_MAX_JOBS jobs run at once and the
+pool has exactly that many threads, so an admitted job starts immediately
+and never waits behind a long one. A request that finds every slot busy
+waits up to INFERENCE_ADMISSION_TIMEOUT seconds for one to free up (0
+rejects at once) and is then rejected with InferenceBusyError (surfaced as
+503).
+
+A caller that has to answer before its job starts (a live stream started
+as a background task) reserves the slot with acquire() and later starts the
+job on it with run_reserved(), so a request is only accepted when its job
+has a slot.
+
+Short blocking calls (database reads, small downloads) do not need a slot;
+they go through Starlette's run_in_threadpool as usual.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_MAX_JOBS = 2
+DEFAULT_ADMISSION_TIMEOUT = 30.0
+
+
+class InferenceBusyError(RuntimeError):
+    """Raised when no inference slot frees up within the admission timeout."""
+
+
+class InferenceExecutor:
+    """
+    Runs blocking jobs on a fixed-size thread pool behind an admission limit.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        admission_timeout: float = DEFAULT_ADMISSION_TIMEOUT,
+    ):
+        self.max_jobs = max(1, int(max_jobs))
+        self.admission_timeout = max(0.0, float(admission_timeout))
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+        self.running = 0
+        self.waiting = 0
+        self.max_running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "InferenceExecutor":
+        return cls(
+            max_jobs=int(os.getenv("INFERENCE_MAX_JOBS", str(DEFAULT_MAX_JOBS))),
+            admission_timeout=float(
+                os.getenv("INFERENCE_ADMISSION_TIMEOUT", str(DEFAULT_ADMISSION_TIMEOUT))
+            ),
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_jobs,
+                    thread_name_prefix="face-inference"
+                )
+            return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_jobs)
+        return self._slots
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Reserve a slot for a job started later with run_reserved(). A
+        reservation that is not used must be given back with release().
+
+        Args:
+            timeout: Seconds to wait for a slot; the admission timeout when
+                None, 0 to reject at once
+
+        Raises:
+            InferenceBusyError: If every slot stays busy for longer than the
+                timeout
+        """
+        slots = self._get_slots()
+        timeout = self.admission_timeout if timeout is None else max(0.0, float(timeout))
+        started = time.monotonic()
+
+        self.waiting += 1
+        try:
+            if timeout == 0 and slots.locked():
+                raise asyncio.TimeoutError
+            if timeout == 0:
+                await slots.acquire()
+            else:
+                await asyncio.wait_for(slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise InferenceBusyError(
+                f"All {self.max_jobs} inference slots busy for {timeout}s"
+            )
+        finally:
+            self.waiting -= 1
+
+        self.total_wait_seconds += time.monotonic() - started
+
+    def release(self) -> None:
+        """
+        Give back a slot reserved with acquire() that no job was started on.
+        """
+        self._get_slots().release()
+
+    async def run_reserved(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on a slot reserved with acquire() and await
+        its result. The slot is released when the job finishes.
+        """
+        self.submitted += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+
+        loop = asyncio.get_running_loop()
+        job_started = time.monotonic()
+        future = self._get_executor().submit(fn, *args, **kwargs)
+        # The slot is held until the thread finishes, even if the awaiting
+        # request is cancelled, so the limit always matches the busy threads.
+        future.add_done_callback(
+            lambda done: loop.call_soon_threadsafe(self._finish, done, job_started)
+        )
+        return await asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the inference pool and await its result.
+
+        Raises:
+            InferenceBusyError: If every slot stays busy for longer than the
+                admission timeout
+        """
+        await self.acquire()
+        return await self.run_reserved(fn, *args, **kwargs)
+
+    def _finish(self, future, job_started: float) -> None:
+        self.running -= 1
+        self.total_run_seconds += time.monotonic() - job_started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._get_slots().release()
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "max_jobs": self.max_jobs,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_running": self.max_running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (self.total_wait_seconds / self.submitted * 1000) if self.submitted else 0.0,
+            "avg_run_ms": (self.total_run_seconds / finished * 1000) if finished else 0.0,
+            "admission_timeout_seconds": self.admission_timeout,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+inference_executor = InferenceExecutor.from_env()
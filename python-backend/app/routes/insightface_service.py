@@ -10,45 +10,204 @@ import pickle
 import requests
 from typing import List, Dict, Optional, Tuple
 from functools import lru_cache
-import gc
 
-# Lazy import to save memory until needed
-_face_app = None
+from starlette.concurrency import run_in_threadpool
 
-def get_face_app():
+from routes.embedding_store import EmbeddingStore, is_embedding_store
+from routes.face_detection import (
+    DEFAULT_MAX_SIZE,
+    DEFAULT_MIN_FACE_PX,
+    DETECTION_ADAPTIVE,
+    DETECTION_MODES,
+    FACE_MODULES,
+    FIXED_DET_SIZE,
+    DetectionTimings,
+    analyze_faces,
+)
+from routes.face_model_manager import FaceModelManager
+from routes.model_cache import ModelCache
+from routes.model_log import SectionModelManifest, is_manifest
+
+# Decoded section models shared by every request in this process
+section_model_cache = ModelCache.from_env()
+
+# Detector input sizing, see routes/face_detection.py
+FACE_DETECTION_MODE = os.getenv("FACE_DETECTION_MODE", DETECTION_ADAPTIVE)
+if FACE_DETECTION_MODE not in DETECTION_MODES:
+    raise ValueError(f"FACE_DETECTION_MODE must be one of {DETECTION_MODES}")
+DETECTION_MAX_SIZE = int(os.getenv("DETECTION_MAX_SIZE", str(DEFAULT_MAX_SIZE)))
+DETECTION_MIN_FACE_PX = int(os.getenv("DETECTION_MIN_FACE_PX", str(DEFAULT_MIN_FACE_PX)))
+
+def _create_face_app():
     """
-    Lazy-load and cache the InsightFace application.
+    Build and prepare the InsightFace application.
     Uses buffalo_s model which is optimized for CPU and low memory.
     """
-    global _face_app
-    if _face_app is None:
-        import insightface
-        from insightface.app import FaceAnalysis
-        
-        # Use buffalo_s - smallest model, optimized for CPU
-        # Total size ~50MB, suitable for 512MB RAM
-        _face_app = FaceAnalysis(
-            name='buffalo_s',
-            root='./insightface_models',
-            providers=['CPUExecutionProvider']
-        )
-        # ctx_id=-1 forces CPU usage
-        # det_size reduces detection resolution for faster processing
-        _face_app.prepare(ctx_id=-1, det_size=(320, 320))
+    import insightface
+    from insightface.app import FaceAnalysis
     
-    return _face_app
+    # Use buffalo_s - smallest model, optimized for CPU
+    # Total size ~50MB, suitable for 512MB RAM
+    # Only detection and recognition are loaded; landmark and gender/age
+    # heads are never used
+    face_app = FaceAnalysis(
+        name='buffalo_s',
+        root='./insightface_models',
+        providers=['CPUExecutionProvider'],
+        allowed_modules=FACE_MODULES
+    )
+    # ctx_id=-1 forces CPU usage
+    # det_size is only used in fixed detection mode; adaptive mode picks
+    # the input size per frame
+    face_app.prepare(ctx_id=-1, det_size=FIXED_DET_SIZE)
+    return face_app
+
+
+# Lazy-loaded model; FACE_MODEL_POLICY decides how long it stays resident
+face_model_manager = FaceModelManager.from_env(_create_face_app)
+
+
+def get_face_app():
+    """
+    Lazy-load and cache the InsightFace application.
+    """
+    return face_model_manager.get()
 
 
 def release_face_app():
     """
-    Release the face app to free memory.
-    Useful after batch processing or when memory is tight.
+    Release the face app to free memory, regardless of the lifecycle policy.
+    Request handlers should call face_model_manager.release() instead so the
+    configured policy decides whether the model stays warm.
     """
-    global _face_app
-    if _face_app is not None:
-        del _face_app
-        _face_app = None
-        gc.collect()
+    face_model_manager.unload()
+
+
+class FaceGallery:
+    """
+    Precomputed matching gallery for a section model.
+    
+    All stored embeddings are L2-normalized once and packed into a contiguous
+    float32 matrix, grouped by enrollment, so matching a frame is a single
+    matrix product instead of a Python loop over every stored embedding.
+    """
+    
+    def __init__(self, known_faces: Dict[str, List[Dict]]):
+        self.known_faces = known_faces
+        self.store: Optional[EmbeddingStore] = None
+        
+        enrollments = []
+        rows = []
+        owners = []
+        for enrollment, student_embeddings in known_faces.items():
+            student_rows = []
+            for stored in student_embeddings:
+                stored_embedding = stored.get('embedding')
+                if stored_embedding is None:
+                    continue
+                student_rows.append(np.asarray(stored_embedding, dtype=np.float32).reshape(-1))
+            if not student_rows:
+                continue
+            owners.extend([len(enrollments)] * len(student_rows))
+            enrollments.append(enrollment)
+            rows.extend(student_rows)
+        
+        # enrollment_index[i] is the position in `enrollments` owning row i;
+        # rows are grouped by enrollment so group_starts drives reduceat.
+        self.enrollments = enrollments
+        self.enrollment_index = np.asarray(owners, dtype=np.int32)
+        if rows:
+            self.matrix = np.ascontiguousarray(_l2_normalize(np.vstack(rows)))
+            self.group_starts = np.flatnonzero(
+                np.r_[True, np.diff(self.enrollment_index) != 0]
+            )
+        else:
+            self.matrix = np.empty((0, 512), dtype=np.float32)
+            self.group_starts = np.empty(0, dtype=np.int64)
+    
+    @classmethod
+    def from_store(cls, store: EmbeddingStore) -> "FaceGallery":
+        """
+        Build a gallery over an embedding store.
+        
+        The store already groups rows by enrollment, so a normalized float32
+        store is matched in place without copying the embedding block.
+        """
+        gallery = cls.__new__(cls)
+        gallery.store = store
+        gallery.known_faces = store.to_known_faces()
+        gallery.enrollments = list(store.enrollments)
+        gallery.enrollment_index = np.repeat(
+            np.arange(len(store), dtype=np.int32), store.row_counts
+        )
+        matrix = store.float32_embeddings()
+        if not store.normalized:
+            matrix = np.ascontiguousarray(_l2_normalize(matrix))
+        gallery.matrix = matrix
+        gallery.group_starts = store.row_starts.astype(np.int64)
+        return gallery
+    
+    def __len__(self) -> int:
+        return len(self.enrollments)
+    
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes + self.enrollment_index.nbytes)
+    
+    def student_similarities(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """
+        Best cosine similarity of every query against every enrolled student.
+        
+        Args:
+            query_embeddings: (F, D) array of face embeddings
+            
+        Returns:
+            (F, S) array where column j belongs to self.enrollments[j]
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if queries.shape[0] == 0 or self.matrix.shape[0] == 0:
+            return np.empty((queries.shape[0], len(self.enrollments)), dtype=np.float32)
+        
+        similarities = _l2_normalize(queries) @ self.matrix.T
+        return np.maximum.reduceat(similarities, self.group_starts, axis=1)
+    
+    def match(
+        self, 
+        query_embeddings: np.ndarray, 
+        threshold: float
+    ) -> List[Optional[Tuple[str, float]]]:
+        """
+        Match a batch of face embeddings against the gallery.
+        
+        Args:
+            query_embeddings: (F, D) array of face embeddings from one frame
+            threshold: Minimum cosine similarity for a match
+            
+        Returns:
+            One (enrollment, similarity) tuple or None per query, in order
+        """
+        per_student = self.student_similarities(query_embeddings)
+        if per_student.shape[1] == 0:
+            return [None] * per_student.shape[0]
+        
+        best_students = np.argmax(per_student, axis=1)
+        best_similarities = per_student[np.arange(per_student.shape[0]), best_students]
+        
+        results = []
+        for student_idx, similarity in zip(best_students, best_similarities):
+            if similarity > threshold:
+                results.append((self.enrollments[int(student_idx)], float(similarity)))
+            else:
+                results.append(None)
+        return results
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
 
 
 class InsightFaceService:
@@ -59,19 +218,39 @@ class InsightFaceService:
     
     def __init__(self):
         self.similarity_threshold = 0.4  # InsightFace uses cosine similarity
+        self._gallery: Optional[FaceGallery] = None
     
-    def detect_faces(self, image: np.ndarray) -> List[Dict]:
+    def detect_faces(
+        self,
+        image: np.ndarray,
+        app=None,
+        expected_faces: Optional[int] = None,
+        timings: Optional[DetectionTimings] = None
+    ) -> List[Dict]:
         """
         Detect faces in an image and return face data including embeddings.
         
         Args:
             image: BGR image as numpy array (OpenCV format)
+            app: FaceAnalysis instance to run on; defaults to the shared one
+            expected_faces: Roughly how many faces the image holds (e.g. the
+                section size); sizes the detector input in adaptive mode
+            timings: Accumulates detector and recognizer time separately
             
         Returns:
             List of dicts containing face bounding box and embedding
         """
-        app = get_face_app()
-        faces = app.get(image)
+        if app is None:
+            app = get_face_app()
+        faces = analyze_faces(
+            app,
+            image,
+            FACE_DETECTION_MODE,
+            expected_faces,
+            timings,
+            max_size=DETECTION_MAX_SIZE,
+            min_face_px=DETECTION_MIN_FACE_PX
+        )
         
         results = []
         for face in faces:
@@ -94,7 +273,7 @@ class InsightFaceService:
         Returns:
             512-dimensional face embedding or None if no face detected
         """
-        faces = self.detect_faces(image)
+        faces = self.detect_faces(image, expected_faces=1)
         if not faces:
             return None
         
@@ -169,88 +348,191 @@ class InsightFaceService:
         is_match = similarity >= self.similarity_threshold
         return is_match, float(similarity)
     
+    def get_gallery(self, known_faces) -> FaceGallery:
+        """
+        Return the matching gallery for a section model, building it only
+        the first time a given model dict is seen by this service.
+        
+        Args:
+            known_faces: Dict mapping enrollment to stored embeddings, or a
+                FaceGallery that is returned unchanged
+        """
+        if isinstance(known_faces, FaceGallery):
+            return known_faces
+        if self._gallery is None or self._gallery.known_faces is not known_faces:
+            self._gallery = FaceGallery(known_faces)
+        return self._gallery
+    
     def find_matching_face(
         self, 
         query_embedding: np.ndarray, 
-        known_faces: Dict[str, List[Dict]]
+        known_faces
     ) -> Optional[Tuple[str, float]]:
         """
         Find the best matching face from known faces database.
         
         Args:
             query_embedding: Embedding of face to identify
-            known_faces: Dict mapping enrollment to list of stored embeddings
+            known_faces: Dict mapping enrollment to list of stored embeddings,
+                or a prebuilt FaceGallery
             
         Returns:
             Tuple of (enrollment, confidence) or None if no match
         """
-        best_match = None
-        best_similarity = self.similarity_threshold
-        
-        for enrollment, student_embeddings in known_faces.items():
-            for stored in student_embeddings:
-                stored_embedding = stored.get('embedding')
-                if stored_embedding is None:
-                    continue
-                
-                # Convert to numpy array if needed
-                if not isinstance(stored_embedding, np.ndarray):
-                    stored_embedding = np.array(stored_embedding)
-                
-                is_match, similarity = self.compare_faces(
-                    query_embedding, 
-                    stored_embedding
-                )
-                
-                if is_match and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = enrollment
+        return self.find_matching_faces([query_embedding], known_faces)[0]
+    
+    def find_matching_faces(
+        self, 
+        query_embeddings: List[np.ndarray], 
+        known_faces
+    ) -> List[Optional[Tuple[str, float]]]:
+        """
+        Match every face detected in a frame with one matrix product.
         
-        if best_match:
-            return (best_match, best_similarity)
-        return None
+        Args:
+            query_embeddings: Embeddings of the faces to identify
+            known_faces: Dict mapping enrollment to list of stored embeddings,
+                or a prebuilt FaceGallery
+            
+        Returns:
+            One (enrollment, confidence) tuple or None per query, in order
+        """
+        if len(query_embeddings) == 0:
+            return []
+        gallery = self.get_gallery(known_faces)
+        return gallery.match(np.vstack(query_embeddings), self.similarity_threshold)
     
-    async def load_model_from_url(self, model_url: str) -> Dict:
+    def load_gallery(self, model_url: str) -> FaceGallery:
         """
-        Load face recognition model (pickle) from URL.
+        Load a section model from URL as a ready-to-match gallery.
+        
+        Repeated loads of the same model URL are served from the process-wide
+        section model cache without a download or deserialization. Blocks on
+        the download; async callers use load_gallery_from_url.
         
         Args:
-            model_url: URL to the pickled model file
+            model_url: URL to the section model (embedding store or legacy pickle)
             
         Returns:
-            Dict of enrollment -> embeddings
+            FaceGallery for the section (empty if the model could not be loaded)
         """
         if not model_url:
-            return {}
+            return FaceGallery({})
         
         try:
-            response = requests.get(model_url, timeout=30)
-            response.raise_for_status()
-            return pickle.loads(response.content)
+            gallery = section_model_cache.get_or_load(
+                model_url,
+                fetch=download_model,
+                decode=_decode_section_model,
+                sizer=_section_model_nbytes
+            )
         except Exception as e:
             print(f"Error loading model from {model_url}: {str(e)}")
-            return {}
+            return FaceGallery({})
+        
+        self._gallery = gallery
+        return gallery
+    
+    async def load_gallery_from_url(self, model_url: str) -> FaceGallery:
+        """
+        Async variant of load_gallery; the download and decoding run on a
+        worker thread so the event loop keeps serving other requests.
+        """
+        return await run_in_threadpool(self.load_gallery, model_url)
+    
+    def load_model(self, model_url: str) -> Dict:
+        """
+        Load face recognition model from URL.
+        
+        Args:
+            model_url: URL to the section model (embedding store or legacy pickle)
+            
+        Returns:
+            Dict of enrollment -> embeddings (shared with the model cache,
+            copy before modifying)
+        """
+        return self.load_gallery(model_url).known_faces
+    
+    async def load_model_from_url(self, model_url: str) -> Dict:
+        """
+        Async variant of load_model.
+        """
+        gallery = await self.load_gallery_from_url(model_url)
+        return gallery.known_faces
     
     def save_model(self, model_path: str, embeddings: Dict) -> None:
         """
-        Save face embeddings model to file.
+        Save face embeddings model to file in the embedding store format.
         
         Args:
             model_path: Path to save the model
             embeddings: Dict of enrollment -> embeddings
         """
-        # Convert numpy arrays to lists for better pickle compatibility
-        serializable = {}
-        for enrollment, emb_list in embeddings.items():
-            serializable[enrollment] = []
-            for emb in emb_list:
-                entry = emb.copy()
-                if isinstance(entry.get('embedding'), np.ndarray):
-                    entry['embedding'] = entry['embedding'].tolist()
-                serializable[enrollment].append(entry)
-        
-        with open(model_path, 'wb') as f:
-            pickle.dump(serializable, f)
+        EmbeddingStore.from_known_faces(embeddings).save(model_path)
+
+
+def download_model(model_url: str) -> bytes:
+    response = requests.get(model_url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def load_segment_store(segment_url: str) -> EmbeddingStore:
+    """
+    Load one segment of a section model log (or a whole single-file model)
+    as an EmbeddingStore, through the section model cache.
+    """
+    return section_model_cache.get_or_load(
+        segment_url,
+        fetch=download_model,
+        decode=decode_segment,
+        sizer=lambda store: store.nbytes
+    )
+
+
+def decode_segment(payload: bytes) -> EmbeddingStore:
+    if is_embedding_store(payload):
+        return EmbeddingStore.from_buffer(payload)
+    # Legacy pickle models
+    return EmbeddingStore.from_known_faces(_decode_pickle_model(payload))
+
+
+def _decode_section_model(payload: bytes) -> FaceGallery:
+    if is_manifest(payload):
+        # Base plus deltas; later segments replace earlier rows per student
+        manifest = SectionModelManifest.from_bytes(payload)
+        stores = [load_segment_store(url) for url in manifest.segment_urls()]
+        return FaceGallery.from_store(EmbeddingStore.merge(stores))
+    
+    if is_embedding_store(payload):
+        # Zero-copy: the gallery matrix is a view of the payload
+        return FaceGallery.from_store(EmbeddingStore.from_buffer(payload))
+    
+    return FaceGallery(_decode_pickle_model(payload))
+
+
+def _decode_pickle_model(payload: bytes) -> Dict:
+    known_faces = pickle.loads(payload)
+    # Stored embeddings are plain lists; keep them as compact float32 arrays
+    # while the model sits in the cache.
+    for student_embeddings in known_faces.values():
+        for stored in student_embeddings:
+            if stored.get('embedding') is not None:
+                stored['embedding'] = np.asarray(stored['embedding'], dtype=np.float32)
+    return known_faces
+
+
+def _section_model_nbytes(gallery: FaceGallery) -> int:
+    if gallery.store is not None:
+        # known_faces only holds views into the store
+        return gallery.nbytes
+    raw_bytes = sum(
+        stored['embedding'].nbytes
+        for student_embeddings in gallery.known_faces.values()
+        for stored in student_embeddings
+        if isinstance(stored.get('embedding'), np.ndarray)
+    )
+    return gallery.nbytes + raw_bytes
 
 
 def convert_legacy_model(legacy_model: Dict) -> Dict:
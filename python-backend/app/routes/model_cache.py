@@ -0,0 +1,280 @@
+"""
+Process-local cache for section face models.
+
+Section models are immutable once uploaded: every registration produces a
+new URL (and, for versioned artifacts, a new `_vN` suffix). That makes the
+(model URL, version) pair a safe cache key, so back-to-back classes for the
+same section can skip the download and deserialization entirely.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SPILL_MAX_BYTES = 1024 * 1024 * 1024
+
+_SPILL_SUFFIX = ".bin"
+
+_VERSION_PATTERN = re.compile(r"_v(\d+)\.(?:npz|cef|json)")
+
+
+def parse_model_version(model_url: Optional[str]) -> int:
+    """
+    Read the `_vN` version suffix (.npz, .cef or .json) from a model URL
+    (0 when absent).
+    """
+    if not model_url:
+        return 0
+    match = _VERSION_PATTERN.search(model_url)
+    if not match:
+        return 0
+    return int(match.group(1))
+
+
+class ModelCache:
+    """
+    Byte-size-bounded LRU of decoded section models.
+
+    Raw payloads can optionally be spilled to a local directory so entries
+    evicted from memory (or lost on restart) are rebuilt from disk instead
+    of the network. The directory is kept under `spill_max_bytes`, least
+    recently used files first.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = DEFAULT_SPILL_MAX_BYTES,
+    ):
+        self.max_bytes = max(0, int(max_bytes))
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = max(0, int(spill_max_bytes))
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self._spill_bytes: Optional[int] = None
+
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[Any, int]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.spill_evictions = 0
+
+    @classmethod
+    def from_env(cls, default_max_bytes: int = DEFAULT_MAX_BYTES) -> "ModelCache":
+        """
+        Build a cache from MODEL_CACHE_MAX_BYTES, MODEL_CACHE_DIR and
+        MODEL_CACHE_DIR_MAX_BYTES.
+        """
+        max_bytes = int(os.getenv("MODEL_CACHE_MAX_BYTES", default_max_bytes))
+        spill_dir = os.getenv("MODEL_CACHE_DIR") or None
+        spill_max_bytes = int(os.getenv("MODEL_CACHE_DIR_MAX_BYTES", DEFAULT_SPILL_MAX_BYTES))
+        return cls(max_bytes=max_bytes, spill_dir=spill_dir, spill_max_bytes=spill_max_bytes)
+
+    @staticmethod
+    def make_key(model_url: str) -> Tuple[str, int]:
+        return model_url, parse_model_version(model_url)
+
+    def get_or_load(
+        self,
+        model_url: str,
+        fetch: Callable[[str], bytes],
+        decode: Callable[[bytes], Any],
+        sizer: Optional[Callable[[Any], int]] = None,
+    ) -> Any:
+        """
+        Return the decoded model for a URL, loading it on a miss.
+
+        Args:
+            model_url: URL of the serialized model
+            fetch: Downloads the raw payload for a URL
+            decode: Turns a raw payload into the cached model object; on a
+                disk hit the payload is a read-only memory map of the spill
+                file, so zero-copy formats are never read into memory whole
+            sizer: Estimates the in-memory size of a decoded model; the raw
+                payload length is used when omitted
+
+        Returns:
+            The decoded model object (shared between callers; do not mutate)
+        """
+        key = self.make_key(model_url)
+
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and then hit.
+        with key_lock:
+            try:
+                with self._lock:
+                    cached = self._lookup(key)
+                    if cached is not None:
+                        return cached[0]
+                    self.misses += 1
+
+                payload = self._read_spill(key)
+                if payload is None:
+                    payload = fetch(model_url)
+                    self._write_spill(key, payload)
+                else:
+                    with self._lock:
+                        self.disk_hits += 1
+
+                value = decode(payload)
+                size = int(sizer(value)) if sizer else len(payload)
+
+                with self._lock:
+                    self._store(key, value, size)
+            finally:
+                # Also when fetch or decode raises, or the model was loaded
+                # by the thread before us
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+        return value
+
+    def invalidate(self, model_url: str) -> None:
+        key = self.make_key(model_url)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._current_bytes -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "spill_evictions": self.spill_evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "spill_dir": self.spill_dir,
+            }
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _store(self, key, value, size: int) -> None:
+        if size > self.max_bytes:
+            # Too large to keep in memory; the spill copy still saves the download.
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._current_bytes -= previous[1]
+
+        self._entries[key] = (value, size)
+        self._current_bytes += size
+
+        while self._current_bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._current_bytes -= evicted_size
+            self.evictions += 1
+
+    def _spill_path(self, key) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        digest = hashlib.sha256(f"{key[0]}|{key[1]}".encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}{_SPILL_SUFFIX}")
+
+    def _read_spill(self, key):
+        path = self._spill_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                # The mapping stays valid after the file is closed, and
+                # after the file is unlinked by a trim
+                payload = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The modification time orders the files for trimming
+            os.utime(path)
+            return payload
+        except (OSError, ValueError):
+            # ValueError: empty file, which cannot be mapped
+            return None
+
+    def _write_spill(self, key, payload: bytes) -> None:
+        path = self._spill_path(key)
+        if not path or len(payload) > self.spill_max_bytes:
+            return
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._spill_bytes is None:
+                self._spill_bytes = sum(size for _, size, _ in self._spill_entries())
+            else:
+                self._spill_bytes += len(payload)
+            if self._spill_bytes > self.spill_max_bytes:
+                self._trim_spill()
+
+    def _spill_entries(self):
+        entries = []
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith(_SPILL_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.spill_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _trim_spill(self) -> None:
+        # Called with the lock held. Other processes may share the
+        # directory, so the size is recounted from disk; trims to 90% so
+        # not every write has to trim
+        entries = sorted(self._spill_entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.spill_max_bytes * 0.9)
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.spill_dir, name))
+            except OSError:
+                continue
+            total -= size
+            self.spill_evictions += 1
+        self._spill_bytes = total
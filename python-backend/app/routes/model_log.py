@@ -0,0 +1,174 @@
+"""
+Append-only delta log for section models.
+
+Rewriting and re-uploading the whole section model for every registration
+costs O(section size) per student, and two registrations that start from
+the same model lose one of the students. Instead, a section model URL now
+points at a small JSON manifest:
+
+    {
+        "format": "classedgee-section-model-log",
+        "section_id": 12,
+        "model_version": 7,
+        "base": {"url": "...section_12_base_v4.cef", "rows": 240},
+        "deltas": [
+            {"url": "...section_12_delta_v5.cef", "rows": 5},
+            {"url": "...section_12_delta_v6.cef", "rows": 4}
+        ]
+    }
+
+A registration uploads one delta segment holding only the new embeddings,
+plus a new manifest. Readers load the base and the deltas in order (later
+segments replace an enrollment's earlier rows). A compactor merges them
+into a new base once the deltas hold as many rows as the base. Each row is
+therefore rewritten a logarithmic number of times, and onboarding a whole
+section costs linear rather than quadratic bytes.
+
+Segments and manifests are immutable and versioned (`_vN` in the public
+id), so they stay safe to cache by URL. The public id also carries a hash
+of the content and is never overwritten, so two writers that start from
+the same manifest upload side by side instead of replacing each other's
+files. Which manifest becomes the section's model is decided by a
+compare-and-set on the section row: the backend holds the row lock
+(SELECT ... FOR UPDATE), and the gateway only applies a worker result
+whose `based_on` is still the section's model.
+
+This module is shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/); tests/test_shared_modules.py fails when the two
+copies differ.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+MANIFEST_FORMAT = "classedgee-section-model-log"
+
+# Deltas are merged into the base once they hold at least this many rows
+# and at least as many rows as the base
+DEFAULT_COMPACT_MIN_ROWS = 32
+
+
+def is_manifest(payload) -> bool:
+    """
+    True if a bytes-like payload is a section model manifest.
+    """
+    head = bytes(memoryview(payload)[:64]).lstrip()
+    if not head.startswith(b"{"):
+        return False
+    try:
+        return json.loads(bytes(payload)).get("format") == MANIFEST_FORMAT
+    except (ValueError, UnicodeDecodeError, AttributeError):
+        return False
+
+
+def content_token(payload) -> str:
+    """
+    Short hash of an artifact's bytes, for its public id.
+    """
+    return hashlib.sha256(bytes(payload)).hexdigest()[:16]
+
+
+def manifest_public_id(section_id: int, version: int, payload) -> str:
+    return f"section_{section_id}_model_{content_token(payload)}_v{version}.json"
+
+
+def delta_public_id(section_id: int, version: int, payload) -> str:
+    return f"section_{section_id}_delta_{content_token(payload)}_v{version}.cef"
+
+
+def base_public_id(section_id: int, version: int, payload) -> str:
+    return f"section_{section_id}_base_{content_token(payload)}_v{version}.cef"
+
+
+@dataclass
+class SectionModelManifest:
+    section_id: int
+    model_version: int = 0
+    base_url: Optional[str] = None
+    base_rows: int = 0
+    deltas: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_bytes(cls, payload) -> "SectionModelManifest":
+        data = json.loads(bytes(payload))
+        if data.get("format") != MANIFEST_FORMAT:
+            raise ValueError("Not a section model manifest")
+        base = data.get("base") or {}
+        return cls(
+            section_id=int(data["section_id"]),
+            model_version=int(data.get("model_version", 0)),
+            base_url=base.get("url"),
+            base_rows=int(base.get("rows", 0)),
+            deltas=[
+                {"url": delta["url"], "rows": int(delta.get("rows", 0))}
+                for delta in data.get("deltas", [])
+            ],
+        )
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "format": MANIFEST_FORMAT,
+            "section_id": self.section_id,
+            "model_version": self.model_version,
+            "base": {"url": self.base_url, "rows": self.base_rows} if self.base_url else None,
+            "deltas": self.deltas,
+        }, indent=2).encode("utf-8")
+
+    @property
+    def delta_rows(self) -> int:
+        return sum(delta["rows"] for delta in self.deltas)
+
+    @property
+    def total_rows(self) -> int:
+        """
+        Rows across all segments (re-registered students count twice until
+        the next compaction).
+        """
+        return self.base_rows + self.delta_rows
+
+    def segment_urls(self) -> List[str]:
+        urls = [self.base_url] if self.base_url else []
+        return urls + [delta["url"] for delta in self.deltas]
+
+    def with_delta(self, version: int, delta_url: str, rows: int) -> "SectionModelManifest":
+        """
+        Next manifest with one more delta segment appended.
+        """
+        return SectionModelManifest(
+            section_id=self.section_id,
+            model_version=version,
+            base_url=self.base_url,
+            base_rows=self.base_rows,
+            deltas=self.deltas + [{"url": delta_url, "rows": int(rows)}],
+        )
+
+    def compacted(
+        self,
+        version: int,
+        base_url: str,
+        base_rows: int,
+        merged: "SectionModelManifest",
+    ) -> "SectionModelManifest":
+        """
+        Next manifest after the segments of `merged` were compacted into
+        `base_url`. Deltas appended to this manifest since `merged` was read
+        are kept on top of the new base.
+
+        Raises:
+            ValueError: If this manifest does not extend `merged`
+        """
+        merged_segments = merged.segment_urls()
+        if self.segment_urls()[:len(merged_segments)] != merged_segments:
+            raise ValueError("Manifest changed underneath the compaction")
+        return SectionModelManifest(
+            section_id=self.section_id,
+            model_version=version,
+            base_url=base_url,
+            base_rows=int(base_rows),
+            deltas=self.deltas[len(merged.deltas):],
+        )
+
+    def needs_compaction(self, min_rows: int = DEFAULT_COMPACT_MIN_ROWS) -> bool:
+        return bool(self.deltas) and self.delta_rows >= max(min_rows, self.base_rows)
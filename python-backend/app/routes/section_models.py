@@ -0,0 +1,248 @@
+"""
+Section model updates through the append-only delta log (see model_log.py).
+
+A registration appends one small delta segment and a new manifest while
+holding the section row lock (SELECT ... FOR UPDATE), so concurrent
+registrations for one section serialize on the database instead of
+overwriting each other's model. Compaction runs on a single background
+thread and only swaps the manifest if nothing but new deltas was appended
+in the meantime.
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cloudinary.uploader
+
+from routes.dependencies import get_db_connection
+from routes.embedding_store import EmbeddingStore
+from routes.insightface_service import decode_segment, download_model, load_segment_store
+from routes.model_cache import parse_model_version
+from routes.model_log import (
+    DEFAULT_COMPACT_MIN_ROWS,
+    SectionModelManifest,
+    base_public_id,
+    delta_public_id,
+    is_manifest,
+    manifest_public_id
+)
+
+COMPACT_MIN_ROWS = int(os.getenv("MODEL_LOG_COMPACT_MIN_ROWS", str(DEFAULT_COMPACT_MIN_ROWS)))
+
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-compactor")
+_pending_compactions = set()
+_pending_lock = threading.Lock()
+
+
+def upload_model_artifact(payload: bytes, section_id: int, public_id: str) -> str:
+    """
+    Upload one immutable model artifact (segment or manifest) to Cloudinary.
+    Public ids are unique per content (see model_log.py) and never
+    overwritten.
+
+    Returns:
+        Secure URL of the uploaded file
+    """
+    suffix = os.path.splitext(public_id)[1]
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        response = cloudinary.uploader.upload(
+            temp_path,
+            resource_type="raw",
+            folder=f"face_recognition/section_{section_id}",
+            public_id=public_id,
+            overwrite=False,
+            upload_preset=os.getenv('CLOUDINARY_UPLOAD_PRESET')
+        )
+        return response['secure_url']
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def load_manifest(model_url: Optional[str], section_id: int) -> SectionModelManifest:
+    """
+    Manifest behind a section's model URL.
+
+    A section that still points at a single-file model (pickle or embedding
+    store) gets a manifest with that file as its base, so the first
+    registration after the upgrade migrates it without rewriting it.
+    """
+    if not model_url:
+        return SectionModelManifest(section_id=section_id)
+
+    payload = download_model(model_url)
+    if is_manifest(payload):
+        return SectionModelManifest.from_bytes(payload)
+
+    base = decode_segment(payload)
+    return SectionModelManifest(
+        section_id=section_id,
+        model_version=parse_model_version(model_url),
+        base_url=model_url,
+        base_rows=int(base.embeddings.shape[0])
+    )
+
+
+def _lock_section_model(cursor, section_id: int) -> Optional[str]:
+    cursor.execute("""
+        SELECT face_recognition_model
+        FROM sections
+        WHERE section_id = %s
+        FOR UPDATE
+    """, (section_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Section {section_id} not found")
+    return row[0]
+
+
+def _point_section_at(cursor, section_id: int, model_url: str) -> None:
+    cursor.execute("""
+        UPDATE sections
+        SET face_recognition_model = %s
+        WHERE section_id = %s
+    """, (model_url, section_id))
+
+
+def append_section_delta(
+    conn,
+    section_id: int,
+    known_faces: Dict[str, List[Dict]]
+) -> Tuple[str, SectionModelManifest]:
+    """
+    Append new embeddings to a section's model as one delta segment.
+
+    Locks the section row, uploads the delta and the next manifest and points
+    the section at it. The caller commits (which releases the lock) or rolls
+    back.
+
+    Args:
+        conn: Database connection; the update is part of its transaction
+        section_id: Section to update
+        known_faces: enrollment -> [{'embedding': ...}] for the new students
+            (replacing any earlier embeddings of the same students)
+
+    Returns:
+        Tuple of (manifest URL, manifest)
+    """
+    delta = EmbeddingStore.from_known_faces(known_faces)
+    if not delta.embeddings.shape[0]:
+        raise ValueError("No embeddings to register")
+
+    cursor = conn.cursor()
+    try:
+        current_url = _lock_section_model(cursor, section_id)
+        manifest = load_manifest(current_url, section_id)
+        version = manifest.model_version + 1
+
+        delta_bytes = delta.to_bytes()
+        delta_url = upload_model_artifact(
+            delta_bytes, section_id, delta_public_id(section_id, version, delta_bytes)
+        )
+        next_manifest = manifest.with_delta(version, delta_url, delta.embeddings.shape[0])
+        manifest_bytes = next_manifest.to_bytes()
+        manifest_url = upload_model_artifact(
+            manifest_bytes, section_id, manifest_public_id(section_id, version, manifest_bytes)
+        )
+        _point_section_at(cursor, section_id, manifest_url)
+    finally:
+        cursor.close()
+
+    return manifest_url, next_manifest
+
+
+def compact_section_model(section_id: int) -> Optional[str]:
+    """
+    Merge a section's base and deltas into a new base segment.
+
+    The merge and the base upload happen without holding the section lock;
+    the manifest is only swapped if the section still extends the manifest
+    that was merged.
+
+    Returns:
+        URL of the compacted manifest, or None if nothing was compacted
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT face_recognition_model FROM sections WHERE section_id = %s",
+            (section_id,)
+        )
+        row = cursor.fetchone()
+        conn.rollback()
+    if not row or not row[0]:
+        return None
+
+    merged_manifest = load_manifest(row[0], section_id)
+    if not merged_manifest.needs_compaction(COMPACT_MIN_ROWS):
+        return None
+
+    merged = EmbeddingStore.merge(
+        [load_segment_store(url) for url in merged_manifest.segment_urls()]
+    )
+    base_version = merged_manifest.model_version + 1
+    base_bytes = merged.to_bytes()
+    base_url = upload_model_artifact(
+        base_bytes, section_id, base_public_id(section_id, base_version, base_bytes)
+    )
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            current_url = _lock_section_model(cursor, section_id)
+            current = (
+                merged_manifest if current_url == row[0]
+                else load_manifest(current_url, section_id)
+            )
+            version = current.model_version + 1
+            compacted = current.compacted(
+                version, base_url, merged.embeddings.shape[0], merged_manifest
+            )
+            manifest_bytes = compacted.to_bytes()
+            manifest_url = upload_model_artifact(
+                manifest_bytes, section_id, manifest_public_id(section_id, version, manifest_bytes)
+            )
+            _point_section_at(cursor, section_id, manifest_url)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    return manifest_url
+
+
+def schedule_compaction(section_id: int) -> bool:
+    """
+    Queue a background compaction for a section (once at a time).
+
+    Returns:
+        True if a compaction was queued
+    """
+    with _pending_lock:
+        if section_id in _pending_compactions:
+            return False
+        _pending_compactions.add(section_id)
+    _compactor.submit(_run_compaction, section_id)
+    return True
+
+
+def _run_compaction(section_id: int) -> None:
+    try:
+        model_url = compact_section_model(section_id)
+        if model_url:
+            print(f"Compacted face model for section {section_id}: {model_url}")
+    except Exception as e:
+        print(f"Error compacting face model for section {section_id}: {str(e)}")
+    finally:
+        with _pending_lock:
+            _pending_compactions.discard(section_id)
@@ -0,0 +1,61 @@
+"""
+Temp files for uploaded captures.
+
+Uploaded videos can be hundreds of megabytes, so they are streamed to disk
+in chunks under a unique name instead of being read into memory, and the
+job that processes the file removes it when it is done.
+"""
+
+import os
+import tempfile
+from typing import Tuple
+
+from fastapi import UploadFile
+
+# Uploaded videos are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload_to_temp(
+    upload: UploadFile,
+    directory: str,
+    prefix: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[str, int]:
+    """
+    Stream an uploaded file into a uniquely named file in `directory`.
+
+    Only one chunk is held in memory at a time, so peak memory does not
+    depend on the size of the upload.
+
+    Args:
+        upload: Incoming multipart file
+        directory: Folder the temp file is created in
+        prefix: Prefix for the temp file name
+        chunk_size: Bytes read from the upload per iteration
+
+    Returns:
+        Tuple of (temp file path, bytes written)
+    """
+    suffix = os.path.splitext(upload.filename or "")[1] or ".mp4"
+    fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=directory)
+    bytes_written = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                buffer.write(chunk)
+                bytes_written += len(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path, bytes_written
+
+
+def remove_temp_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,122 @@
+"""
+Precompiled lookups for building the timetable model.
+
+Faculty availability and room compatibility are asked for every
+(section, subject, faculty) while the model is built. The index answers
+both without re-parsing times or re-reading room types:
+
+- every TimeSlotInput.time is parsed once; slots get a bit position
+- each faculty member's availability_windows compile to a slot bitset
+- rooms are grouped into (is_lab, capacity) buckets, sorted by capacity,
+  so the buckets that fit a section come from a bisect
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from .models import FacultyInput, RoomInput, ScheduleRequest, TimeSlotInput
+
+RoomBucket = tuple[bool, int]
+
+
+def parse_time_to_minutes(time_value: str) -> int:
+    parts = time_value.split(":")
+    if len(parts) < 2:
+        raise ValueError(f"Invalid time format: {time_value}")
+
+    hours = int(parts[0])
+    minutes = int(parts[1])
+    return (hours * 60) + minutes
+
+
+def is_lab_room(room: RoomInput) -> bool:
+    return (room.room_type or "").lower() == "lab"
+
+
+def _availability_bits(faculty: FacultyInput, slot_days: list[int], slot_minutes: list[int], all_slots: int) -> int:
+    windows = faculty.availability_windows
+    if not windows:
+        return all_slots
+
+    windows_by_day: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    for window in windows:
+        windows_by_day[window.day_of_week].append(
+            (parse_time_to_minutes(window.start_time), parse_time_to_minutes(window.end_time))
+        )
+
+    bits = 0
+    for position, (day, minutes) in enumerate(zip(slot_days, slot_minutes)):
+        for start_minutes, end_minutes in windows_by_day.get(day, ()):
+            if start_minutes <= minutes < end_minutes:
+                bits |= 1 << position
+                break
+    return bits
+
+
+@dataclass
+class SchedulingIndex:
+    slots: list[TimeSlotInput]
+    slots_by_id: dict[str, TimeSlotInput]
+    # slot_id -> bit position, and start minutes per position
+    slot_positions: dict[str, int]
+    slot_minutes: list[int]
+    faculty_slot_bits: dict[str, int]
+    room_buckets: dict[RoomBucket, list[RoomInput]]
+    room_bucket_by_id: dict[str, RoomBucket]
+    # is_lab -> bucket keys and their capacities, ascending
+    _bucket_keys: dict[bool, list[RoomBucket]] = field(default_factory=dict)
+    _bucket_capacities: dict[bool, list[int]] = field(default_factory=dict)
+    _faculty_slots: dict[str, list[TimeSlotInput]] = field(default_factory=dict)
+
+    @classmethod
+    def from_request(cls, request: ScheduleRequest) -> "SchedulingIndex":
+        slots = list(request.time_slots)
+        slot_days = [slot.day for slot in slots]
+        slot_minutes = [parse_time_to_minutes(slot.time) for slot in slots]
+        all_slots = (1 << len(slots)) - 1
+
+        faculty_slot_bits: dict[str, int] = {}
+        for department in request.departments.values():
+            for faculty in department.faculty:
+                faculty_slot_bits[faculty.id] = _availability_bits(faculty, slot_days, slot_minutes, all_slots)
+
+        room_buckets: dict[RoomBucket, list[RoomInput]] = defaultdict(list)
+        for room in request.rooms:
+            room_buckets[(is_lab_room(room), room.capacity)].append(room)
+        room_buckets = dict(sorted(room_buckets.items()))
+
+        index = cls(
+            slots=slots,
+            slots_by_id={slot.slot_id: slot for slot in slots},
+            slot_positions={slot.slot_id: position for position, slot in enumerate(slots)},
+            slot_minutes=slot_minutes,
+            faculty_slot_bits=faculty_slot_bits,
+            room_buckets=room_buckets,
+            room_bucket_by_id={room.id: bucket for bucket, rooms in room_buckets.items() for room in rooms},
+        )
+        for is_lab in (False, True):
+            keys = [bucket for bucket in room_buckets if bucket[0] == is_lab]
+            index._bucket_keys[is_lab] = keys
+            index._bucket_capacities[is_lab] = [capacity for _, capacity in keys]
+        return index
+
+    def available_slots(self, faculty_id: str) -> list[TimeSlotInput]:
+        """Slots inside the faculty member's availability windows."""
+        if faculty_id not in self._faculty_slots:
+            bits = self.faculty_slot_bits.get(faculty_id, 0)
+            self._faculty_slots[faculty_id] = [
+                slot for position, slot in enumerate(self.slots) if bits >> position & 1
+            ]
+        return self._faculty_slots[faculty_id]
+
+    def eligible_buckets(self, requires_lab: bool, strength: int) -> list[RoomBucket]:
+        """Room buckets of the right type that seat `strength` students."""
+        start = bisect_left(self._bucket_capacities[requires_lab], strength)
+        return self._bucket_keys[requires_lab][start:]
+
+    def slot_order(self, slot_id: str) -> tuple[int, int]:
+        """Sort key putting slots in (day, start time) order."""
+        return self.slots_by_id[slot_id].day, self.slot_minutes[self.slot_positions[slot_id]]
@@ -0,0 +1,325 @@
+"""
+Background schedule-solving jobs.
+
+A campus-wide CP-SAT solve runs for up to its time limit. Running it inside
+the request handler blocks the uvicorn event loop for that long and the
+client sees nothing until the end. Solves are therefore submitted as jobs:
+
+- Jobs run in a process pool (SCHEDULE_MAX_JOBS processes, spawned), so
+  CP-SAT's search threads never compete with the event loop for the GIL.
+- Every improving solution is reported by the solver's solution callback
+  through a manager queue and recorded on the job, where it can be polled
+  or streamed (see events_since()).
+- Cancelling a queued job drops it; cancelling a running job stops the
+  search, and the best schedule found so far becomes the job's result.
+- A job only becomes terminal once every update its process sent before
+  returning has been recorded: the outcome goes through the same queue,
+  so a client never sees "done" with solutions still missing.
+
+Finished jobs are kept for SCHEDULE_JOB_TTL_SECONDS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import ScheduleRequest, ScheduleSolveResult
+from .scheduler import generate_schedule
+
+DEFAULT_MAX_JOBS = 1
+DEFAULT_JOB_TTL_SECONDS = 3600.0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class ScheduleJobNotFound(KeyError):
+    """Raised for an unknown or expired job id."""
+
+
+def _dump(model) -> Dict[str, Any]:
+    return model.model_dump() if hasattr(model, "model_dump") else model.dict()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _run_job(job_id: str, request: ScheduleRequest, updates, stop) -> ScheduleSolveResult:
+    # Runs in a pool process; `updates` and `stop` are manager proxies
+    updates.put((job_id, "running", None))
+    return generate_schedule(
+        request,
+        on_solution=lambda progress: updates.put((job_id, "progress", _dump(progress))),
+        stop=stop,
+    )
+
+
+@dataclass
+class ScheduleJob:
+    job_id: str
+    stop: Any
+    status: str = JOB_QUEUED
+    created_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    cancel_requested: bool = False
+    progress: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # (kind, payload) in the order they happened; streamed to clients
+    events: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    future: Optional[Future] = None
+    finished_monotonic: Optional[float] = None
+    # (status, result, error) of the finished future until the update
+    # reader records it
+    outcome: Optional[Tuple[str, Optional[Dict[str, Any]], Optional[str]]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_requested,
+            "solutions": len(self.progress),
+            "best": self.progress[-1] if self.progress else None,
+            "error": self.error,
+        }
+        if include_result:
+            data["progress"] = list(self.progress)
+            data["result"] = self.result
+        return data
+
+
+class ScheduleJobManager:
+    """
+    Runs schedule solves on a process pool and tracks their progress.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        job_ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS,
+    ):
+        self.max_jobs = max(1, int(max_jobs))
+        self.job_ttl_seconds = max(0.0, float(job_ttl_seconds))
+
+        self._jobs: Dict[str, ScheduleJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._updates = None
+        self._reader: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "ScheduleJobManager":
+        return cls(
+            max_jobs=int(os.getenv("SCHEDULE_MAX_JOBS", str(DEFAULT_MAX_JOBS))),
+            job_ttl_seconds=float(
+                os.getenv("SCHEDULE_JOB_TTL_SECONDS", str(DEFAULT_JOB_TTL_SECONDS))
+            ),
+        )
+
+    def _start(self) -> None:
+        # Called with the lock held; the pool, the manager process and the
+        # update reader start with the first job
+        context = multiprocessing.get_context("spawn")
+        if self._manager is None:
+            self._manager = context.Manager()
+            self._updates = self._manager.Queue()
+            self._reader = threading.Thread(
+                target=self._read_updates, name="schedule-job-updates", daemon=True
+            )
+            self._reader.start()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_jobs, mp_context=context)
+
+    def submit(self, request: ScheduleRequest) -> ScheduleJob:
+        """
+        Queue a solve and return its job right away.
+        """
+        with self._lock:
+            self._purge_expired()
+            self._start()
+            job = ScheduleJob(job_id=uuid.uuid4().hex, stop=self._manager.Event())
+            self._jobs[job.job_id] = job
+            job.events.append(("status", {"status": JOB_QUEUED}))
+            job.future = self._executor.submit(_run_job, job.job_id, request, self._updates, job.stop)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    async def solve(self, request: ScheduleRequest) -> ScheduleSolveResult:
+        """
+        Submit a solve and await its result without blocking the event loop.
+        """
+        job = self.submit(request)
+        try:
+            return await asyncio.wrap_future(job.future)
+        except asyncio.CancelledError:
+            # The client went away; stop the search instead of finishing it
+            self.cancel(job.job_id)
+            raise
+
+    def get(self, job_id: str) -> ScheduleJob:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise ScheduleJobNotFound(job_id)
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._purge_expired()
+            return [job.snapshot(include_result=False) for job in self._jobs.values()]
+
+    def cancel(self, job_id: str) -> ScheduleJob:
+        """
+        Cancel a queued job, or stop a running one and keep its best schedule.
+        """
+        job = self.get(job_id)
+        with self._lock:
+            if job.finished:
+                return job
+            job.cancel_requested = True
+            job.events.append(("status", {"status": job.status, "cancel_requested": True}))
+        if job.future is not None and job.future.cancel():
+            return job
+        job.stop.set()
+        return job
+
+    def events_since(self, job_id: str, index: int) -> Tuple[List[Tuple[str, Dict[str, Any]]], bool]:
+        """
+        Events recorded after the first `index` ones, and whether the job has
+        finished (no further events will follow).
+        """
+        job = self.get(job_id)
+        with self._lock:
+            return list(job.events[index:]), job.finished
+
+    def _read_updates(self) -> None:
+        while True:
+            try:
+                update = self._updates.get()
+            except (EOFError, OSError):
+                return
+            if update is None:
+                return
+            job_id, kind, payload = update
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.finished:
+                    continue
+                if kind == "finished":
+                    self._record_outcome(job)
+                elif kind == "running":
+                    job.status = JOB_RUNNING
+                    job.started_at = _now()
+                    job.events.append(("status", {"status": JOB_RUNNING}))
+                elif kind == "progress":
+                    job.progress.append(payload)
+                    job.events.append(("progress", payload))
+
+    def _finish(self, job: ScheduleJob, future: Future) -> None:
+        result = None
+        error = None
+        if future.cancelled():
+            status = JOB_CANCELLED
+        else:
+            exception = future.exception()
+            if exception is None:
+                result = _dump(future.result())
+                status = JOB_CANCELLED if job.cancel_requested else JOB_COMPLETED
+            else:
+                status = JOB_FAILED
+                error = f"{type(exception).__name__}: {exception}"
+                if isinstance(exception, BrokenProcessPool):
+                    self._replace_pool()
+
+        with self._lock:
+            job.outcome = (status, result, error)
+            updates = self._updates if self._reader is not None and self._reader.is_alive() else None
+            if updates is None:
+                self._record_outcome(job)
+                return
+        try:
+            # Queued behind the updates the job's process sent before it
+            # returned, so the reader records those first
+            updates.put((job.job_id, "finished", None))
+        except (EOFError, OSError):
+            with self._lock:
+                self._record_outcome(job)
+
+    def _record_outcome(self, job: ScheduleJob) -> None:
+        # Called with the lock held
+        if job.finished or job.outcome is None:
+            return
+        status, result, error = job.outcome
+        job.outcome = None
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = _now()
+        job.finished_monotonic = time.monotonic()
+        job.events.append(("done", {"status": status, "error": error, "result": result}))
+
+    def _replace_pool(self) -> None:
+        with self._lock:
+            broken, self._executor = self._executor, None
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _purge_expired(self) -> None:
+        # Called with the lock held
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_monotonic is not None and now - job.finished_monotonic > self.job_ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_jobs": self.max_jobs, "jobs": counts}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            jobs = [job for job in self._jobs.values() if not job.finished]
+        for job in jobs:
+            job.stop.set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self._manager is not None:
+            # Let the reader record the outcomes queued before the sentinel
+            self._updates.put(None)
+            self._reader.join(timeout=5)
+            self._manager.shutdown()
+            self._manager = None
+
+
+schedule_jobs = ScheduleJobManager.from_env()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from typing import Any, Dict, Literal
 
 from pydantic import BaseModel, Field
@@ -65,14 +66,80 @@ class TimeSlotInput(BaseModel):
     time: str
 
 
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+# Longest solve a request may ask for
+MAX_TIME_LIMIT_SECONDS = float(os.getenv("SCHEDULE_MAX_TIME_LIMIT_SECONDS", "300"))
+
+
+class SolverOptions(BaseModel):
+    time_limit_seconds: float = Field(default=60.0, gt=0, le=MAX_TIME_LIMIT_SECONDS)
+    # None uses every core available to the process; more are rejected
+    num_workers: int | None = Field(default=None, ge=1, le=available_cores())
+    # Stop once (best bound - objective) / |objective| is below this
+    relative_gap_limit: float | None = Field(default=None, ge=0)
+    random_seed: int | None = None
+    stop_after_first_solution: bool = False
+    log_search_progress: bool = False
+
+
 class ScheduleRequest(BaseModel):
     departments: Dict[str, DepartmentInput]
     rooms: list[RoomInput]
     time_slots: list[TimeSlotInput]
     semester_weeks: int = 16
+    solver: SolverOptions = Field(default_factory=SolverOptions)
+
+
+class ScheduleChangeSet(BaseModel):
+    faculty_on_leave: list[str] = Field(default_factory=list)
+    closed_rooms: list[str] = Field(default_factory=list)
+
+
+class ScheduleRepairRequest(ScheduleRequest):
+    # ScheduleSolveResult.schedule of the timetable being repaired
+    previous_schedule: Dict[str, Dict[str, Dict[str, Any]]]
+    changes: ScheduleChangeSet = Field(default_factory=ScheduleChangeSet)
+
+
+class SolveStats(BaseModel):
+    solver_status: str
+    wall_time_seconds: float
+    num_workers: int
+    model_build_seconds: float = 0.0
+    num_variables: int = 0
+    num_constraints: int = 0
+    objective_value: float | None = None
+    best_objective_bound: float | None = None
+    relative_gap: float | None = None
+    num_conflicts: int = 0
+    num_branches: int = 0
+
+
+class SolveProgress(BaseModel):
+    solution_index: int
+    wall_time_seconds: float
+    objective_value: float
+    best_objective_bound: float
+    relative_gap: float
+
+
+class RepairSummary(BaseModel):
+    neighborhood: Literal["classes", "sections", "departments", "all"]
+    reopened_sections: list[str]
+    # (section, subject) pairs whose classes were free to move
+    reopened_requirements: int
+    kept_assignments: int
+    moved_assignments: int
 
 
 class ScheduleSolveResult(BaseModel):
     status: Literal["optimal", "feasible", "infeasible"]
     schedule: Dict[str, Dict[str, Dict[str, Any]]]
     message: str | None = None
+    stats: SolveStats | None = None
+    repair: RepairSummary | None = None
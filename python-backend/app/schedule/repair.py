@@ -0,0 +1,140 @@
+"""
+Incremental rescheduling after a mid-semester change.
+
+A ScheduleRepairRequest carries the full request, the previous timetable
+(ScheduleSolveResult.schedule) and a change set: faculty on leave, closed
+rooms. The change is applied to the request and the timetable is re-solved
+in growing neighborhoods:
+
+1. classes: only the (section, subject) requirements with a class the
+   change touches are reopened; every other class stays where it is as a
+   hard constraint
+2. sections: every requirement of the sections those classes belong to
+3. departments: all sections of the departments those sections belong to
+4. all: everything, starting from the previous timetable as a hint
+
+Each step is tried only when the one before is infeasible or ran out of
+time, within one shared time limit. In all of them each moved class is
+penalised, so as few classes as possible move.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+from .models import (
+    ScheduleRepairRequest,
+    ScheduleRequest,
+    ScheduleSolveResult,
+    SolveProgress,
+)
+from .solver import RepairPlan, StopSignal, solve_schedule_with_cp_sat
+
+
+def _copy(model, **update):
+    if hasattr(model, "model_copy"):
+        return model.model_copy(update=update)
+    return model.copy(update=update)
+
+
+def apply_changes(request: ScheduleRepairRequest) -> ScheduleRequest:
+    """The request without the faculty on leave and the closed rooms."""
+    on_leave = set(request.changes.faculty_on_leave)
+    closed = set(request.changes.closed_rooms)
+
+    departments = {
+        code: _copy(department, faculty=[faculty for faculty in department.faculty if faculty.id not in on_leave])
+        for code, department in request.departments.items()
+    }
+    return ScheduleRequest(
+        departments=departments,
+        rooms=[room for room in request.rooms if room.id not in closed],
+        time_slots=request.time_slots,
+        semester_weeks=request.semester_weeks,
+        solver=request.solver,
+    )
+
+
+def affected_requirements(request: ScheduleRepairRequest) -> set[tuple[str, str]]:
+    """
+    (section_key, subject_id) pairs with a class taught by faculty on leave
+    or held in a closed room.
+    """
+    on_leave = set(request.changes.faculty_on_leave)
+    closed = set(request.changes.closed_rooms)
+    return {
+        (section_key, str(entry.get("subject_id")))
+        for section_key, classes in request.previous_schedule.items()
+        for entry in classes.values()
+        if str(entry.get("faculty_id")) in on_leave or str(entry.get("room_id")) in closed
+    }
+
+
+def _section_requirements(request: ScheduleRepairRequest, section_keys: set[str]) -> set[tuple[str, str]]:
+    # Requirements missing from the previous timetable are reopened by the
+    # solver on its own
+    return {
+        (section_key, str(entry.get("subject_id")))
+        for section_key, classes in request.previous_schedule.items()
+        if section_key in section_keys
+        for entry in classes.values()
+    }
+
+
+def _department_sections(request: ScheduleRequest, section_keys: set[str]) -> set[str]:
+    # Section keys are "<dept>_<batch>_<section_id>", as built by the solver
+    keys_by_department = {
+        code: {f"{code}_{section.batch}_{section.section_id}" for section in department.sections.values()}
+        for code, department in request.departments.items()
+    }
+    return {
+        key
+        for keys in keys_by_department.values()
+        if keys & section_keys
+        for key in keys
+    }
+
+
+def repair_schedule(
+    request: ScheduleRepairRequest,
+    on_solution: Callable[[SolveProgress], None] | None = None,
+    stop: StopSignal | None = None,
+) -> ScheduleSolveResult:
+    """
+    Re-solve the previous timetable after request.changes, moving as few
+    classes as possible.
+    """
+    changed = apply_changes(request)
+    affected = affected_requirements(request)
+    sections = {section_key for section_key, _ in affected}
+    neighborhoods = [
+        ("classes", affected),
+        ("sections", _section_requirements(request, sections)),
+        ("departments", _section_requirements(request, _department_sections(changed, sections))),
+        ("all", None),
+    ]
+
+    deadline = time.monotonic() + request.solver.time_limit_seconds
+    result = None
+    tried: set[frozenset[tuple[str, str]]] = set()
+    for name, reopened in neighborhoods:
+        if reopened is not None:
+            if frozenset(reopened) in tried:
+                continue
+            tried.add(frozenset(reopened))
+
+        remaining = deadline - time.monotonic()
+        if result is not None and remaining <= 0:
+            break
+        step = _copy(changed, solver=_copy(changed.solver, time_limit_seconds=max(remaining, 0.1)))
+        plan = RepairPlan(previous=request.previous_schedule, reopened=reopened, neighborhood=name)
+        result = solve_schedule_with_cp_sat(step, on_solution=on_solution, stop=stop, repair=plan)
+
+        if result.status != "infeasible":
+            return result
+        if result.stats is None or (stop is not None and stop.is_set()):
+            # Infeasible before the search (or stopped); a wider
+            # neighborhood cannot help
+            return result
+    return result
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
-from .models import ScheduleRequest, ScheduleSolveResult
-from .solver import solve_schedule_with_cp_sat
+from typing import Callable
 
+from .models import ScheduleRepairRequest, ScheduleRequest, ScheduleSolveResult, SolveProgress
+from .repair import repair_schedule
+from .solver import StopSignal, solve_schedule_with_cp_sat
 
-def generate_schedule(request: ScheduleRequest) -> ScheduleSolveResult:
+
+def generate_schedule(
+    request: ScheduleRequest,
+    on_solution: Callable[[SolveProgress], None] | None = None,
+    stop: StopSignal | None = None,
+) -> ScheduleSolveResult:
     """Validate and solve schedule generation with CP-SAT."""
-    return solve_schedule_with_cp_sat(request)
+    if isinstance(request, ScheduleRepairRequest):
+        return repair_schedule(request, on_solution=on_solution, stop=stop)
+    return solve_schedule_with_cp_sat(request, on_solution=on_solution, stop=stop)
@@ -1,65 +1,178 @@
 from __future__ import annotations
 
 import math
+import threading
+import time
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
 
 from ortools.sat.python import cp_model
 
-from .models import FacultyInput, RoomInput, ScheduleRequest, ScheduleSolveResult, SectionInput, SubjectInput, TimeSlotInput
+from .index import RoomBucket, SchedulingIndex
+from .models import (
+    MAX_TIME_LIMIT_SECONDS,
+    FacultyInput,
+    ScheduleRequest,
+    RepairSummary,
+    ScheduleSolveResult,
+    SectionInput,
+    SolveProgress,
+    SolverOptions,
+    SolveStats,
+    SubjectInput,
+    TimeSlotInput,
+    available_cores,
+)
 
 
 @dataclass
-class CandidateAssignment:
-    section_key: str
-    section: SectionInput
-    subject: SubjectInput
-    faculty: FacultyInput
-    room: RoomInput
-    slot: TimeSlotInput
-    variable: cp_model.IntVar | None = None
+class ClassRequirement:
+    """
+    One subject taught to one section `required` times a week.
 
+    The timetable is decomposed into separate choices instead of one
+    variable per (slot, faculty, room) combination:
 
-def _parse_time_to_minutes(time_value: str) -> int:
-    parts = time_value.split(":")
-    if len(parts) < 2:
-        raise ValueError(f"Invalid time format: {time_value}")
+    - slots: which slots it takes
+    - teaches: which eligible faculty member teaches the class in a slot, per
+      (slot_id, faculty_id); each class picks its own, and exactly one
+      teaches every chosen slot
 
-    hours = int(parts[0])
-    minutes = int(parts[1])
-    return (hours * 60) + minutes
+    Rooms are chosen per (section, slot) as a room bucket (see index.py);
+    rooms in a bucket are interchangeable, and _assign_rooms picks the actual
+    rooms after the solve.
+    """
 
+    section_key: str
+    section: SectionInput
+    subject: SubjectInput
+    required: int
+    slots: dict[str, cp_model.IntVar] = field(default_factory=dict)
+    teaches: dict[tuple[str, str], cp_model.IntVar] = field(default_factory=dict)
 
-def _faculty_is_available(faculty: FacultyInput, slot: TimeSlotInput) -> bool:
-    windows = faculty.availability_windows
-    if not windows:
-        return True
 
-    slot_minutes = _parse_time_to_minutes(slot.time)
+# Objective cost of moving a previous class to another slot or faculty, and
+# to another room bucket. Higher than any soft objective, so a repair only
+# moves classes the change forces to move.
+MOVE_PENALTY = 100
+ROOM_MOVE_PENALTY = 10
 
-    for window in windows:
-        if window.day_of_week != slot.day:
-            continue
 
-        start_minutes = _parse_time_to_minutes(window.start_time)
-        end_minutes = _parse_time_to_minutes(window.end_time)
+@dataclass
+class PreviousClass:
+    slot_id: str
+    faculty_id: str
+    room_id: str
 
-        if start_minutes <= slot_minutes < end_minutes:
-            return True
 
-    return False
+@dataclass
+class RepairPlan:
+    """
+    A previous timetable to stay close to (see repair.py).
+
+    `reopened` holds (section_key, subject_id) requirements free to move;
+    all other requirements keep their previous classes as hard constraints.
+    A requirement is reopened anyway when its classes can no longer be
+    placed as before, e.g. its faculty or room is gone. Reopened
+    requirements are hinted with their previous classes, and every class
+    that moves costs MOVE_PENALTY. `reopened=None` reopens everything.
+    """
+
+    previous: dict[str, dict[str, dict[str, Any]]]
+    reopened: set[tuple[str, str]] | None = None
+    neighborhood: str = "all"
+
+
+def _previous_classes(previous: dict[str, dict[str, dict[str, Any]]]) -> dict[tuple[str, str], list[PreviousClass]]:
+    # (section_key, subject_id) -> classes, from a ScheduleSolveResult.schedule
+    classes: dict[tuple[str, str], list[PreviousClass]] = defaultdict(list)
+    for section_key, section_classes in previous.items():
+        for entry in section_classes.values():
+            if any(entry.get(key) is None for key in ("subject_id", "slot_id", "faculty_id", "room_id")):
+                continue
+            classes[(section_key, str(entry["subject_id"]))].append(
+                PreviousClass(
+                    slot_id=str(entry["slot_id"]),
+                    faculty_id=str(entry["faculty_id"]),
+                    room_id=str(entry["room_id"]),
+                )
+            )
+    return classes
+
+
+def _apply_repair_plan(
+    model: cp_model.CpModel,
+    plan: RepairPlan,
+    previous: dict[tuple[str, str], list[PreviousClass]],
+    requirements: list[ClassRequirement],
+    room_choice: dict[tuple[str, str], dict[RoomBucket, cp_model.IntVar]],
+    index: SchedulingIndex,
+    penalty_terms: list[cp_model.LinearExpr],
+) -> set[tuple[str, str]]:
+    """
+    Fix the classes of requirements outside the neighborhood and hint the
+    rest. Returns the requirements actually reopened.
+    """
+
+    def placeable(requirement: ClassRequirement, classes: list[PreviousClass]) -> bool:
+        if len(classes) != requirement.required:
+            return False
+        for previous_class in classes:
+            if (previous_class.slot_id, previous_class.faculty_id) not in requirement.teaches:
+                return False
+            bucket = index.room_bucket_by_id.get(previous_class.room_id)
+            if bucket not in room_choice.get((requirement.section_key, previous_class.slot_id), {}):
+                return False
+        return True
 
+    requirement_keys = [(requirement.section_key, requirement.subject.subject_id) for requirement in requirements]
+    if plan.reopened is None:
+        reopened = set(requirement_keys)
+    else:
+        reopened = set(plan.reopened) & set(requirement_keys)
+        for key, requirement in zip(requirement_keys, requirements):
+            if key not in reopened and not placeable(requirement, previous.get(key, [])):
+                reopened.add(key)
+
+    hints: dict[int, tuple[cp_model.IntVar, int]] = {}
+
+    def hint(variable: cp_model.IntVar) -> None:
+        hints[variable.Index()] = (variable, 1)
+
+    for key, requirement in zip(requirement_keys, requirements):
+        section_key = requirement.section_key
+        classes = previous.get(key, [])
+
+        if key not in reopened:
+            slot_ids = {previous_class.slot_id for previous_class in classes}
+            for slot_id, slot_var in requirement.slots.items():
+                model.Add(slot_var == int(slot_id in slot_ids))
+            for previous_class in classes:
+                model.Add(requirement.teaches[(previous_class.slot_id, previous_class.faculty_id)] == 1)
+                bucket = index.room_bucket_by_id[previous_class.room_id]
+                for choice, in_bucket in room_choice[(section_key, previous_class.slot_id)].items():
+                    model.Add(in_bucket == int(choice == bucket))
+            continue
 
-def _room_is_compatible(room: RoomInput, subject: SubjectInput, section: SectionInput) -> bool:
-    room_type = (room.room_type or "").lower()
+        for previous_class in classes:
+            if previous_class.slot_id in requirement.slots:
+                hint(requirement.slots[previous_class.slot_id])
 
-    if subject.requires_lab and room_type != "lab":
-        return False
+            kept = requirement.teaches.get((previous_class.slot_id, previous_class.faculty_id))
+            if kept is not None:
+                hint(kept)
+                penalty_terms.append(MOVE_PENALTY * (1 - kept))
 
-    if not subject.requires_lab and room_type == "lab":
-        return False
+            bucket = index.room_bucket_by_id.get(previous_class.room_id)
+            in_bucket = room_choice.get((section_key, previous_class.slot_id), {}).get(bucket)
+            if in_bucket is not None:
+                hint(in_bucket)
+                penalty_terms.append(ROOM_MOVE_PENALTY * (1 - in_bucket))
 
-    return room.capacity >= section.strength
+    for variable, value in hints.values():
+        model.AddHint(variable, value)
+    return reopened
 
 
 def _eligible_faculty_ids(subject: SubjectInput, faculty_by_id: dict[str, FacultyInput]) -> list[str]:
@@ -76,7 +189,160 @@ def _eligible_faculty_ids(subject: SubjectInput, faculty_by_id: dict[str, Facult
     return matched_by_specialization
 
 
-def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
+class StopSignal(Protocol):
+    def is_set(self) -> bool: ...
+
+    def wait(self, timeout: float | None = None) -> bool: ...
+
+
+def _relative_gap(objective: float, bound: float) -> float:
+    # Same definition as CP-SAT's relative_gap_limit
+    return round(abs(bound - objective) / max(1.0, abs(objective)), 6)
+
+
+class _ProgressCallback(cp_model.CpSolverSolutionCallback):
+    """Reports every improving solution the search finds."""
+
+    def __init__(self, on_solution: Callable[[SolveProgress], None]):
+        super().__init__()
+        self._on_solution = on_solution
+        self.solution_count = 0
+
+    def on_solution_callback(self) -> None:
+        self.solution_count += 1
+        objective = self.ObjectiveValue()
+        bound = self.BestObjectiveBound()
+        self._on_solution(
+            SolveProgress(
+                solution_index=self.solution_count,
+                wall_time_seconds=round(self.WallTime(), 3),
+                objective_value=objective,
+                best_objective_bound=bound,
+                relative_gap=_relative_gap(objective, bound),
+            )
+        )
+
+
+def _stop_when_signalled(solver: cp_model.CpSolver, stop: StopSignal, finished: threading.Event) -> None:
+    while not finished.is_set():
+        if stop.wait(0.2):
+            solver.StopSearch()
+            return
+
+
+def _configure_solver(solver: cp_model.CpSolver, options: SolverOptions) -> int:
+    parameters = solver.parameters
+    # Clamped again here: copies made with model_copy skip validation, and
+    # a job process may see fewer cores than the API process did
+    parameters.max_time_in_seconds = min(options.time_limit_seconds, MAX_TIME_LIMIT_SECONDS)
+    num_workers = min(options.num_workers or available_cores(), available_cores())
+    parameters.num_workers = num_workers
+    if options.relative_gap_limit is not None:
+        parameters.relative_gap_limit = options.relative_gap_limit
+    if options.random_seed is not None:
+        parameters.random_seed = options.random_seed
+    parameters.stop_after_first_solution = options.stop_after_first_solution
+    parameters.log_search_progress = options.log_search_progress
+    return num_workers
+
+
+def _solve_stats(
+    solver: cp_model.CpSolver,
+    status: int,
+    num_workers: int,
+    model: cp_model.CpModel,
+    build_seconds: float,
+) -> SolveStats:
+    proto = model.Proto()
+    stats = SolveStats(
+        solver_status=solver.StatusName(status),
+        wall_time_seconds=round(solver.WallTime(), 3),
+        num_workers=num_workers,
+        model_build_seconds=round(build_seconds, 3),
+        num_variables=len(proto.variables),
+        num_constraints=len(proto.constraints),
+        num_conflicts=solver.NumConflicts(),
+        num_branches=solver.NumBranches(),
+    )
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        objective = solver.ObjectiveValue()
+        bound = solver.BestObjectiveBound()
+        stats.objective_value = objective
+        stats.best_objective_bound = bound
+        stats.relative_gap = _relative_gap(objective, bound)
+    return stats
+
+
+def _assign_rooms(
+    bucket_classes: dict[tuple[RoomBucket, str], list[str]],
+    index: SchedulingIndex,
+    previous_rooms: dict[tuple[str, str], str] | None = None,
+) -> dict[tuple[str, str], str]:
+    """
+    Pick a room for every (section_key, slot_id) given the bucket chosen for
+    it. The model guarantees each bucket has enough rooms per slot; going
+    through each day in slot order, a section keeps the room it already had
+    that day whenever it is free. When repairing, a class that stays in its
+    previous slot and bucket gets its previous room first.
+    """
+    previous_rooms = previous_rooms or {}
+    assigned: dict[tuple[str, str], str] = {}
+    # (section_key, day) -> room_id, and the rooms claimed that way per day
+    held: dict[tuple[str, int], str] = {}
+    claimed: dict[int, set[str]] = defaultdict(set)
+
+    ordered = sorted(bucket_classes.items(), key=lambda item: index.slot_order(item[0][1]))
+    for (bucket, slot_id), section_keys in ordered:
+        day = index.slots_by_id[slot_id].day
+        free = [room.id for room in index.room_buckets[bucket]]
+        unplaced: list[str] = []
+        for section_key in section_keys:
+            room_id = previous_rooms.get((section_key, slot_id))
+            if room_id in free:
+                free.remove(room_id)
+                assigned[(section_key, slot_id)] = room_id
+                held.setdefault((section_key, day), room_id)
+                claimed[day].add(room_id)
+            else:
+                unplaced.append(section_key)
+
+        waiting: list[str] = []
+        for section_key in unplaced:
+            room_id = held.get((section_key, day))
+            if room_id in free:
+                free.remove(room_id)
+                assigned[(section_key, slot_id)] = room_id
+            else:
+                waiting.append(section_key)
+
+        for section_key in waiting:
+            # Leave rooms other sections already use today for them if possible
+            room_id = next((room_id for room_id in free if room_id not in claimed[day]), free[0])
+            free.remove(room_id)
+            assigned[(section_key, slot_id)] = room_id
+            if (section_key, day) not in held:
+                held[(section_key, day)] = room_id
+                claimed[day].add(room_id)
+
+    return assigned
+
+
+def solve_schedule_with_cp_sat(
+    request: ScheduleRequest,
+    on_solution: Callable[[SolveProgress], None] | None = None,
+    stop: StopSignal | None = None,
+    repair: RepairPlan | None = None,
+) -> ScheduleSolveResult:
+    """
+    Build and solve the timetable model.
+
+    on_solution is called with the objective and bound of every improving
+    solution. Setting `stop` (a threading or multiprocessing Event) ends the
+    search early; the best schedule found so far is returned as feasible.
+    With `repair`, the solve stays as close as it can to a previous
+    timetable (see RepairPlan).
+    """
+    build_started = time.perf_counter()
     model = cp_model.CpModel()
 
     all_faculty: dict[str, FacultyInput] = {}
@@ -84,17 +350,18 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
         for faculty in department.faculty:
             all_faculty[faculty.id] = faculty
 
-    assignments: list[CandidateAssignment] = []
-    section_slot_map: dict[tuple[str, str], list[CandidateAssignment]] = defaultdict(list)
-    section_subject_map: dict[tuple[str, str], list[CandidateAssignment]] = defaultdict(list)
-    faculty_slot_map: dict[tuple[str, str], list[CandidateAssignment]] = defaultdict(list)
-    room_slot_map: dict[tuple[str, str], list[CandidateAssignment]] = defaultdict(list)
+    index = SchedulingIndex.from_request(request)
 
+    requirements: list[ClassRequirement] = []
+    section_buckets: dict[tuple[str, bool], list[RoomBucket]] = {}
     section_total_required: dict[str, int] = defaultdict(int)
-    section_subject_requirements: dict[tuple[str, str], int] = {}
-    section_subject_slots: dict[tuple[str, str], set[str]] = defaultdict(set)
 
-    # Build candidate assignments and weekly requirements.
+    section_slot_map: dict[tuple[str, str], list[cp_model.IntVar]] = defaultdict(list)
+    # (section_key, slot_id, requires_lab) -> slot variables needing such a room
+    room_demand_map: dict[tuple[str, str, bool], list[cp_model.IntVar]] = defaultdict(list)
+    faculty_slot_map: dict[tuple[str, str], list[cp_model.IntVar]] = defaultdict(list)
+
+    # Requirements, with the faculty and slots each one can actually use.
     for dept_code, department in request.departments.items():
         dept_faculty_by_id = {faculty.id: faculty for faculty in department.faculty}
 
@@ -109,105 +376,135 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
 
             for subject in eligible_subjects:
                 classes_per_week = max(1, math.ceil(subject.total_hours / max(1, request.semester_weeks)))
-                section_subject_requirements[(section_key, subject.subject_id)] = classes_per_week
                 section_total_required[section_key] += classes_per_week
 
-                faculty_ids = _eligible_faculty_ids(subject, dept_faculty_by_id)
-                if not faculty_ids:
-                    continue
+                room_key = (section_key, subject.requires_lab)
+                if room_key not in section_buckets:
+                    section_buckets[room_key] = index.eligible_buckets(subject.requires_lab, section.strength)
 
-                for slot in request.time_slots:
-                    for faculty_id in faculty_ids:
+                candidates: dict[str, list[TimeSlotInput]] = {}
+                if section_buckets[room_key]:
+                    for faculty_id in _eligible_faculty_ids(subject, dept_faculty_by_id):
                         faculty = dept_faculty_by_id.get(faculty_id) or all_faculty.get(faculty_id)
-                        if not faculty:
-                            continue
-
-                        if not _faculty_is_available(faculty, slot):
-                            continue
-
-                        for room in request.rooms:
-                            if not _room_is_compatible(room, subject, section):
-                                continue
-
-                            assignment = CandidateAssignment(
-                                section_key=section_key,
-                                section=section,
-                                subject=subject,
-                                faculty=faculty,
-                                room=room,
-                                slot=slot,
-                            )
-
-                            assignments.append(assignment)
-                            section_slot_map[(section_key, slot.slot_id)].append(assignment)
-                            section_subject_map[(section_key, subject.subject_id)].append(assignment)
-                            faculty_slot_map[(faculty.id, slot.slot_id)].append(assignment)
-                            room_slot_map[(room.id, slot.slot_id)].append(assignment)
-                            section_subject_slots[(section_key, subject.subject_id)].add(slot.slot_id)
-
-    if not assignments:
+                        if faculty:
+                            candidates[faculty.id] = index.available_slots(faculty.id)
+
+                slot_teachers: dict[str, list[str]] = defaultdict(list)
+                for faculty_id, slots in candidates.items():
+                    for slot in slots:
+                        slot_teachers[slot.slot_id].append(faculty_id)
+
+                # Fast infeasibility check for each required subject.
+                available_slot_count = len(slot_teachers)
+                if available_slot_count < classes_per_week:
+                    return ScheduleSolveResult(
+                        status="infeasible",
+                        schedule={},
+                        message=(
+                            f"Insufficient valid slots for section {section_key} subject {subject.subject_id}. "
+                            f"Needed {classes_per_week}, found {available_slot_count}."
+                        ),
+                    )
+
+                requirement = ClassRequirement(
+                    section_key=section_key,
+                    section=section,
+                    subject=subject,
+                    required=classes_per_week,
+                )
+                prefix = f"{section_key}_{subject.subject_id}"
+
+                # Time choice, over the slots some eligible faculty can take.
+                for slot_id in slot_teachers:
+                    requirement.slots[slot_id] = model.NewBoolVar(f"y_{prefix}_{slot_id}")
+                model.Add(sum(requirement.slots.values()) == classes_per_week)
+
+                # Faculty choice per class, channelled to the time choice:
+                # exactly one teacher for every slot taken.
+                for slot_id, faculty_ids in slot_teachers.items():
+                    slot_var = requirement.slots[slot_id]
+                    if len(faculty_ids) == 1:
+                        requirement.teaches[(slot_id, faculty_ids[0])] = slot_var
+                        continue
+                    teachers = []
+                    for faculty_id in faculty_ids:
+                        teaches = model.NewBoolVar(f"z_{prefix}_{slot_id}_{faculty_id}")
+                        requirement.teaches[(slot_id, faculty_id)] = teaches
+                        teachers.append(teaches)
+                    model.Add(sum(teachers) == slot_var)
+
+                for slot_id, slot_var in requirement.slots.items():
+                    section_slot_map[(section_key, slot_id)].append(slot_var)
+                    room_demand_map[(section_key, slot_id, subject.requires_lab)].append(slot_var)
+                for (slot_id, faculty_id), teaches in requirement.teaches.items():
+                    faculty_slot_map[(faculty_id, slot_id)].append(teaches)
+
+                requirements.append(requirement)
+
+    if not requirements:
         return ScheduleSolveResult(
             status="infeasible",
             schedule={},
             message="No valid assignment candidates available.",
         )
 
-    # Fast infeasibility check for each required subject.
-    for requirement_key, required_count in section_subject_requirements.items():
-        available_slot_count = len(section_subject_slots.get(requirement_key, set()))
-        if available_slot_count < required_count:
-            section_key, subject_id = requirement_key
-            return ScheduleSolveResult(
-                status="infeasible",
-                schedule={},
-                message=(
-                    f"Insufficient valid slots for section {section_key} subject {subject_id}. "
-                    f"Needed {required_count}, found {available_slot_count}."
-                ),
-            )
-
-    # Decision variables for candidate assignments.
-    for index, assignment in enumerate(assignments):
-        assignment.variable = model.NewBoolVar(f"x_{index}")
-
-    # 1) At most one assignment per section per slot.
+    # 1) At most one class per section per slot.
     for bucket in section_slot_map.values():
-        model.Add(sum(assignment.variable for assignment in bucket) <= 1)
+        if len(bucket) > 1:
+            model.AddAtMostOne(bucket)
 
     # 2) No faculty double booking.
     for bucket in faculty_slot_map.values():
-        model.Add(sum(assignment.variable for assignment in bucket) <= 1)
-
-    # 3) No room double booking.
-    for bucket in room_slot_map.values():
-        model.Add(sum(assignment.variable for assignment in bucket) <= 1)
-
-    # 4) Subject coverage per section.
-    for requirement_key, required_count in section_subject_requirements.items():
-        bucket = section_subject_map.get(requirement_key, [])
-        model.Add(sum(assignment.variable for assignment in bucket) == required_count)
+        if len(bucket) > 1:
+            model.AddAtMostOne(bucket)
+
+    # 3) Room choice: a section holding a class in a slot takes one
+    #    compatible room bucket, and no bucket is used by more sections than
+    #    it has rooms.
+    room_choice: dict[tuple[str, str], dict[RoomBucket, cp_model.IntVar]] = defaultdict(dict)
+    bucket_slot_map: dict[tuple[RoomBucket, str], list[cp_model.IntVar]] = defaultdict(list)
+    for (section_key, slot_id, requires_lab), demand in room_demand_map.items():
+        choices: list[cp_model.IntVar] = []
+        for bucket in section_buckets[(section_key, requires_lab)]:
+            in_bucket = model.NewBoolVar(f"w_{section_key}_{slot_id}_{int(bucket[0])}_{bucket[1]}")
+            room_choice[(section_key, slot_id)][bucket] = in_bucket
+            bucket_slot_map[(bucket, slot_id)].append(in_bucket)
+            choices.append(in_bucket)
+        model.Add(sum(choices) == sum(demand))
+
+    for (bucket, _), choices in bucket_slot_map.items():
+        if len(choices) > len(index.room_buckets[bucket]):
+            model.Add(sum(choices) <= len(index.room_buckets[bucket]))
 
     preference_terms: list[cp_model.LinearExpr] = []
     penalty_terms: list[cp_model.LinearExpr] = []
 
+    slots_by_id = index.slots_by_id
+
     # Soft objective 1: Preferred slots bonus.
-    for assignment in assignments:
-        preferred_slot_ids = set(assignment.faculty.preferred_slots or [])
-        if int(assignment.slot.slot_id) in preferred_slot_ids:
-            preference_terms.append(assignment.variable * 10)
+    preferred_slot_ids = {
+        faculty_id: set(faculty.preferred_slots or []) for faculty_id, faculty in all_faculty.items()
+    }
+    for requirement in requirements:
+        for (slot_id, faculty_id), teaches in requirement.teaches.items():
+            if int(slot_id) in preferred_slot_ids[faculty_id]:
+                preference_terms.append(teaches * 10)
 
     # Precompute utility maps for soft constraints.
-    section_day_map: dict[tuple[str, int], list[CandidateAssignment]] = defaultdict(list)
-    faculty_day_map: dict[tuple[str, int], list[CandidateAssignment]] = defaultdict(list)
-    faculty_week_map: dict[str, list[CandidateAssignment]] = defaultdict(list)
-    section_day_room_map: dict[tuple[str, int, str], list[CandidateAssignment]] = defaultdict(list)
-
-    for assignment in assignments:
-        day = assignment.slot.day
-        section_day_map[(assignment.section_key, day)].append(assignment)
-        faculty_day_map[(assignment.faculty.id, day)].append(assignment)
-        faculty_week_map[assignment.faculty.id].append(assignment)
-        section_day_room_map[(assignment.section_key, day, assignment.room.id)].append(assignment)
+    section_day_map: dict[tuple[str, int], list[cp_model.IntVar]] = defaultdict(list)
+    faculty_day_map: dict[tuple[str, int], list[cp_model.IntVar]] = defaultdict(list)
+    faculty_week_map: dict[str, list[cp_model.IntVar]] = defaultdict(list)
+    section_day_room_map: dict[tuple[str, int, RoomBucket], list[cp_model.IntVar]] = defaultdict(list)
+
+    for (section_key, slot_id), bucket in section_slot_map.items():
+        section_day_map[(section_key, slots_by_id[slot_id].day)].extend(bucket)
+    for (faculty_id, slot_id), bucket in faculty_slot_map.items():
+        faculty_day_map[(faculty_id, slots_by_id[slot_id].day)].extend(bucket)
+        faculty_week_map[faculty_id].extend(bucket)
+    for (section_key, slot_id), choices in room_choice.items():
+        day = slots_by_id[slot_id].day
+        for bucket, in_bucket in choices.items():
+            section_day_room_map[(section_key, day, bucket)].append(in_bucket)
 
     # Soft objective 2: Spread classes across the week per section.
     for section_key, total_required in section_total_required.items():
@@ -219,7 +516,7 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
                 continue
 
             day_count = model.NewIntVar(0, len(bucket), f"section_day_count_{section_key}_{day}")
-            model.Add(day_count == sum(assignment.variable for assignment in bucket))
+            model.Add(day_count == sum(bucket))
 
             excess = model.NewIntVar(0, len(bucket), f"section_day_excess_{section_key}_{day}")
             model.Add(excess >= day_count - ideal_daily)
@@ -234,7 +531,7 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
                 continue
 
             day_count = model.NewIntVar(0, len(bucket), f"faculty_day_count_{faculty.id}_{day}")
-            model.Add(day_count == sum(assignment.variable for assignment in bucket))
+            model.Add(day_count == sum(bucket))
 
             excess = model.NewIntVar(0, len(bucket), f"faculty_day_excess_{faculty.id}_{day}")
             model.Add(excess >= day_count - max_per_day)
@@ -248,27 +545,27 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
 
         max_weekly = max(1, faculty.max_weekly_hours)
         week_count = model.NewIntVar(0, len(bucket), f"faculty_week_count_{faculty.id}")
-        model.Add(week_count == sum(assignment.variable for assignment in bucket))
+        model.Add(week_count == sum(bucket))
 
         excess = model.NewIntVar(0, len(bucket), f"faculty_week_excess_{faculty.id}")
         model.Add(excess >= week_count - max_weekly)
         penalty_terms.append(excess * 15)
 
-    # Soft objective 5: Minimize room changes for a section in a day.
-    section_day_rooms: dict[tuple[str, int], set[str]] = defaultdict(set)
-    for section_key, day, room_id in section_day_room_map.keys():
-        section_day_rooms[(section_key, day)].add(room_id)
+    # Soft objective 5: Minimize room changes for a section in a day. Rooms
+    # within a bucket are kept stable by _assign_rooms.
+    section_day_rooms: dict[tuple[str, int], set[RoomBucket]] = defaultdict(set)
+    for section_key, day, bucket in section_day_room_map.keys():
+        section_day_rooms[(section_key, day)].add(bucket)
 
-    for section_day_key, room_ids in section_day_rooms.items():
+    for section_day_key, buckets in section_day_rooms.items():
         room_used_vars: list[cp_model.IntVar] = []
 
-        for room_id in room_ids:
-            bucket = section_day_room_map[(section_day_key[0], section_day_key[1], room_id)]
+        for bucket in sorted(buckets):
             room_used = model.NewBoolVar(
-                f"room_used_{section_day_key[0]}_{section_day_key[1]}_{room_id}"
+                f"room_used_{section_day_key[0]}_{section_day_key[1]}_{int(bucket[0])}_{bucket[1]}"
             )
-            for assignment in bucket:
-                model.Add(assignment.variable <= room_used)
+            for in_bucket in section_day_room_map[(section_day_key[0], section_day_key[1], bucket)]:
+                model.AddImplication(in_bucket, room_used)
             room_used_vars.append(room_used)
 
         if not room_used_vars:
@@ -285,41 +582,139 @@ def solve_schedule_with_cp_sat(request: ScheduleRequest) -> ScheduleSolveResult:
         model.Add(room_change_excess >= room_count - 1)
         penalty_terms.append(room_change_excess * 3)
 
+    previous: dict[tuple[str, str], list[PreviousClass]] = {}
+    reopened: set[tuple[str, str]] = set()
+    if repair is not None:
+        previous = _previous_classes(repair.previous)
+        reopened = _apply_repair_plan(model, repair, previous, requirements, room_choice, index, penalty_terms)
+
     model.Maximize(sum(preference_terms) - sum(penalty_terms))
+    build_seconds = time.perf_counter() - build_started
 
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 60.0
+    num_workers = _configure_solver(solver, request.solver)
+
+    if stop is not None and stop.is_set():
+        return ScheduleSolveResult(
+            status="infeasible",
+            schedule={},
+            message="Search was stopped before it started.",
+        )
 
-    status = solver.Solve(model)
+    callback = _ProgressCallback(on_solution) if on_solution is not None else None
+    finished = threading.Event()
+    if stop is not None:
+        threading.Thread(
+            target=_stop_when_signalled,
+            args=(solver, stop, finished),
+            name="schedule-stop",
+            daemon=True,
+        ).start()
+    try:
+        status = solver.Solve(model, callback)
+    finally:
+        finished.set()
+
+    stopped = stop is not None and stop.is_set()
+    stats = _solve_stats(solver, status, num_workers, model, build_seconds)
+    message = None
     if status == cp_model.OPTIMAL:
         status_label = "optimal"
     elif status == cp_model.FEASIBLE:
         status_label = "feasible"
+        if stopped:
+            message = "Search stopped early; this is the best schedule found so far."
+    elif stopped:
+        return ScheduleSolveResult(
+            status="infeasible",
+            schedule={},
+            message="Search was stopped before a schedule was found.",
+            stats=stats,
+        )
+    elif status == cp_model.UNKNOWN:
+        return ScheduleSolveResult(
+            status="infeasible",
+            schedule={},
+            message=f"No schedule found within the {request.solver.time_limit_seconds:g}s time limit.",
+            stats=stats,
+        )
     else:
         return ScheduleSolveResult(
             status="infeasible",
             schedule={},
             message="No feasible schedule found for the provided constraints.",
+            stats=stats,
         )
 
+    bucket_classes: dict[tuple[RoomBucket, str], list[str]] = defaultdict(list)
+    for (section_key, slot_id), choices in room_choice.items():
+        for bucket, in_bucket in choices.items():
+            if solver.BooleanValue(in_bucket):
+                bucket_classes[(bucket, slot_id)].append(section_key)
+    previous_rooms = {
+        (section_key, previous_class.slot_id): previous_class.room_id
+        for (section_key, _), classes in previous.items()
+        for previous_class in classes
+    }
+    rooms_assigned = _assign_rooms(bucket_classes, index, previous_rooms)
+
     schedule_output: dict[str, dict[str, dict[str, str | int]]] = defaultdict(dict)
 
-    for assignment in assignments:
-        if solver.BooleanValue(assignment.variable):
-            slot_key = f"{assignment.slot.day} {assignment.slot.time}"
-            schedule_output[assignment.section_key][slot_key] = {
-                "course": assignment.subject.name,
-                "faculty_id": assignment.faculty.id,
-                "room_id": assignment.room.id,
-                "semester": assignment.section.semester,
-                "academic_year": assignment.section.academic_year,
-                "section_id": assignment.section.section_id,
-                "course_id": assignment.subject.course_id,
-                "subject_id": assignment.subject.subject_id,
-                "slot_id": assignment.slot.slot_id,
+    for requirement in requirements:
+        teachers = {
+            slot_id: faculty_id
+            for (slot_id, faculty_id), teaches in requirement.teaches.items()
+            if solver.BooleanValue(teaches)
+        }
+        for slot_id, faculty_id in teachers.items():
+            slot = slots_by_id[slot_id]
+            slot_key = f"{slot.day} {slot.time}"
+            schedule_output[requirement.section_key][slot_key] = {
+                "course": requirement.subject.name,
+                "faculty_id": faculty_id,
+                "room_id": rooms_assigned[(requirement.section_key, slot_id)],
+                "semester": requirement.section.semester,
+                "academic_year": requirement.section.academic_year,
+                "section_id": requirement.section.section_id,
+                "course_id": requirement.subject.course_id,
+                "subject_id": requirement.subject.subject_id,
+                "slot_id": slot_id,
             }
 
+    repair_summary = None
+    if repair is not None:
+        placed = {
+            (section_key, str(entry["subject_id"]), str(entry["slot_id"]), str(entry["faculty_id"]), str(entry["room_id"]))
+            for section_key, section_classes in schedule_output.items()
+            for entry in section_classes.values()
+        }
+        requirement_keys = {(requirement.section_key, requirement.subject.subject_id) for requirement in requirements}
+        previous_total = 0
+        kept = 0
+        for (section_key, subject_id), classes in previous.items():
+            if (section_key, subject_id) not in requirement_keys:
+                continue
+            for previous_class in classes:
+                previous_total += 1
+                kept += (
+                    section_key,
+                    subject_id,
+                    previous_class.slot_id,
+                    previous_class.faculty_id,
+                    previous_class.room_id,
+                ) in placed
+        repair_summary = RepairSummary(
+            neighborhood=repair.neighborhood,
+            reopened_sections=sorted({section_key for section_key, _ in reopened}),
+            reopened_requirements=len(reopened),
+            kept_assignments=kept,
+            moved_assignments=previous_total - kept,
+        )
+
     return ScheduleSolveResult(
         status=status_label,
         schedule=dict(schedule_output),
+        message=message,
+        stats=stats,
+        repair=repair_summary,
     )
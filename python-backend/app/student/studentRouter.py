@@ -3,22 +3,12 @@ import uuid
 import pandas as pd
 import numpy as np
 import bcrypt
-from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 import psycopg2
 from psycopg2.extras import execute_values
 from datetime import datetime, date
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
-        )
-        return conn
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
+from routes.dependencies import get_db
 
 
 class StudentDataValidator:
@@ -104,7 +94,7 @@ class StudentDataValidator:
 student_router = APIRouter(prefix="/student", tags=["Students"])
 
 @student_router.post("/process-student-excel")
-async def process_student_excel(file: UploadFile = File(...)):
+def process_student_excel(file: UploadFile = File(...), conn=Depends(get_db)):
     try:
         print(f"[INFO] Starting to process Excel file: {file.filename}")
         
@@ -127,11 +117,7 @@ async def process_student_excel(file: UploadFile = File(...)):
                 raise HTTPException(status_code=400, detail=f"Missing required column: {col}")
         print("[INFO] All required columns found")
         
-        # Establish database connection
-        print("[INFO] Establishing database connection...")
-        conn = get_db_connection()
         cursor = conn.cursor()
-        print("[INFO] Database connection established")
         
         # Prepare lists for bulk insert
         successful_uploads = 0
@@ -225,10 +211,7 @@ async def process_student_excel(file: UploadFile = File(...)):
             }, status_code=500)
         
         finally:
-            # Close database connection
-            print("[INFO] Closing database connection")
             cursor.close()
-            conn.close()
         
         print(f"[SUCCESS] Process completed. Successfully uploaded {successful_uploads}/{total_rows} student records")
         return JSONResponse(content={
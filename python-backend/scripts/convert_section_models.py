@@ -0,0 +1,103 @@
+"""
+Convert pickled section models to the embedding store format.
+
+Usage (from python-backend/app):
+
+    python ../scripts/convert_section_models.py training_labels/section_*_model.pkl
+    python ../scripts/convert_section_models.py --float16 --output-dir converted training_labels/*.pkl
+
+Each `<name>.pkl` is written next to it (or into --output-dir) as
+`<name>.cef`. Entries that only carry a legacy face_recognition `encoding`
+(128-d, not comparable with InsightFace embeddings) are left out and
+reported; those students need to register again.
+"""
+
+import argparse
+import os
+import pickle
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# The store format lives with the service in python-backend/app/routes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from routes.embedding_store import FILE_EXTENSION, EmbeddingStore  # noqa: E402
+
+
+def convert_model_file(
+    pickle_path: str,
+    output_dir: Optional[str] = None,
+    dtype=np.float32
+) -> Dict:
+    """
+    Convert one pickled section model.
+
+    Args:
+        pickle_path: Path to a section_*_model.pkl file
+        output_dir: Directory for the converted file; defaults to the
+            directory of the pickle
+        dtype: float32 or float16 embedding storage
+
+    Returns:
+        Summary dict with the output path and row counts
+    """
+    with open(pickle_path, 'rb') as f:
+        known_faces = pickle.load(f)
+
+    needs_reregistration = sorted(
+        enrollment
+        for enrollment, student_embeddings in known_faces.items()
+        if not any(stored.get('embedding') is not None for stored in student_embeddings)
+    )
+    store = EmbeddingStore.from_known_faces(known_faces)
+
+    base_name = os.path.splitext(os.path.basename(pickle_path))[0]
+    target_dir = output_dir or os.path.dirname(pickle_path) or "."
+    os.makedirs(target_dir, exist_ok=True)
+    output_path = os.path.join(target_dir, base_name + FILE_EXTENSION)
+    store.save(output_path, dtype=dtype)
+
+    return {
+        "source": pickle_path,
+        "output": output_path,
+        "students": len(store),
+        "embeddings": int(store.embeddings.shape[0]),
+        "bytes": os.path.getsize(output_path),
+        "needs_reregistration": needs_reregistration
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Pickled section model files")
+    parser.add_argument("--output-dir", help="Write converted models here instead of next to the source")
+    parser.add_argument("--float16", action="store_true", help="Store embeddings as float16 (half the size)")
+    args = parser.parse_args(argv)
+
+    dtype = np.float16 if args.float16 else np.float32
+    failures = 0
+    for path in args.paths:
+        try:
+            summary = convert_model_file(path, args.output_dir, dtype)
+        except Exception as e:
+            failures += 1
+            print(f"{path}: conversion failed: {str(e)}", file=sys.stderr)
+            continue
+
+        print(
+            f"{summary['source']} -> {summary['output']}: "
+            f"{summary['students']} students, {summary['embeddings']} embeddings, "
+            f"{summary['bytes']} bytes"
+        )
+        if summary['needs_reregistration']:
+            print(
+                f"  legacy encodings only (re-registration needed): "
+                f"{', '.join(summary['needs_reregistration'])}"
+            )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
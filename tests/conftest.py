@@ -0,0 +1,23 @@
+"""
+Helpers for tests of the modules shipped with both python-backend
+(app/routes/) and the ML worker (ml-worker/).
+"""
+
+import importlib.util
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICE_COPIES = {
+    "ml-worker": os.path.join(REPO_ROOT, "ml-worker"),
+    "python-backend": os.path.join(REPO_ROOT, "python-backend", "app", "routes"),
+}
+
+
+def load_copy(service: str, module_name: str):
+    """Import one service's copy of a shared module under a unique name."""
+    path = os.path.join(SERVICE_COPIES[service], f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"{service.replace('-', '_')}_{module_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,123 @@
+"""
+Buffered attendance writes in python-backend's AttendanceWriteBuffer.
+"""
+
+import importlib.util
+import os
+from datetime import date
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("psycopg2")
+
+
+def _load_writer_module():
+    path = os.path.join(REPO_ROOT, "python-backend", "app", "routes", "attendance_writer.py")
+    spec = importlib.util.spec_from_file_location("backend_attendance_writer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+attendance_writer = _load_writer_module()
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    # One list of (class_id, student_id) rows per INSERT statement
+    statements = []
+
+    def execute_values(cursor, sql, rows, page_size=100, fetch=False):
+        statements.append([(row[0], row[1]) for row in rows])
+        return [{"class_id": row[0], "student_id": row[1]} for row in rows]
+
+    monkeypatch.setattr(attendance_writer, "execute_values", execute_values)
+    return statements
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(attendance_writer.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _buffer(**kwargs):
+    buffer = attendance_writer.AttendanceWriteBuffer(7, 42, date(2026, 1, 5), "Laptop Camera", **kwargs)
+    buffer.student_ids = {"EN1": 1, "EN2": 2, "EN3": 3}
+    return buffer
+
+
+def test_repeated_sightings_in_a_batch_are_written_once(inserts):
+    buffer = _buffer()
+
+    assert buffer.add("EN1", 0.6, 0.9)
+    assert not buffer.add("EN1", 0.5, 0.9)
+    assert buffer.add("EN1", 0.8, 0.9)
+    assert buffer.add("EN2", 0.7, 0.9)
+    assert not buffer.add("EN9", 0.9, 0.9)
+
+    buffer.flush(FakeConnection())
+
+    assert inserts == [[(42, 1), (42, 2)]]
+    assert buffer.unknown_enrollments == 1
+
+
+def test_students_already_flushed_are_not_written_again(inserts):
+    buffer = _buffer()
+    conn = FakeConnection()
+    buffer.add("EN1", 0.6, 0.9)
+    buffer.flush(conn)
+
+    assert not buffer.add("EN1", 0.9, 0.9)
+    buffer.add("EN3", 0.6, 0.9)
+    buffer.flush(conn)
+    assert buffer.flush(conn) == []
+
+    assert inserts == [[(42, 1)], [(42, 3)]]
+    assert (buffer.flushes, conn.commits) == (2, 2)
+
+
+def test_flush_is_due_once_max_pending_students_are_queued(clock):
+    buffer = _buffer(flush_interval_seconds=30, max_pending=2)
+
+    buffer.add("EN1", 0.6, 0.9)
+    assert not buffer.should_flush()
+    buffer.add("EN2", 0.6, 0.9)
+    assert buffer.should_flush()
+
+
+def test_flush_is_due_once_the_interval_has_passed(clock, inserts):
+    buffer = _buffer(flush_interval_seconds=5)
+    assert not buffer.should_flush()
+
+    buffer.add("EN1", 0.6, 0.9)
+    clock[0] += 4.9
+    assert not buffer.should_flush()
+    clock[0] += 0.1
+    assert buffer.should_flush()
+
+    buffer.flush(FakeConnection())
+    buffer.add("EN2", 0.6, 0.9)
+    assert not buffer.should_flush()
@@ -0,0 +1,63 @@
+"""
+The ML worker's on-disk cache of per-capture face embeddings.
+"""
+
+import os
+
+import numpy as np
+
+from conftest import load_copy
+
+capture_cache = load_copy("ml-worker", "capture_cache")
+
+
+def _analysis(seed, frames=3):
+    rng = np.random.default_rng(seed)
+    return capture_cache.CaptureAnalysis(
+        "video",
+        [rng.normal(size=(count, 512)).astype(np.float32) for count in range(frames)],
+        frames_decoded=90,
+        fallback="stride",
+    )
+
+
+def test_analysis_round_trips_including_empty_frames(tmp_path):
+    cache = capture_cache.CaptureEmbeddingCache(str(tmp_path))
+    analysis = _analysis(1)
+
+    cache.put("k", analysis)
+    loaded = cache.get("k")
+
+    assert (loaded.kind, loaded.frames_decoded, loaded.fallback) == ("video", 90, "stride")
+    assert [frame.shape for frame in loaded.frames] == [(0, 512), (1, 512), (2, 512)]
+    for original, cached in zip(analysis.frames, loaded.frames):
+        np.testing.assert_array_equal(original, cached)
+    assert cache.get("missing") is None
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_key_changes_with_the_analysis_parameters():
+    key = capture_cache.CaptureEmbeddingCache.make_key("http://x/a.mp4", skip_frames=30, tracking=None)
+
+    assert key == capture_cache.CaptureEmbeddingCache.make_key("http://x/a.mp4", tracking=None, skip_frames=30)
+    assert key != capture_cache.CaptureEmbeddingCache.make_key("http://x/a.mp4", skip_frames=15, tracking=None)
+    assert key != capture_cache.CaptureEmbeddingCache.make_key("http://x/b.mp4", skip_frames=30, tracking=None)
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget(tmp_path):
+    entry_bytes = len(_analysis(0).to_bytes())
+    cache = capture_cache.CaptureEmbeddingCache(str(tmp_path), max_bytes=int(entry_bytes * 2.5))
+
+    cache.put("first", _analysis(0))
+    cache.put("second", _analysis(0))
+    os.utime(tmp_path / "first.npz", (100, 100))
+    os.utime(tmp_path / "second.npz", (200, 200))
+    # Reading an entry makes it the most recently used
+    assert cache.get("first") is not None
+
+    cache.put("third", _analysis(0))
+
+    assert sorted(os.listdir(tmp_path)) == ["first.npz", "third.npz"]
+    assert cache.get("second") is None
+    total = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    assert total <= cache.max_bytes
@@ -0,0 +1,94 @@
+"""
+The .cef embedding store format, and converting legacy pickle section
+models to it with python-backend/scripts/convert_section_models.py.
+"""
+
+import importlib.util
+import os
+import pickle
+import struct
+
+import numpy as np
+import pytest
+
+from conftest import REPO_ROOT, SERVICE_COPIES, load_copy
+
+
+@pytest.fixture(params=sorted(SERVICE_COPIES))
+def embedding_store(request):
+    return load_copy(request.param, "embedding_store")
+
+
+def _legacy_known_faces(seed=3):
+    rng = np.random.default_rng(seed)
+    return {
+        "EN1": [{"enrollment": "EN1", "embedding": rng.normal(size=512).tolist()} for _ in range(3)],
+        "ÉN2": [{"enrollment": "ÉN2", "embedding": rng.normal(size=512).tolist()}],
+        # Only a 128-d face_recognition encoding: left out of the store
+        "EN3": [{"enrollment": "EN3", "encoding": rng.normal(size=128).tolist(), "embedding": None}],
+        "EN4": [{"enrollment": "EN4", "embedding": rng.normal(size=512).tolist()} for _ in range(2)],
+    }
+
+
+@pytest.mark.parametrize("dtype, tolerance", [(np.float32, 1e-7), (np.float16, 1e-3)])
+def test_store_round_trips_through_a_file(embedding_store, tmp_path, dtype, tolerance):
+    store = embedding_store.EmbeddingStore.from_known_faces(_legacy_known_faces())
+    path = str(tmp_path / ("model" + embedding_store.FILE_EXTENSION))
+    store.save(path, dtype=dtype)
+
+    loaded = embedding_store.EmbeddingStore.open(path)
+
+    assert loaded.enrollments == ["EN1", "ÉN2", "EN4"]
+    assert loaded.row_counts.tolist() == [3, 1, 2]
+    assert loaded.normalized
+    assert loaded.embeddings.dtype == np.dtype(dtype)
+    np.testing.assert_allclose(loaded.float32_embeddings(), store.embeddings, atol=tolerance)
+    with open(path, "rb") as f:
+        payload = f.read()
+    assert embedding_store.is_embedding_store(payload)
+    assert embedding_store.EmbeddingStore.from_buffer(payload).row_enrollments() == store.row_enrollments()
+
+
+def test_header_carries_magic_and_format_version(embedding_store):
+    payload = embedding_store.EmbeddingStore.from_known_faces(_legacy_known_faces()).to_bytes()
+
+    assert payload[:8] == embedding_store.MAGIC
+    assert struct.unpack_from("<H", payload, 8)[0] == embedding_store.FORMAT_VERSION
+
+    newer = bytearray(payload)
+    struct.pack_into("<H", newer, 8, embedding_store.FORMAT_VERSION + 1)
+    with pytest.raises(ValueError, match="version"):
+        embedding_store.EmbeddingStore.from_buffer(bytes(newer))
+    with pytest.raises(ValueError):
+        embedding_store.EmbeddingStore.from_buffer(b"\x80" + payload[1:])
+    with pytest.raises(ValueError, match="truncated"):
+        embedding_store.EmbeddingStore.from_buffer(payload[:-4])
+
+
+def _load_converter():
+    path = os.path.join(REPO_ROOT, "python-backend", "scripts", "convert_section_models.py")
+    spec = importlib.util.spec_from_file_location("backend_convert_section_models", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_converted_model_decodes_like_the_legacy_pickle(tmp_path):
+    converter = _load_converter()
+    from routes import insightface_service
+
+    pickle_path = tmp_path / "section_7_model.pkl"
+    payload = pickle.dumps(_legacy_known_faces())
+    pickle_path.write_bytes(payload)
+
+    summary = converter.convert_model_file(str(pickle_path))
+    with open(summary["output"], "rb") as f:
+        converted = insightface_service._decode_section_model(f.read())
+    legacy = insightface_service._decode_section_model(payload)
+
+    assert summary["needs_reregistration"] == ["EN3"]
+    assert (summary["students"], summary["embeddings"]) == (3, 6)
+    assert converted.enrollments == legacy.enrollments
+    np.testing.assert_allclose(converted.matrix, legacy.matrix, atol=1e-6)
+    queries = np.vstack([legacy.matrix[0], legacy.matrix[4], -legacy.matrix[3]])
+    assert converted.match(queries, 0.4) == pytest.approx(legacy.match(queries, 0.4))
@@ -0,0 +1,81 @@
+"""
+Tiled detection in detect_boxes, for both shipped copies of
+face_detection.py: every face is found once, whatever its size.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import SERVICE_COPIES, load_copy
+
+FRAME_SIZE = 2000
+MAX_SIZE = 960
+
+
+class _FakeDetector:
+    """Finds given faces (frame boxes) in whatever part of them a crop holds."""
+
+    def __init__(self, frame: np.ndarray, faces):
+        self.frame = frame
+        self.faces = np.asarray(faces, dtype=np.float32)
+
+    def detect(self, crop, input_size, max_num=0, metric="default"):
+        # The crop is a view into the frame; its offset gives the tile origin
+        offset = crop.__array_interface__["data"][0] - self.frame.__array_interface__["data"][0]
+        y, rest = divmod(offset, self.frame.strides[0])
+        x = rest // self.frame.strides[1]
+        height, width = crop.shape[:2]
+
+        boxes = []
+        for x1, y1, x2, y2 in self.faces:
+            cx1, cy1 = max(x1, x), max(y1, y)
+            cx2, cy2 = min(x2, x + width), min(y2, y + height)
+            if cx2 > cx1 and cy2 > cy1:
+                boxes.append([cx1 - x, cy1 - y, cx2 - x, cy2 - y, 0.9])
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 5), None
+
+
+@pytest.fixture(params=sorted(SERVICE_COPIES))
+def face_detection(request):
+    return load_copy(request.param, "face_detection")
+
+
+def _detect(face_detection, faces):
+    frame = np.zeros((FRAME_SIZE, FRAME_SIZE, 3), dtype=np.uint8)
+    # Small faces expected, so the frame is tiled at full scale
+    boxes, _ = face_detection.detect_boxes(
+        _FakeDetector(frame, faces), frame, expected_faces=400, max_size=MAX_SIZE
+    )
+    return boxes
+
+
+def test_face_in_tile_overlap_is_found_once(face_detection):
+    # Tiles are 960 wide with a step of 768: the overlap is 768-960
+    boxes = _detect(face_detection, [(900, 100, 940, 140)])
+
+    assert len(boxes) == 1
+    np.testing.assert_allclose(boxes[0, :4], (900, 100, 940, 140))
+
+
+def test_face_wider_than_tile_overlap_is_found_once(face_detection):
+    # Cut by the edges of the first two tiles, never whole in either
+    boxes = _detect(face_detection, [(700, 100, 1100, 500)])
+
+    assert len(boxes) == 1
+    np.testing.assert_allclose(boxes[0, :4], (700, 100, 1100, 500))
+
+
+def test_large_face_on_a_tile_corner_is_found_once(face_detection):
+    boxes = _detect(face_detection, [(700, 700, 1100, 1100)])
+
+    assert len(boxes) == 1
+    np.testing.assert_allclose(boxes[0, :4], (700, 700, 1100, 1100))
+
+
+def test_neighbouring_faces_are_not_merged(face_detection):
+    faces = [(700, 100, 1100, 500), (1120, 100, 1300, 280), (900, 600, 940, 640)]
+    boxes = _detect(face_detection, faces)
+
+    assert len(boxes) == 3
+    found = sorted(map(tuple, boxes[:, :4].tolist()))
+    np.testing.assert_allclose(found, sorted(faces))
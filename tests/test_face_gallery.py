@@ -0,0 +1,97 @@
+"""
+FaceGallery matching in python-backend against the per-embedding loop that
+InsightFaceService.find_matching_face used before the gallery existed.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "python-backend", "app"))
+
+from routes.insightface_service import FaceGallery, InsightFaceService  # noqa: E402
+
+
+def loop_find_matching_face(query_embedding, known_faces, threshold):
+    # The original find_matching_face: compare with every stored embedding
+    # and keep the best one strictly above the threshold
+    best_match = None
+    best_similarity = threshold
+    query = query_embedding / np.linalg.norm(query_embedding)
+    for enrollment, student_embeddings in known_faces.items():
+        for stored in student_embeddings:
+            stored_embedding = stored.get('embedding')
+            if stored_embedding is None:
+                continue
+            stored_embedding = np.asarray(stored_embedding)
+            similarity = float(np.dot(query, stored_embedding / np.linalg.norm(stored_embedding)))
+            if similarity >= threshold and similarity > best_similarity:
+                best_similarity = similarity
+                best_match = enrollment
+    if best_match:
+        return (best_match, best_similarity)
+    return None
+
+
+def _service(threshold):
+    service = InsightFaceService()
+    service.similarity_threshold = threshold
+    return service
+
+
+@pytest.mark.parametrize("threshold, expected", [(0.5, None), (0.49, "EN1")])
+def test_similarity_equal_to_the_threshold_does_not_match(threshold, expected):
+    # cos((1, 1, 1, 1), (1, 0, 0, 0)) is exactly 0.5
+    known_faces = {"EN1": [{"embedding": np.array([1.0, 0.0, 0.0, 0.0])}]}
+    query = np.array([1.0, 1.0, 1.0, 1.0])
+
+    baseline = loop_find_matching_face(query, known_faces, threshold)
+    match = _service(threshold).find_matching_face(query, known_faces)
+
+    assert (match and match[0]) == (baseline and baseline[0]) == expected
+    if expected:
+        assert match[1] == pytest.approx(baseline[1], abs=1e-6)
+
+
+def test_students_with_several_embeddings_match_like_the_loop():
+    rng = np.random.default_rng(7)
+    known_faces = {
+        f"EN{student}": [{"embedding": rng.normal(size=512)} for _ in range(count)]
+        for student, count in enumerate([1, 3, 5, 2])
+    }
+    # Rows without an embedding are skipped, as before
+    known_faces["EN1"].append({"embedding": None})
+    queries = [
+        stored["embedding"] + rng.normal(scale=0.8, size=512)
+        for embeddings in known_faces.values()
+        for stored in embeddings
+        if stored["embedding"] is not None
+    ] + [rng.normal(size=512) for _ in range(5)]
+    service = _service(0.4)
+
+    matches = service.find_matching_faces(queries, known_faces)
+
+    assert any(match is None for match in matches)
+    assert any(match is not None for match in matches)
+    for query, match in zip(queries, matches):
+        baseline = loop_find_matching_face(query, known_faces, 0.4)
+        if baseline is None:
+            assert match is None
+        else:
+            assert match[0] == baseline[0]
+            assert match[1] == pytest.approx(baseline[1], abs=1e-5)
+
+
+def test_empty_gallery_matches_nobody():
+    known_faces = {"EN1": [{"embedding": None}]}
+    gallery = FaceGallery(known_faces)
+    query = np.ones(512)
+
+    assert len(gallery) == 0
+    assert gallery.match(np.vstack([query, query]), 0.4) == [None, None]
+    assert _service(0.4).find_matching_face(query, {}) is None
+    assert loop_find_matching_face(query, known_faces, 0.4) is None
@@ -0,0 +1,76 @@
+"""
+Holder counting in python-backend's FaceModelManager.
+"""
+
+import importlib.util
+import os
+import time
+
+import pytest
+
+from conftest import REPO_ROOT
+
+
+def _load_manager_module():
+    path = os.path.join(REPO_ROOT, "python-backend", "app", "routes", "face_model_manager.py")
+    spec = importlib.util.spec_from_file_location("backend_face_model_manager", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+face_model_manager = _load_manager_module()
+
+
+def test_model_stays_loaded_until_the_last_holder_releases():
+    manager = face_model_manager.FaceModelManager(object, idle_seconds=0)
+
+    first = manager.acquire()
+    second = manager.acquire()
+    assert first is second
+    assert manager.holders == 2
+
+    manager.release()
+    assert manager.is_loaded
+
+    manager.release()
+    assert not manager.is_loaded
+    assert (manager.loads, manager.releases) == (1, 1)
+
+
+def test_idle_timer_does_not_unload_while_held():
+    manager = face_model_manager.FaceModelManager(object, idle_seconds=0.05)
+
+    manager.acquire()
+    manager.acquire()
+    manager.release()
+    # Longer than the idle timeout with one holder still running
+    time.sleep(0.2)
+    assert manager.is_loaded
+
+    manager.release()
+    time.sleep(0.2)
+    assert not manager.is_loaded
+    assert manager.loads == 1
+
+
+def test_sessions_hold_the_model_like_acquire():
+    manager = face_model_manager.FaceModelManager(object, idle_seconds=0)
+
+    sessions = manager.get_sessions(2)
+    held = manager.acquire()
+    assert sessions[0] is held
+    manager.release()
+    assert manager.is_loaded
+
+    manager.release()
+    assert not manager.is_loaded
+
+
+def test_release_without_acquire_is_rejected():
+    manager = face_model_manager.FaceModelManager(object, idle_seconds=0)
+    manager.preload()
+
+    with pytest.raises(RuntimeError):
+        manager.release()
+    assert manager.is_loaded
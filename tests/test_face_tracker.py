@@ -0,0 +1,50 @@
+"""
+Re-embedding decisions of the ML worker's FaceTracker.
+"""
+
+import numpy as np
+
+from conftest import load_copy
+
+face_tracker = load_copy("ml-worker", "face_tracker")
+
+BOX = [10.0, 10.0, 50.0, 50.0]
+OTHER_BOX = [100.0, 10.0, 140.0, 50.0]
+
+
+def _embedder():
+    # Each call returns a fresh embedding whose first component names the
+    # detection and whose second counts how often it was embedded
+    calls = {}
+
+    def embed(detection):
+        calls[detection] = calls.get(detection, 0) + 1
+        return np.array([detection, calls[detection]], dtype=np.float32)
+
+    return embed, calls
+
+
+def test_low_confidence_track_is_re_embedded_on_a_later_frame():
+    embed, calls = _embedder()
+    # Detection 1 matches the gallery from its first view, detection 2 only
+    # from its second
+    tracker = face_tracker.FaceTracker(embed, needs_refresh=lambda e: e[0] == 2 and e[1] < 2)
+
+    tracker.update([1, 2], [BOX, OTHER_BOX])
+    second = tracker.update([1, 2], [BOX, OTHER_BOX])
+    third = tracker.update([1, 2], [BOX, OTHER_BOX])
+
+    assert calls == {1: 1, 2: 2}
+    assert second.tolist() == [[1.0, 1.0], [2.0, 2.0]]
+    assert third.tolist() == second.tolist()
+    assert (tracker.faces_detected, tracker.embeddings_computed) == (6, 3)
+
+
+def test_tracks_are_not_refreshed_without_a_threshold():
+    embed, calls = _embedder()
+    tracker = face_tracker.FaceTracker(embed)
+
+    for _ in range(3):
+        tracker.update([1], [BOX])
+
+    assert calls == {1: 1}
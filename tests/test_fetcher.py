@@ -0,0 +1,118 @@
+"""
+Streaming downloads through Fetcher.get_to_file, for both shipped copies
+of fetcher.py: peak memory must not grow with the size of the download,
+and failed downloads must not leak file descriptors.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import SERVICE_COPIES, load_copy
+
+BODY_BYTES = 256 * 1024 * 1024
+WRITE_CHUNK = 1024 * 1024
+# Allowed RSS growth while streaming BODY_BYTES: a few chunks plus
+# interpreter noise, far below the body size
+MAX_RSS_GROWTH_BYTES = 48 * 1024 * 1024
+
+linux_only = pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="reads /proc")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/small":
+            self.send_response(200)
+            self.send_header("Content-Length", "1024")
+            self.end_headers()
+            self.wfile.write(b"\0" * 1024)
+            return
+        if self.path != "/large":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(BODY_BYTES))
+        self.end_headers()
+        chunk = b"\0" * WRITE_CHUNK
+        for _ in range(BODY_BYTES // WRITE_CHUNK):
+            self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=sorted(SERVICE_COPIES))
+def fetcher(request):
+    module = load_copy(request.param, "fetcher")
+    instance = module.Fetcher(max_workers=2, timeout=30)
+    yield instance
+    instance.session.close()
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@linux_only
+def test_get_to_file_memory_is_bounded(fetcher, server_url, tmp_path):
+    # Connection, imports and buffers are set up before the baseline
+    os.remove(fetcher.get_to_file(f"{server_url}/small", dir=str(tmp_path))[0])
+
+    baseline = _rss_bytes()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], _rss_bytes())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        path, written = fetcher.get_to_file(f"{server_url}/large", dir=str(tmp_path))
+    finally:
+        done.set()
+        sampler.join()
+
+    assert written == BODY_BYTES
+    assert os.path.getsize(path) == BODY_BYTES
+    assert peak[0] - baseline < MAX_RSS_GROWTH_BYTES
+
+
+@linux_only
+def test_failed_downloads_do_not_leak(fetcher, server_url, tmp_path):
+    import requests
+
+    before = _open_fds()
+    for _ in range(20):
+        with pytest.raises(requests.HTTPError):
+            fetcher.get_to_file(f"{server_url}/missing", dir=str(tmp_path))
+
+    assert _open_fds() - before <= 1  # the pooled keep-alive connection
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,100 @@
+"""
+Slot reservation in python-backend's InferenceExecutor, and concurrent jobs
+sharing the face model through it.
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+
+import pytest
+
+from conftest import REPO_ROOT
+
+
+def _load_backend_module(module_name: str):
+    path = os.path.join(REPO_ROOT, "python-backend", "app", "routes", f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"backend_{module_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+inference_executor = _load_backend_module("inference_executor")
+face_model_manager = _load_backend_module("face_model_manager")
+
+
+def test_reserved_slot_is_refused_to_others_until_its_job_ends():
+    async def scenario():
+        executor = inference_executor.InferenceExecutor(max_jobs=1, admission_timeout=0)
+        await executor.acquire()
+        with pytest.raises(inference_executor.InferenceBusyError):
+            await executor.acquire(timeout=0)
+
+        started, finish = threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            finish.wait(5)
+            return "done"
+
+        task = asyncio.ensure_future(executor.run_reserved(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        with pytest.raises(inference_executor.InferenceBusyError):
+            await executor.run(lambda: None)
+
+        finish.set()
+        assert await task == "done"
+        await asyncio.sleep(0)
+        assert await executor.run(lambda: "next") == "next"
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_unused_reservation_is_released():
+    async def scenario():
+        executor = inference_executor.InferenceExecutor(max_jobs=1, admission_timeout=0)
+        await executor.acquire()
+        executor.release()
+        assert await executor.run(lambda: "ran") == "ran"
+        assert executor.stats()["rejected"] == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_jobs_share_one_loaded_model():
+    models = []
+
+    def factory():
+        models.append(object())
+        return models[-1]
+
+    manager = face_model_manager.FaceModelManager(factory, idle_seconds=0)
+    both_holding, first_done = threading.Barrier(2, timeout=5), threading.Event()
+    seen = []
+
+    def job(finishes_first: bool):
+        # Same shape as the request handlers: one hold for the whole job
+        manager.acquire()
+        try:
+            both_holding.wait()
+            if not finishes_first:
+                first_done.wait(5)
+            seen.append((manager.is_loaded, manager.get()))
+        finally:
+            manager.release()
+            if finishes_first:
+                first_done.set()
+
+    async def scenario():
+        executor = inference_executor.InferenceExecutor(max_jobs=2, admission_timeout=0)
+        await asyncio.gather(executor.run(job, True), executor.run(job, False))
+        executor.shutdown()
+
+    asyncio.run(scenario())
+    assert seen == [(True, models[0]), (True, models[0])]
+    assert manager.loads == 1
+    assert not manager.is_loaded
@@ -0,0 +1,76 @@
+"""
+Job order of the ML worker's JobScheduler.
+"""
+
+import pytest
+
+from conftest import load_copy
+
+job_scheduler = load_copy("ml-worker", "job_scheduler")
+
+
+def _drain(scheduler, eligible=None):
+    jobs = []
+    while True:
+        job = scheduler.pop(eligible)
+        if job is None:
+            return jobs
+        jobs.append(job)
+
+
+def test_higher_priority_runs_first():
+    scheduler = job_scheduler.JobScheduler()
+    scheduler.push("register-1", priority=0, fairness_key=1)
+    scheduler.push("recognize-1", priority=1, fairness_key=1)
+    scheduler.push("register-2", priority=0, fairness_key=2)
+    scheduler.push("recognize-2", priority=1, fairness_key=2)
+
+    assert _drain(scheduler) == ["recognize-1", "recognize-2", "register-1", "register-2"]
+    assert len(scheduler) == 0
+
+
+def test_deadlines_run_earliest_first_ahead_of_jobs_without_one():
+    scheduler = job_scheduler.JobScheduler()
+    scheduler.push("no-deadline", fairness_key=1)
+    scheduler.push("late", deadline=200.0)
+    scheduler.push("early", deadline=100.0)
+    scheduler.push("early-too", deadline=100.0)
+    scheduler.push("urgent-register", priority=1, deadline=50.0)
+
+    assert _drain(scheduler) == ["urgent-register", "early", "early-too", "late", "no-deadline"]
+
+
+def test_sections_are_served_round_robin():
+    scheduler = job_scheduler.JobScheduler()
+    for index in range(4):
+        scheduler.push(f"a{index}", fairness_key="a")
+    scheduler.push("b0", fairness_key="b")
+    scheduler.push("b1", fairness_key="b")
+    scheduler.push("c0", fairness_key="c")
+
+    assert _drain(scheduler) == ["a0", "b0", "c0", "a1", "b1", "a2", "a3"]
+
+
+def test_ineligible_jobs_keep_their_place():
+    scheduler = job_scheduler.JobScheduler()
+    scheduler.push("a0", fairness_key="a")
+    scheduler.push("a1", fairness_key="a")
+    scheduler.push("b0", fairness_key="b")
+
+    assert scheduler.pop(eligible=lambda job: not job.startswith("a")) == "b0"
+    assert scheduler.pop(eligible=lambda job: job != "a0") == "a1"
+    assert scheduler.pop(eligible=lambda job: False) is None
+    assert _drain(scheduler) == ["a0"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (1700000000, 1700000000.0),
+    (1700000000500, 1700000000.5),
+    ("2023-11-14T22:13:20Z", 1700000000.0),
+    ("2023-11-14T22:13:20", None),
+    ("soon", None),
+    (True, None),
+    (None, None),
+])
+def test_parse_deadline(value, expected):
+    assert job_scheduler.parse_deadline(value) == expected
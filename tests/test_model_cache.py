@@ -0,0 +1,72 @@
+"""
+ModelCache.get_or_load, for both shipped copies of model_cache.py.
+"""
+
+import os
+
+import pytest
+
+from conftest import SERVICE_COPIES, load_copy
+
+
+@pytest.fixture(params=sorted(SERVICE_COPIES))
+def cache(request):
+    return load_copy(request.param, "model_cache").ModelCache(max_bytes=1024)
+
+
+def test_failed_loads_release_their_key_lock(cache):
+    def fetch(url):
+        raise OSError("unreachable")
+
+    for version in range(20):
+        with pytest.raises(OSError):
+            cache.get_or_load(f"https://example.test/section_1_model_v{version}.json", fetch, bytes)
+
+    assert cache._key_locks == {}
+
+
+def test_loaded_model_is_cached(cache):
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return b"payload"
+
+    url = "https://example.test/section_1_model_v1.json"
+    assert cache.get_or_load(url, fetch, bytes) == b"payload"
+    assert cache.get_or_load(url, fetch, bytes) == b"payload"
+    assert calls == [url]
+    assert cache._key_locks == {}
+
+
+def test_spill_dir_drops_least_recently_used_models_past_its_budget(tmp_path):
+    model_cache = load_copy("ml-worker", "model_cache")
+    # Nothing stays in memory, so every load goes through the spill directory
+    cache = model_cache.ModelCache(max_bytes=0, spill_dir=str(tmp_path), spill_max_bytes=250)
+    urls = {name: f"https://example.test/section_{name}_model_v1.json" for name in "abcd"}
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return b"x" * 100
+
+    def spill_file(name):
+        return tmp_path / os.path.basename(cache._spill_path(cache.make_key(urls[name])))
+
+    cache.get_or_load(urls["a"], fetch, bytes)
+    cache.get_or_load(urls["b"], fetch, bytes)
+    os.utime(spill_file("a"), (1, 1))
+    os.utime(spill_file("b"), (2, 2))
+    # A disk hit makes "a" the most recently used file
+    cache.get_or_load(urls["a"], fetch, bytes)
+    cache.get_or_load(urls["c"], fetch, bytes)
+
+    assert fetched == [urls["a"], urls["b"], urls["c"]]
+    assert spill_file("a").exists() and spill_file("c").exists()
+    assert not spill_file("b").exists()
+    assert cache.stats()["spill_evictions"] == 1
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 250
+
+    # A model larger than the whole budget is not spilled
+    cache.get_or_load(urls["d"], lambda url: b"x" * 300, bytes)
+    assert not spill_file("d").exists()
@@ -0,0 +1,34 @@
+"""
+Public ids of section model artifacts, for both shipped copies of
+model_log.py.
+"""
+
+import pytest
+
+from conftest import SERVICE_COPIES, load_copy
+
+
+@pytest.fixture(params=sorted(SERVICE_COPIES))
+def copies(request):
+    return load_copy(request.param, "model_log"), load_copy(request.param, "model_cache")
+
+
+def test_writers_of_the_same_version_get_distinct_public_ids(copies):
+    model_log, _ = copies
+    base = model_log.SectionModelManifest(section_id=12, model_version=6)
+    first = base.with_delta(7, "https://example.test/a.cef", 1).to_bytes()
+    second = base.with_delta(7, "https://example.test/b.cef", 1).to_bytes()
+
+    assert model_log.manifest_public_id(12, 7, first) != model_log.manifest_public_id(12, 7, second)
+    assert model_log.manifest_public_id(12, 7, first) == model_log.manifest_public_id(12, 7, first)
+    assert model_log.delta_public_id(12, 7, b"a") != model_log.delta_public_id(12, 7, b"b")
+
+
+def test_public_ids_keep_the_version_suffix(copies):
+    model_log, model_cache = copies
+    for public_id in (
+        model_log.manifest_public_id(12, 7, b"manifest"),
+        model_log.delta_public_id(12, 7, b"delta"),
+        model_log.base_public_id(12, 7, b"base"),
+    ):
+        assert model_cache.parse_model_version(f"https://example.test/face-models/{public_id}") == 7
@@ -0,0 +1,54 @@
+"""
+The ML worker's idempotency store for job results.
+"""
+
+import pytest
+
+from conftest import load_copy
+
+result_store = load_copy("ml-worker", "result_store")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_store.time, "time", lambda: now[0])
+    return now
+
+
+def test_content_hash_ignores_fields_that_change_between_deliveries():
+    payload = {"job_id": "j1", "section_id": 4, "image_urls": ["a", "b"], "enqueued_at": 1}
+    redelivered = dict(payload, job_id="j2", enqueued_at=2, deadline="2030-01-01T00:00:00Z")
+
+    assert result_store.content_hash(payload) == result_store.content_hash(redelivered)
+    assert result_store.content_hash(payload) != result_store.content_hash(dict(payload, image_urls=["a"]))
+
+
+def test_results_are_kept_per_job_and_inputs(tmp_path, clock):
+    store = result_store.ResultStore(str(tmp_path / "results.db"))
+    store.put("j1", "hash-a", {"status": "success", "matches": [1]})
+
+    assert store.get("j1", "hash-a") == {"status": "success", "matches": [1]}
+    assert store.get("j1", "hash-b") is None
+    assert store.get("j2", "hash-a") is None
+    assert (store.hits, store.misses) == (1, 2)
+    store.close()
+
+
+def test_results_expire_after_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "results.db")
+    store = result_store.ResultStore(path, ttl_seconds=60)
+    store.put("j1", "hash-a", {"status": "success"})
+
+    clock[0] += 59
+    assert store.get("j1", "hash-a") is not None
+    clock[0] += 1
+    assert store.get("j1", "hash-a") is None
+
+    # Expired rows are purged by a later put
+    clock[0] += 60
+    store.put("j2", "hash-b", {"status": "success"})
+    store.close()
+    reopened = result_store.ResultStore(path, ttl_seconds=60)
+    assert reopened._db.execute("SELECT job_id FROM job_results").fetchall() == [("j2",)]
+    reopened.close()
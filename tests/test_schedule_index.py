@@ -0,0 +1,102 @@
+"""
+SchedulingIndex lookups in python-backend/app/schedule/index.py.
+"""
+
+import os
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "python-backend", "app"))
+
+from schedule.index import SchedulingIndex, parse_time_to_minutes  # noqa: E402
+from schedule.models import (  # noqa: E402
+    AvailabilityWindow,
+    DepartmentInput,
+    FacultyInput,
+    RoomInput,
+    ScheduleRequest,
+    TimeSlotInput,
+)
+
+
+@pytest.fixture
+def index():
+    request = ScheduleRequest(
+        departments={
+            "D": DepartmentInput(
+                name="D",
+                faculty=[
+                    FacultyInput(
+                        id="mornings",
+                        name="mornings",
+                        department="D",
+                        availability_windows=[
+                            AvailabilityWindow(day_of_week=1, start_time="09:00", end_time="11:00"),
+                            AvailabilityWindow(day_of_week=2, start_time="09:00", end_time="10:00"),
+                        ],
+                    ),
+                    FacultyInput(id="anytime", name="anytime", department="D"),
+                ],
+                subjects=[],
+                sections={},
+            )
+        },
+        rooms=[
+            RoomInput(id="small", name="small", capacity=30, room_type="classroom"),
+            RoomInput(id="big", name="big", capacity=60, room_type="Classroom"),
+            RoomInput(id="big-2", name="big-2", capacity=60, room_type="classroom"),
+            RoomInput(id="lab", name="lab", capacity=40, room_type="LAB"),
+        ],
+        time_slots=[
+            TimeSlotInput(slot_id="tue-9", day=2, time="09:00"),
+            TimeSlotInput(slot_id="mon-11", day=1, time="11:00"),
+            TimeSlotInput(slot_id="mon-9", day=1, time="09:00"),
+            TimeSlotInput(slot_id="mon-10", day=1, time="10:30"),
+            TimeSlotInput(slot_id="tue-10", day=2, time="10:00"),
+        ],
+    )
+    return SchedulingIndex.from_request(request)
+
+
+def _ids(slots):
+    return [slot.slot_id for slot in slots]
+
+
+def test_availability_windows_include_the_start_and_exclude_the_end(index):
+    assert _ids(index.available_slots("mornings")) == ["tue-9", "mon-9", "mon-10"]
+
+
+def test_faculty_without_windows_is_always_available(index):
+    assert _ids(index.available_slots("anytime")) == ["tue-9", "mon-11", "mon-9", "mon-10", "tue-10"]
+    assert index.available_slots("unknown") == []
+
+
+@pytest.mark.parametrize("requires_lab, strength, expected", [
+    (False, 10, [(False, 30), (False, 60)]),
+    (False, 30, [(False, 30), (False, 60)]),
+    (False, 31, [(False, 60)]),
+    (False, 61, []),
+    (True, 40, [(True, 40)]),
+    (True, 41, []),
+])
+def test_eligible_buckets_fit_type_and_capacity(index, requires_lab, strength, expected):
+    assert index.eligible_buckets(requires_lab, strength) == expected
+
+
+def test_rooms_of_the_same_type_and_capacity_share_a_bucket(index):
+    assert [room.id for room in index.room_buckets[(False, 60)]] == ["big", "big-2"]
+    assert index.room_bucket_by_id["lab"] == (True, 40)
+
+
+def test_slot_order_is_day_then_start_time(index):
+    assert sorted(index.slots_by_id, key=index.slot_order) == ["mon-9", "mon-10", "mon-11", "tue-9", "tue-10"]
+
+
+def test_parse_time_to_minutes():
+    assert parse_time_to_minutes("09:30") == 570
+    assert parse_time_to_minutes("14:05:00") == 845
+    with pytest.raises(ValueError):
+        parse_time_to_minutes("0930")
@@ -0,0 +1,212 @@
+"""
+Background schedule-solving jobs in python-backend/app/schedule/jobs.py.
+
+Most tests stand in for the process pool and the manager process, so the
+order in which the solver's updates and the job's outcome arrive is under
+the test's control.
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("ortools")
+sys.path.insert(0, os.path.join(REPO_ROOT, "python-backend", "app"))
+
+from schedule import jobs  # noqa: E402
+from schedule.models import (  # noqa: E402
+    DepartmentInput,
+    FacultyInput,
+    RoomInput,
+    ScheduleRequest,
+    ScheduleSolveResult,
+    SectionInput,
+    SolveStats,
+    SubjectInput,
+    TimeSlotInput,
+)
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, job_id, request, updates, stop):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class FakeManager:
+    def Event(self):
+        return threading.Event()
+
+    def shutdown(self):
+        pass
+
+
+class GatedQueue(queue.Queue):
+    """Update queue whose reader is held until the test opens the gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def get(self, *args, **kwargs):
+        self.gate.wait(5)
+        return super().get(*args, **kwargs)
+
+
+@pytest.fixture
+def manager():
+    job_manager = jobs.ScheduleJobManager()
+    job_manager._executor = FakeExecutor()
+    job_manager._manager = FakeManager()
+    job_manager._updates = GatedQueue()
+    job_manager._reader = threading.Thread(target=job_manager._read_updates, daemon=True)
+    job_manager._reader.start()
+    yield job_manager
+    job_manager._updates.gate.set()
+    job_manager._updates.put(None)
+    job_manager._reader.join(5)
+
+
+def _progress(index, objective):
+    return {
+        "solution_index": index,
+        "wall_time_seconds": 0.1 * index,
+        "objective_value": objective,
+        "best_objective_bound": 0.0,
+        "relative_gap": 1.0,
+    }
+
+
+def _result(objective):
+    return ScheduleSolveResult(
+        status="feasible",
+        schedule={},
+        stats=SolveStats(solver_status="FEASIBLE", wall_time_seconds=0.2, num_workers=1, objective_value=objective),
+    )
+
+
+def _wait_finished(manager, job_id):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        events, finished = manager.events_since(job_id, 0)
+        if finished:
+            return events
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_updates_sent_before_the_result_are_recorded_before_done(manager):
+    job = manager.submit(None)
+    # The process reports and returns before the reader gets to its updates
+    manager._updates.put((job.job_id, "running", None))
+    manager._updates.put((job.job_id, "progress", _progress(1, 9.0)))
+    manager._updates.put((job.job_id, "progress", _progress(2, 4.0)))
+    job.future.set_result(_result(4.0))
+    assert not job.finished
+
+    manager._updates.gate.set()
+    events = _wait_finished(manager, job.job_id)
+
+    assert [kind for kind, _ in events] == ["status", "status", "progress", "progress", "done"]
+    assert [payload.get("status") for kind, payload in events if kind == "status"] == ["queued", "running"]
+    assert job.snapshot()["solutions"] == 2
+    assert events[-1][1]["result"]["stats"]["objective_value"] == job.progress[-1]["objective_value"]
+
+
+def test_cancelled_queued_job_never_runs(manager):
+    manager._updates.gate.set()
+    job = manager.submit(None)
+
+    manager.cancel(job.job_id)
+    events = _wait_finished(manager, job.job_id)
+
+    assert job.status == jobs.JOB_CANCELLED
+    assert job.result is None
+    assert [kind for kind, _ in events] == ["status", "status", "done"]
+    assert events[1][1] == {"status": "queued", "cancel_requested": True}
+
+
+def test_cancelled_running_job_keeps_its_best_schedule(manager):
+    manager._updates.gate.set()
+    job = manager.submit(None)
+    job.future.set_running_or_notify_cancel()
+    manager._updates.put((job.job_id, "running", None))
+    manager._updates.put((job.job_id, "progress", _progress(1, 7.0)))
+
+    manager.cancel(job.job_id)
+    assert job.stop.is_set()
+    # The search stops and returns what it has
+    job.future.set_result(_result(7.0))
+    _wait_finished(manager, job.job_id)
+
+    assert job.status == jobs.JOB_CANCELLED
+    assert job.result["stats"]["objective_value"] == 7.0
+    assert len(job.progress) == 1
+
+
+def test_failed_job_reports_the_error(manager):
+    manager._updates.gate.set()
+    job = manager.submit(None)
+
+    job.future.set_exception(ValueError("no rooms"))
+    events = _wait_finished(manager, job.job_id)
+
+    assert job.status == jobs.JOB_FAILED
+    assert events[-1][1]["error"] == "ValueError: no rooms"
+
+
+def test_solve_in_a_process_pool_streams_events_in_order():
+    request = ScheduleRequest(
+        departments={
+            "D": DepartmentInput(
+                name="D",
+                faculty=[
+                    FacultyInput(id="a", name="a", department="D", specializations=["S"]),
+                    FacultyInput(id="b", name="b", department="D", specializations=["S"]),
+                ],
+                subjects=[
+                    SubjectInput(
+                        code="S", name="S", subject_id="s1", course_id="c1", department="D",
+                        semester=1, credits=2, requires_lab=False, total_hours=32,
+                    )
+                ],
+                sections={
+                    "s": SectionInput(
+                        section_id="x", batch=2024, section="A", strength=30, semester=1, academic_year=2026
+                    )
+                },
+            )
+        },
+        rooms=[RoomInput(id="R", name="R", capacity=40, room_type="classroom")],
+        time_slots=[
+            TimeSlotInput(slot_id="1", day=1, time="09:00"),
+            TimeSlotInput(slot_id="2", day=2, time="09:00"),
+        ],
+    )
+    job_manager = jobs.ScheduleJobManager(max_jobs=1)
+    try:
+        job = job_manager.submit(request)
+        job.future.result(timeout=120)
+        events = _wait_finished(job_manager, job.job_id)
+    finally:
+        job_manager.shutdown()
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[:2] == ["status", "status"] and kinds[-1] == "done"
+    assert set(kinds[2:-1]) <= {"progress"}
+    assert job.status == jobs.JOB_COMPLETED
+    assert job.result["status"] == "optimal"
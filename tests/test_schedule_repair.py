@@ -0,0 +1,129 @@
+"""
+Incremental rescheduling in python-backend/app/schedule/repair.py.
+"""
+
+import os
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("ortools")
+sys.path.insert(0, os.path.join(REPO_ROOT, "python-backend", "app"))
+
+from schedule import repair  # noqa: E402
+from schedule.models import (  # noqa: E402
+    DepartmentInput,
+    FacultyInput,
+    RoomInput,
+    ScheduleChangeSet,
+    ScheduleRepairRequest,
+    ScheduleRequest,
+    ScheduleSolveResult,
+    SectionInput,
+    SolveStats,
+    SubjectInput,
+    TimeSlotInput,
+)
+from schedule.solver import solve_schedule_with_cp_sat  # noqa: E402
+
+
+def _section(section_id):
+    return SectionInput(section_id=section_id, batch=2024, section=section_id, strength=30, semester=1, academic_year=2026)
+
+
+def _subject(subject_id, department, credits=1):
+    return SubjectInput(
+        code=subject_id, name=subject_id, subject_id=subject_id, course_id=subject_id, department=department,
+        semester=1, credits=credits, requires_lab=False, total_hours=16 * credits,
+    )
+
+
+def _faculty(faculty_id, department, subjects):
+    return FacultyInput(id=faculty_id, name=faculty_id, department=department, specializations=subjects)
+
+
+def _entry(subject_id, faculty_id, slot_id, room_id="R1"):
+    return {"subject_id": subject_id, "faculty_id": faculty_id, "slot_id": slot_id, "room_id": room_id}
+
+
+def _two_department_request():
+    return dict(
+        departments={
+            "D1": DepartmentInput(
+                name="D1",
+                faculty=[_faculty("a", "D1", ["s1", "s2"]), _faculty("b", "D1", ["s1", "s2"])],
+                subjects=[_subject("s1", "D1"), _subject("s2", "D1")],
+                sections={"x": _section("x"), "y": _section("y")},
+            ),
+            "D2": DepartmentInput(
+                name="D2",
+                faculty=[_faculty("c", "D2", ["s3"])],
+                subjects=[_subject("s3", "D2")],
+                sections={"z": _section("z")},
+            ),
+        },
+        rooms=[RoomInput(id="R1", name="R1", capacity=40, room_type="classroom")],
+        time_slots=[TimeSlotInput(slot_id=str(slot), day=1 + slot // 4, time=f"{9 + slot % 4:02d}:00") for slot in range(8)],
+    )
+
+
+def test_neighborhoods_grow_until_one_is_feasible(monkeypatch):
+    request = ScheduleRepairRequest(
+        **_two_department_request(),
+        previous_schedule={
+            "D1_2024_x": {"c1": _entry("s1", "a", "0"), "c2": _entry("s2", "b", "1")},
+            "D1_2024_y": {"c3": _entry("s1", "b", "2")},
+            "D2_2024_z": {"c4": _entry("s3", "c", "3")},
+        },
+        changes=ScheduleChangeSet(faculty_on_leave=["a"]),
+    )
+    plans = []
+
+    def solve(step, on_solution=None, stop=None, repair=None):
+        plans.append((repair.neighborhood, repair.reopened))
+        status = "feasible" if repair.neighborhood == "departments" else "infeasible"
+        stats = SolveStats(solver_status=status.upper(), wall_time_seconds=0.0, num_workers=1)
+        return ScheduleSolveResult(status=status, schedule={}, stats=stats)
+
+    monkeypatch.setattr(repair, "solve_schedule_with_cp_sat", solve)
+
+    result = repair.repair_schedule(request)
+
+    assert result.status == "feasible"
+    assert plans == [
+        ("classes", {("D1_2024_x", "s1")}),
+        ("sections", {("D1_2024_x", "s1"), ("D1_2024_x", "s2")}),
+        ("departments", {("D1_2024_x", "s1"), ("D1_2024_x", "s2"), ("D1_2024_y", "s1")}),
+    ]
+
+
+def test_repair_only_moves_the_classes_of_the_faculty_on_leave():
+    base = ScheduleRequest(**_two_department_request())
+    previous = solve_schedule_with_cp_sat(base)
+    assert previous.status in ("optimal", "feasible")
+    section_x = previous.schedule["D1_2024_x"]
+    on_leave = next(entry["faculty_id"] for entry in section_x.values() if entry["subject_id"] == "s1")
+
+    result = repair.repair_schedule(ScheduleRepairRequest(
+        **_two_department_request(),
+        previous_schedule=previous.schedule,
+        changes=ScheduleChangeSet(faculty_on_leave=[on_leave]),
+    ))
+
+    assert result.status in ("optimal", "feasible")
+    assert result.repair.neighborhood == "classes"
+
+    def placements(schedule):
+        return {
+            (section_key, entry["subject_id"]): (entry["slot_id"], entry["room_id"], entry["faculty_id"])
+            for section_key, classes in schedule.items()
+            for entry in classes.values()
+        }
+
+    before, after = placements(previous.schedule), placements(result.schedule)
+    assert before.keys() == after.keys()
+    moved = {requirement for requirement in before if before[requirement] != after[requirement]}
+    assert moved == {requirement for requirement, placement in before.items() if placement[2] == on_leave}
+    assert all(placement[2] != on_leave for placement in after.values())
@@ -0,0 +1,88 @@
+"""
+solve_schedule_with_cp_sat in python-backend/app/schedule.
+"""
+
+import os
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("ortools")
+sys.path.insert(0, os.path.join(REPO_ROOT, "python-backend", "app"))
+
+from schedule.models import (  # noqa: E402
+    MAX_TIME_LIMIT_SECONDS,
+    AvailabilityWindow,
+    DepartmentInput,
+    FacultyInput,
+    RoomInput,
+    ScheduleRequest,
+    SectionInput,
+    SolverOptions,
+    SubjectInput,
+    TimeSlotInput,
+    available_cores,
+)
+from schedule.solver import solve_schedule_with_cp_sat  # noqa: E402
+
+
+def _faculty(faculty_id: str, day: int) -> FacultyInput:
+    return FacultyInput(
+        id=faculty_id,
+        name=faculty_id,
+        department="D",
+        specializations=["S"],
+        availability_windows=[AvailabilityWindow(day_of_week=day, start_time="09:00", end_time="10:00")],
+    )
+
+
+def test_classes_of_a_subject_can_have_different_teachers():
+    # Two classes a week; each teacher is free for only one of them
+    request = ScheduleRequest(
+        departments={
+            "D": DepartmentInput(
+                name="D",
+                faculty=[_faculty("a", 1), _faculty("b", 2)],
+                subjects=[
+                    SubjectInput(
+                        code="S",
+                        name="S",
+                        subject_id="s1",
+                        course_id="c1",
+                        department="D",
+                        semester=1,
+                        credits=2,
+                        requires_lab=False,
+                        total_hours=32,
+                    )
+                ],
+                sections={
+                    "s": SectionInput(
+                        section_id="x", batch=2024, section="A", strength=30, semester=1, academic_year=2026
+                    )
+                },
+            )
+        },
+        rooms=[RoomInput(id="R", name="R", capacity=40, room_type="classroom")],
+        time_slots=[
+            TimeSlotInput(slot_id="1", day=1, time="09:00"),
+            TimeSlotInput(slot_id="2", day=2, time="09:00"),
+        ],
+        semester_weeks=16,
+    )
+
+    result = solve_schedule_with_cp_sat(request)
+
+    assert result.status == "optimal"
+    classes = result.schedule["D_2024_x"]
+    assert {entry["slot_id"]: entry["faculty_id"] for entry in classes.values()} == {"1": "a", "2": "b"}
+
+
+def test_solver_options_are_bounded():
+    with pytest.raises(ValueError):
+        SolverOptions(time_limit_seconds=MAX_TIME_LIMIT_SECONDS + 1)
+    with pytest.raises(ValueError):
+        SolverOptions(num_workers=available_cores() + 1)
+    SolverOptions(time_limit_seconds=MAX_TIME_LIMIT_SECONDS, num_workers=available_cores())
@@ -0,0 +1,46 @@
+"""
+The modules shipped with both python-backend (app/routes/) and the ML
+worker (ml-worker/) must stay byte-for-byte identical.
+"""
+
+import os
+
+import pytest
+
+from conftest import SERVICE_COPIES
+
+SHARED_MODULES = [
+    "embedding_store.py",
+    "face_detection.py",
+    "fetcher.py",
+    "frame_pipeline.py",
+    "frame_sampling.py",
+    "model_cache.py",
+    "model_log.py",
+]
+
+SHARED_MARKER = "This module is shipped with both python-backend"
+
+
+def _read(service: str, name: str) -> bytes:
+    with open(os.path.join(SERVICE_COPIES[service], name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_copies_are_identical(name):
+    worker_copy = _read("ml-worker", name)
+    backend_copy = _read("python-backend", name)
+    assert worker_copy == backend_copy, (
+        f"ml-worker/{name} and python-backend/app/routes/{name} differ; "
+        "apply the change to both copies"
+    )
+
+
+def test_every_shared_module_is_checked():
+    marked = set()
+    for service, directory in SERVICE_COPIES.items():
+        for name in os.listdir(directory):
+            if name.endswith(".py") and SHARED_MARKER.encode() in _read(service, name):
+                marked.add(name)
+    assert marked == set(SHARED_MODULES)
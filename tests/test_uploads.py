@@ -0,0 +1,85 @@
+"""
+Streaming uploads to temp files in python-backend.
+"""
+
+import asyncio
+import importlib.util
+import os
+import tracemalloc
+
+import pytest
+from fastapi import UploadFile
+
+from conftest import REPO_ROOT
+
+
+def _load_uploads_module():
+    path = os.path.join(REPO_ROOT, "python-backend", "app", "routes", "uploads.py")
+    spec = importlib.util.spec_from_file_location("backend_uploads", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+uploads = _load_uploads_module()
+
+CHUNK_SIZE = 64 * 1024
+
+
+class GeneratedStream:
+    """File-like source producing `size` bytes without holding them."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = self.remaining
+        size = min(size, self.remaining)
+        self.remaining -= size
+        return b"\x5a" * size
+
+
+def _save(upload, directory, prefix="video_1_"):
+    return asyncio.run(uploads.save_upload_to_temp(upload, str(directory), prefix, chunk_size=CHUNK_SIZE))
+
+
+def test_large_upload_is_streamed_one_chunk_at_a_time(tmp_path):
+    size = 8 * 1024 * 1024 + 123
+    upload = UploadFile(GeneratedStream(size), filename="lecture.mov")
+
+    tracemalloc.start()
+    try:
+        path, written = _save(upload, tmp_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert written == size
+    assert os.path.getsize(path) == size
+    assert path.endswith(".mov")
+    assert peak < 4 * CHUNK_SIZE
+
+
+def test_each_upload_gets_its_own_temp_file(tmp_path):
+    paths = {
+        _save(UploadFile(GeneratedStream(10), filename="clip.mp4"), tmp_path)[0]
+        for _ in range(3)
+    }
+
+    assert len(paths) == 3
+    assert all(os.path.basename(path).startswith("video_1_") for path in paths)
+
+
+def test_failed_upload_leaves_no_temp_file(tmp_path):
+    class BrokenStream(GeneratedStream):
+        def read(self, size: int = -1) -> bytes:
+            if self.remaining < 100:
+                raise OSError("connection reset")
+            return super().read(size)
+
+    upload = UploadFile(BrokenStream(150), filename="clip.mp4")
+    with pytest.raises(OSError):
+        asyncio.run(uploads.save_upload_to_temp(upload, str(tmp_path), "video_1_", chunk_size=100))
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,183 @@
+"""
+Dispatch in the ML worker's WorkerRuntime, driven without a broker or a
+process pool: submitted jobs are recorded and finished by the test.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("pika")
+sys.path.insert(0, os.path.join(REPO_ROOT, "ml-worker"))
+
+from runtime import WorkerRuntime  # noqa: E402
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+        self.acked = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append(json.loads(body))
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=False):
+        raise AssertionError(f"unexpected nack of {delivery_tag}")
+
+
+class FakeMethod:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+def run_job(payload):
+    return {"status": "success", "job_id": payload["job_id"]}
+
+
+def failure_result(payload, message):
+    return {"status": "failed", "job_id": payload.get("job_id"), "error": message}
+
+
+class RecordingRuntime(WorkerRuntime):
+    """WorkerRuntime whose pool submissions wait for the test to finish them."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queue_prefetch", {"register": 4, "recognize": 4})
+        kwargs.setdefault("queue_priority", {"register": 0, "recognize": 1})
+        super().__init__(
+            amqp_url="amqp://unused",
+            results_queue="results",
+            run_job=run_job,
+            failure_result=failure_result,
+            **kwargs,
+        )
+        self._publish_channel = FakeChannel()
+        self.channel = FakeChannel()
+        self.submitted = []
+
+    def _submit(self, fn, arg, on_done):
+        self._running += 1
+        self.submitted.append((fn, arg, on_done))
+
+    def deliver(self, queue_name, payload, delivery_tag):
+        body = json.dumps(payload).encode("utf-8")
+        self._on_message(queue_name, self.channel, FakeMethod(delivery_tag), None, body)
+
+    def running_jobs(self):
+        return [arg["job_id"] for _, arg, _ in self.submitted]
+
+    def complete(self, job_id):
+        # Finish a submitted job as its pool process would
+        for index, (fn, arg, on_done) in enumerate(self.submitted):
+            if arg["job_id"] == job_id:
+                del self.submitted[index]
+                future = Future()
+                future.set_result(fn(arg))
+                on_done(None, future)
+                return
+        raise AssertionError(f"{job_id} was not submitted")
+
+    @property
+    def published(self):
+        return self._publish_channel.published
+
+
+def _section_lane(payload):
+    return payload.get("section_id")
+
+
+def test_jobs_of_one_lane_run_one_at_a_time_in_delivery_order():
+    runtime = RecordingRuntime(processes=2, lane_of=_section_lane)
+
+    runtime.deliver("register", {"job_id": "a1", "section_id": 1}, 1)
+    runtime.deliver("register", {"job_id": "a2", "section_id": 1}, 2)
+    runtime.deliver("register", {"job_id": "b1", "section_id": 2}, 3)
+    assert runtime.running_jobs() == ["a1", "b1"]
+
+    runtime.complete("a1")
+    assert runtime.running_jobs() == ["b1", "a2"]
+    assert runtime.channel.acked == [1]
+
+    runtime.complete("a2")
+    runtime.complete("b1")
+    assert [result["job_id"] for result in runtime.published] == ["a1", "a2", "b1"]
+    assert runtime.channel.acked == [1, 2, 3]
+    assert all("queue_wait_ms" in result and "processing_ms" in result for result in runtime.published)
+
+
+def test_lane_waits_for_the_follow_up_of_its_previous_job():
+    follow_ups = []
+
+    def run_follow_up(result):
+        follow_ups.append(result["job_id"])
+        return {"status": "success", "job_id": result["job_id"] + "-compacted"}
+
+    runtime = RecordingRuntime(
+        processes=2,
+        lane_of=_section_lane,
+        follow_up_due=lambda result: result["job_id"] == "a1",
+        run_follow_up=run_follow_up,
+    )
+    runtime.deliver("register", {"job_id": "a1", "section_id": 1}, 1)
+    runtime.deliver("register", {"job_id": "a2", "section_id": 1}, 2)
+
+    runtime.complete("a1")
+    # The follow-up holds the lane; a2 has not started
+    assert runtime.running_jobs() == ["a1"]
+
+    runtime.complete("a1")
+    assert runtime.running_jobs() == ["a2"]
+    assert [result["job_id"] for result in runtime.published] == ["a1", "a1-compacted"]
+
+
+def test_invalid_payload_is_answered_and_acked_without_running():
+    runtime = RecordingRuntime(processes=1)
+
+    runtime._on_message("register", runtime.channel, FakeMethod(9), None, b"[1, 2]")
+
+    assert runtime.submitted == []
+    assert runtime.channel.acked == [9]
+    assert runtime.published[0]["status"] == "failed"
+
+
+def test_free_process_takes_the_queued_recognize_job_before_registrations():
+    runtime = RecordingRuntime(processes=1, fairness_of=_section_lane)
+
+    runtime.deliver("register", {"job_id": "r1", "section_id": 1}, 1)
+    runtime.deliver("register", {"job_id": "r2", "section_id": 1}, 2)
+    runtime.deliver("recognize", {"job_id": "k1", "section_id": 2}, 3)
+    assert runtime.running_jobs() == ["r1"]
+
+    runtime.complete("r1")
+    assert runtime.running_jobs() == ["k1"]
+    runtime.complete("k1")
+    assert runtime.running_jobs() == ["r2"]
+
+
+def test_repeated_job_with_the_same_inputs_is_replayed_from_the_store(tmp_path):
+    from result_store import ResultStore
+
+    store = ResultStore(str(tmp_path / "results.db"))
+    runtime = RecordingRuntime(processes=1, result_store=store)
+
+    runtime.deliver("register", {"job_id": "j1", "section_id": 1, "enqueued_at": 1}, 1)
+    runtime.complete("j1")
+    # Redelivered after a timeout: same inputs, new enqueued_at
+    runtime.deliver("register", {"job_id": "j1", "section_id": 1, "enqueued_at": 2}, 2)
+    # Same job id with other inputs is computed again
+    runtime.deliver("register", {"job_id": "j1", "section_id": 2, "enqueued_at": 3}, 3)
+
+    assert runtime.running_jobs() == ["j1"]
+    assert runtime.channel.acked == [1, 2]
+    first, replayed = runtime.published
+    assert replayed == dict(first, replayed=True, queue_wait_ms=0, processing_ms=0)
+    assert (store.hits, store.misses) == (1, 2)
+    store.close()